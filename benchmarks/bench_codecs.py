@@ -0,0 +1,101 @@
+"""
+Microbenchmark of the codecs of the request bodies (see `hopaas_client.codecs`),
+comparing encode/decode time and bytes on the wire of the `ask` request of
+realistic study definitions, with and without gzip.
+
+Usage:
+```bash
+python benchmarks/bench_codecs.py --n-calls 2000 --n-properties 10 100
+```
+"""
+import argparse
+import statistics
+import time
+
+from hopaas_client import Study, LocalClient
+from hopaas_client import codecs
+from hopaas_client import suggestions as hs
+from hopaas_client.samplers import TPESampler
+from hopaas_client.pruners import HyperbandPruner
+
+
+def make_payload(n_properties: int) -> dict:
+    """The body of /api/ask for a study with `n_properties` hyperparameters and a verbose configuration"""
+    properties = dict()
+    for i in range(n_properties):
+        kind = i % 4
+        if kind == 0:
+            properties[f"learning_rate_{i}"] = hs.Float(1e-5, 1e-1)
+        elif kind == 1:
+            properties[f"n_units_{i}"] = hs.Int(8, 512, step=8)
+        elif kind == 2:
+            properties[f"activation_{i}"] = hs.Categorical(["relu", "tanh", "elu", "selu", "gelu"])
+        else:
+            properties[f"fixed_{i}"] = 0.5
+
+    study = Study(f"Benchmark::codecs with {n_properties} properties",
+                  properties=properties,
+                  special_properties=dict(dataset="/data/benchmark/v3/train.parquet",
+                                          description="A study of the codecs " * 20,
+                                          tags=[f"tag{i}" for i in range(20)]),
+                  sampler=TPESampler(),
+                  pruner=HyperbandPruner(),
+                  client=LocalClient())
+    return study._ask_properties()
+
+
+def timed(fn, n_calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        fn()
+    return 1e6 * (time.perf_counter() - start) / n_calls
+
+
+def bench(codec: codecs.Codec, gzip: bool, payload: dict, n_calls: int) -> dict:
+    body = codec.encode(payload)
+    wire = codecs.compress(body) if gzip else body
+
+    if gzip:
+        def encode():
+            return codecs.compress(codec.encode(payload))
+
+        def decode():
+            return codec.decode(codecs.decompress(wire))
+    else:
+        def encode():
+            return codec.encode(payload)
+
+        def decode():
+            return codec.decode(wire)
+
+    assert codec.decode(body) == codecs.JSON.decode(codecs.JSON.encode(payload))
+    return dict(
+        codec=codec.name + ("+gzip" if gzip else ""),
+        bytes=len(wire),
+        encode_us=statistics.median(timed(encode, n_calls) for _ in range(3)),
+        decode_us=statistics.median(timed(decode, n_calls) for _ in range(3)),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument("--n-calls", type=int, default=1000)
+    parser.add_argument("--n-properties", type=int, nargs="+", default=[10, 100])
+    args = parser.parse_args()
+
+    available = [codecs.get_codec(name) for name in codecs.available()]
+    if 'msgpack' not in codecs.available():
+        print("msgpack is not installed, only JSON is benchmarked")
+
+    for n_properties in args.n_properties:
+        payload = make_payload(n_properties)
+        print(f"\n/api/ask with {n_properties} properties")
+        for codec in available:
+            for gzip in [False, True]:
+                result = bench(codec, gzip, payload, args.n_calls)
+                print(f"  {result['codec']:14s} {result['bytes']:7d} bytes   "
+                      f"encode {result['encode_us']:8.1f} us   decode {result['decode_us']:8.1f} us")
+
+
+if __name__ == '__main__':
+    main()
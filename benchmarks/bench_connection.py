@@ -0,0 +1,73 @@
+"""
+Microbenchmark of the per-call latency of `Client.should_prune` against a
+local mock server, comparing a fresh connection per call (module-level
+`requests.post`, as done by the former implementation of `Client`) with the
+pooled keep-alive session of `Client`.
+
+Usage:
+```bash
+python benchmarks/bench_connection.py --n-calls 2000
+```
+"""
+import argparse
+import json
+import statistics
+import time
+
+import requests
+
+from hopaas_client import Client
+from hopaas_client.utils.mock_server import MockHopaasServer
+
+
+def per_call_latency(fn, n_calls: int):
+    latencies = []
+    for _ in range(n_calls):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def summary(name: str, latencies):
+    latencies = sorted(latencies)
+    return dict(
+        name=name,
+        n_calls=len(latencies),
+        mean_us=1e6 * statistics.fmean(latencies),
+        p50_us=1e6 * latencies[len(latencies) // 2],
+        p99_us=1e6 * latencies[int(len(latencies) * 0.99)],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument("--n-calls", type=int, default=1000)
+    args = parser.parse_args()
+
+    with MockHopaasServer() as server:
+        client = Client(server=server.address, token=server.token)
+        properties = client.ask(dict(x=1, hopaas_config=dict(title="bench_connection")))
+        study_id, trial_id = properties['hopaas_trial'].split(':')
+        payload = json.dumps(dict(hopaas_trial=f"{study_id}:{trial_id}", loss=1., step=0))
+
+        def unpooled():
+            res = requests.post(f"{server.address}/api/should_prune/{server.token}", data=payload)
+            return res.text.lower() == 'true'
+
+        def pooled():
+            return client.should_prune(study_id, int(trial_id), 1., 0)
+
+        results = [
+            summary("requests.post (new connection per call)", per_call_latency(unpooled, args.n_calls)),
+            summary("Client (pooled keep-alive session)", per_call_latency(pooled, args.n_calls)),
+        ]
+        client.close()
+
+    for result in results:
+        print(f"{result['name']:45s} mean {result['mean_us']:8.1f} us   "
+              f"p50 {result['p50_us']:8.1f} us   p99 {result['p99_us']:8.1f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Latency of the local TPE sampler as a function of the size of the history.
+
+The history is filled with random trials of a search space with numerical,
+log-scaled integer and categorical suggestions, one trial at a time as
+`LocalClient` does, then the time to sample a new trial is measured.
+
+Usage:
+```bash
+python benchmarks/bench_tpe.py --history-sizes 1000 10000 100000
+```
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from hopaas_client.local.samplers import TPEEngine
+from hopaas_client.local.space import FloatDistribution, IntDistribution, CategoricalDistribution
+from hopaas_client.local.storage import LocalStudy, LocalTrial, COMPLETE
+
+
+def make_space(n_floats: int):
+    space = {f"x{i}": FloatDistribution(-5., 5.) for i in range(n_floats)}
+    space['n_layers'] = IntDistribution(1, 100, log=True)
+    space['activation'] = CategoricalDistribution(['relu', 'tanh', 'elu', 'gelu'])
+    return space
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument("--history-sizes", type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument("--n-floats", type=int, default=4)
+    parser.add_argument("--n-asks", type=int, default=10)
+    args = parser.parse_args()
+
+    space = make_space(args.n_floats)
+    study = LocalStudy("bench", "bench_tpe")
+    engine = TPEEngine(seed=42)
+    rng = np.random.default_rng(0)
+
+    n_trials = 0
+    for history_size in sorted(args.history_sizes):
+        start = time.perf_counter()
+        while n_trials < history_size:
+            internal = {name: float(d.sample(rng, 1)[0]) for name, d in space.items()}
+            trial = LocalTrial(n_trials, dict(), internal)
+            trial.loss = sum(internal[f"x{i}"] ** 2 for i in range(args.n_floats))
+            trial.state = COMPLETE
+            engine.observe(study, trial)
+            n_trials += 1
+        fill_time = time.perf_counter() - start
+
+        latencies = []
+        for _ in range(args.n_asks):
+            start = time.perf_counter()
+            engine.sample(study, space)
+            latencies.append(time.perf_counter() - start)
+
+        print(f"history {history_size:8d}   ask {1e3 * statistics.median(latencies):8.2f} ms   "
+              f"(history filled in {fill_time:6.1f} s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""
+Benchmark suite of the client overhead against a local mock server, saving the results as JSON.
+
+It measures:
+ - the throughput, in trials per second, of empty trials run sequentially and with
+   `study.optimize(n_jobs=...)`, for each injected server latency;
+ - the throughput and the number of retries with a fraction of the requests failing
+   with 503, for each injected error rate;
+ - the per-call latency percentiles of `ask`, `should_prune`, `tell`, `mark_as_failed`,
+   `get_best_trial` and `version`;
+ - the memory allocated by the client per 10k trials, with `tracemalloc`;
+ - the time to import `hopaas_client` in a fresh interpreter.
+
+The results are written to `benchmarks/results/<timestamp>-<commit>.json` (or `--output`),
+to be compared across commits for regressions.
+
+Usage:
+```bash
+python benchmarks/run_all.py --latencies 0 0.005 --error-rates 0 0.05 --n-trials 500
+```
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Union
+
+from hopaas_client import Client, Study
+from hopaas_client import suggestions as hs
+from hopaas_client.metrics import Metrics
+from hopaas_client.RetryPolicy import RetryPolicy
+from hopaas_client.utils.mock_server import MockHopaasServer
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def make_study(server: MockHopaasServer, title: str, client: Union[Client, None] = None, **kwargs) -> Study:
+    client = client if client is not None else Client(server=server.address, token=server.token)
+    return Study(title, properties=dict(x=hs.Float(-1, 1), n=hs.Int(1, 10), fixed=1.), client=client, **kwargs)
+
+
+def percentiles(values) -> dict:
+    values = sorted(values)
+    return dict(
+        n=len(values),
+        mean_us=1e6 * statistics.fmean(values),
+        p50_us=1e6 * values[len(values) // 2],
+        p90_us=1e6 * values[int(len(values) * 0.9)],
+        p99_us=1e6 * values[min(len(values) - 1, int(len(values) * 0.99))],
+    )
+
+
+def bench_throughput(latencies, n_trials: int, n_jobs: int) -> list:
+    results = []
+    for latency in latencies:
+        with MockHopaasServer(seed=42, latency=latency) as server:
+            study = make_study(server, f"bench::throughput::{latency}")
+            start = time.perf_counter()
+            for _ in range(n_trials):
+                with study.trial() as trial:
+                    trial.loss = trial.x ** 2
+            sequential = n_trials / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            study.optimize(lambda trial: trial.x ** 2, n_trials=n_trials, n_jobs=n_jobs)
+            parallel = n_trials / (time.perf_counter() - start)
+            study._client.close()
+
+        results.append(dict(latency_s=latency, n_trials=n_trials,
+                            sequential_trials_per_s=sequential,
+                            n_jobs=n_jobs, parallel_trials_per_s=parallel))
+    return results
+
+
+def bench_errors(error_rates, n_trials: int) -> list:
+    results = []
+    for error_rate in error_rates:
+        with MockHopaasServer(seed=42, error_rate=error_rate) as server:
+            # Short backoffs, so that the overhead of the retries is measured rather than the waits
+            metrics = Metrics()
+            client = Client(server=server.address, token=server.token, metrics=metrics,
+                            retry_policy=RetryPolicy(max_retries=10, initial_backoff=0.001, max_backoff=0.01))
+            study = make_study(server, f"bench::errors::{error_rate}", client=client)
+            n_failed = 0
+            start = time.perf_counter()
+            for _ in range(n_trials):
+                try:
+                    with study.trial() as trial:
+                        trial.loss = trial.x ** 2
+                except Exception:
+                    n_failed += 1
+            throughput = n_trials / (time.perf_counter() - start)
+            client.close()
+
+        counters, _ = metrics.collect()
+        results.append(dict(error_rate=error_rate, n_trials=n_trials, trials_per_s=throughput,
+                            n_retries=int(sum(counters.get('hopaas_retries_total', dict()).values())),
+                            n_failed_trials=n_failed))
+    return results
+
+
+def bench_latency(n_calls: int) -> dict:
+    with MockHopaasServer(seed=42) as server:
+        client = Client(server=server.address, token=server.token)
+        properties = dict(x=str(hs.Float(-1, 1)), hopaas_config=dict(title="bench::latency"))
+        calls = dict(
+            ask=lambda: client.ask(properties),
+            should_prune=lambda: client.should_prune(study_id, trial_id, 1., 0),
+            tell=lambda: client.tell(study_id, trial_id, 1.),
+            mark_as_failed=lambda: client.mark_as_failed(study_id, trial_id, "Benchmark"),
+            get_best_trial=lambda: client.get_best_trial(study_id, trial_id),
+            version=lambda: client.backend_version,
+        )
+        study_id, trial_id = client.ask(properties)['hopaas_trial'].split(':')
+        trial_id = int(trial_id)
+
+        results = dict()
+        for name, call in calls.items():
+            call()  # Warm-up
+            latencies = []
+            for _ in range(n_calls):
+                start = time.perf_counter()
+                call()
+                latencies.append(time.perf_counter() - start)
+            results[name] = percentiles(latencies)
+        client.close()
+    return results
+
+
+def bench_memory(n_trials: int) -> dict:
+    with MockHopaasServer(seed=42) as server:
+        study = make_study(server, "bench::memory")
+        gc.collect()
+        # Only the allocations of the client are traced, not those of the mock server
+        filters = [tracemalloc.Filter(False, "*/utils/mock_server.py"),
+                   tracemalloc.Filter(False, "*/http/server.py"),
+                   tracemalloc.Filter(False, "*/socketserver.py")]
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot().filter_traces(filters)
+        for _ in range(n_trials):
+            with study.trial() as trial:
+                trial.loss = trial.x ** 2
+        gc.collect()
+        after = tracemalloc.take_snapshot().filter_traces(filters)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        study._client.close()
+
+    retained = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return dict(n_trials=n_trials,
+                retained_bytes_per_10k_trials=retained * 10000 / n_trials,
+                peak_traced_bytes=peak)
+
+
+def bench_import_time(n_runs: int) -> dict:
+    code = "import time; start = time.perf_counter(); import hopaas_client; print(time.perf_counter() - start)"
+    times = [float(subprocess.check_output([sys.executable, "-c", code], text=True))
+             for _ in range(n_runs)]
+    return dict(n_runs=n_runs, median_ms=1e3 * statistics.median(times), min_ms=1e3 * min(times))
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                         cwd=os.path.dirname(os.path.abspath(__file__)),
+                                         stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return dict(timestamp=datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+                commit=commit,
+                python=platform.python_version(),
+                platform=platform.platform(),
+                cpu_count=os.cpu_count())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument("--latencies", type=float, nargs="+", default=[0., 0.005],
+                        help="latencies, in seconds, injected in the mock server for the throughput")
+    parser.add_argument("--error-rates", type=float, nargs="+", default=[0., 0.05],
+                        help="fractions of the requests failing with 503 in the mock server, for the retries")
+    parser.add_argument("--n-trials", type=int, default=500)
+    parser.add_argument("--n-jobs", type=int, default=4)
+    parser.add_argument("--n-calls", type=int, default=1000)
+    parser.add_argument("--n-trials-memory", type=int, default=10000)
+    parser.add_argument("--n-imports", type=int, default=5)
+    parser.add_argument("--output", default=None, help="path of the JSON results")
+    args = parser.parse_args()
+
+    env = environment()
+    results = dict(environment=env)
+    results['throughput'] = bench_throughput(args.latencies, args.n_trials, args.n_jobs)
+    for result in results['throughput']:
+        print(f"latency {1e3 * result['latency_s']:6.1f} ms: "
+              f"{result['sequential_trials_per_s']:8.1f} trials/s sequential, "
+              f"{result['parallel_trials_per_s']:8.1f} trials/s with {result['n_jobs']} jobs")
+
+    results['errors'] = bench_errors(args.error_rates, args.n_trials)
+    for result in results['errors']:
+        print(f"error rate {100 * result['error_rate']:5.1f} %: {result['trials_per_s']:8.1f} trials/s, "
+              f"{result['n_retries']} retries, {result['n_failed_trials']} trials failed")
+
+    results['latency'] = bench_latency(args.n_calls)
+    for name, result in results['latency'].items():
+        print(f"{name:15s} p50 {result['p50_us']:8.1f} us   p90 {result['p90_us']:8.1f} us   "
+              f"p99 {result['p99_us']:8.1f} us")
+
+    results['memory'] = bench_memory(args.n_trials_memory)
+    print(f"memory: {results['memory']['retained_bytes_per_10k_trials'] / 2**20:.2f} MiB per 10k trials")
+
+    results['import_time'] = bench_import_time(args.n_imports)
+    print(f"import time: {results['import_time']['median_ms']:.1f} ms")
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = env['timestamp'].replace(':', '').replace('-', '').split('+')[0]
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{env['commit'] or 'unknown'}.json")
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f"Results saved to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union, List
+
+from hopaas_client.Client import Client
+
+
+class AsyncClient:
+    """
+    Internal. Asynchronous counterpart of `Client`, exposing the same methods as coroutines.
+
+    Each call is delegated to the methods of a synchronous `Client` running in a
+    pool of worker threads, so that the encoding of the requests, the decoding of
+    the responses and the error handling are shared with the synchronous interface,
+    and so are the keep-alive connections of its session.
+    Many requests can be in flight at the same time, up to `max_workers`.
+
+    client: `Client`, default: `None`
+        the synchronous client to delegate to, by default the shared one (see `Client.shared`).
+
+    max_workers: `int`, default: `None`
+        maximum number of concurrent requests, defaults to the size of the connection
+        pool of the client.
+    """
+    def __init__(self,
+                 client: Union[Client, None] = None,
+                 max_workers: Union[int, None] = None
+                 ):
+        self._client = client if client is not None else Client.shared()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers if max_workers is not None else self._client.pool_maxsize,
+            thread_name_prefix="hopaas-async"
+        )
+
+    @property
+    def client(self) -> Client:
+        """The synchronous client requests are delegated to"""
+        return self._client
+
+    async def run_in_executor(self, func, *args, **kwargs):
+        """Runs a blocking function, e.g. a method of the client, in the worker threads, and returns its result"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def close(self):
+        """Stops the worker threads. The synchronous client is left open."""
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def backend_version(self):
+        """Awaitable version of the backend as obtained querying /api/version"""
+        return self.run_in_executor(lambda: self._client.backend_version)
+
+    async def register_study(self, definition: dict, definition_hash: str, force: bool = False) -> Union[str, None]:
+        """Query to /api/register_study endpoint, see `Client.register_study`"""
+        return await self.run_in_executor(self._client.register_study, definition, definition_hash, force)
+
+    async def ask(self, properties: dict) -> dict:
+        """Query to /api/ask endpoint, see `Client.ask`"""
+        return await self.run_in_executor(self._client.ask, properties)
+
+    async def ask_batch(self, properties: dict, n_trials: int) -> List[dict]:
+        """Query to /api/ask_batch endpoint, see `Client.ask_batch`"""
+        return await self.run_in_executor(self._client.ask_batch, properties, n_trials)
+
+    async def suggest(self, study_id: str, trial_id: int, properties: dict) -> dict:
+        """Query to /api/suggest endpoint, see `Client.suggest`"""
+        return await self.run_in_executor(self._client.suggest, study_id, trial_id, properties)
+
+    async def tell(self, study_id: str, trial_id: int, loss: float):
+        """Query to /api/tell endpoint, see `Client.tell`"""
+        return await self.run_in_executor(self._client.tell, study_id, trial_id, loss)
+
+    async def mark_as_failed(self, study_id: str, trial_id: int, error: str):
+        """Query to /api/mark_as_failed endpoint, see `Client.mark_as_failed`"""
+        return await self.run_in_executor(self._client.mark_as_failed, study_id, trial_id, error)
+
+    async def should_prune(self, study_id: str, trial_id: int, loss: float, step: int) -> bool:
+        """Query to /api/should_prune endpoint, see `Client.should_prune`"""
+        return await self.run_in_executor(self._client.should_prune, study_id, trial_id, loss, step)
+
+    async def report_intermediate(self, study_id: str, trial_id: int, values) -> bool:
+        """Query to /api/report_intermediate endpoint, see `Client.report_intermediate`"""
+        return await self.run_in_executor(self._client.report_intermediate, study_id, trial_id, values)
+
+    async def get_best_trial(self, study_id: str, trial_id: int) -> int:
+        """Query to /api/get_best_trial endpoint, see `Client.get_best_trial`"""
+        return await self.run_in_executor(self._client.get_best_trial, study_id, trial_id)
@@ -0,0 +1,79 @@
+import threading
+import time
+from typing import Union
+
+from hopaas_client.Exceptions import HopaasCircuitOpenError
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of `Client`, failing fast when the server is down.
+
+    After `failure_threshold` consecutive failures (the server unreachable or answering
+    with a 5xx status), the circuit opens: requests fail immediately with
+    `HopaasCircuitOpenError` instead of waiting for timeouts and retries. After
+    `reset_timeout` seconds, a single request is let through as a probe: if it
+    succeeds the circuit closes again, otherwise it stays open for another
+    `reset_timeout` seconds.
+
+    failure_threshold: `int`, default: `5`
+        number of consecutive failures opening the circuit.
+
+    reset_timeout: `float`, default: `10`
+        time, in seconds, before probing again the server.
+    """
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 10.):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._n_failures = 0
+        self._opened_at: Union[float, None] = None
+        self._probing = False
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Either `"closed"`, `"open"` or `"half-open"`"""
+        with self._lock:
+            if self._opened_at is None:
+                return CLOSED
+            if self._probing or time.monotonic() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return OPEN
+
+    def before_request(self, endpoint: Union[str, None] = None):
+        """Raises `HopaasCircuitOpenError` if the request should not be issued"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if not self._probing and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._probing = True
+                return
+
+        raise HopaasCircuitOpenError("Circuit open: the hopaas server is considered unavailable",
+                                     endpoint=endpoint)
+
+    def record_success(self):
+        with self._lock:
+            self._n_failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._n_failures += 1
+            if self._probing or self._n_failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._probing = False
@@ -1,104 +1,758 @@
 import json
+import os
+import socket
+import threading
+import time
+import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 
-from typing import Union
+from typing import TYPE_CHECKING, Union, List, Sequence, Dict, Tuple
+from urllib.parse import urlencode, urlparse
 from hopaas_client.Configurable import Configurable
-from hopaas_client.Exceptions import HopaasServerError
+from hopaas_client.Exceptions import HopaasServerError, HopaasCircuitOpenError
+from hopaas_client.Reporter import Reporter
+from hopaas_client.LeaseKeeper import LeaseKeeper
+from hopaas_client.RetryPolicy import RetryPolicy
+from hopaas_client.CircuitBreaker import CircuitBreaker
+from hopaas_client.FairScheduler import FairScheduler
+from hopaas_client.Spool import Spool
+from hopaas_client import codecs
+from hopaas_client.codecs import Codec
+from hopaas_client.metrics import Metrics
 
-import requests
+if TYPE_CHECKING:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from hopaas_client.Study import Study
+
+# Marks the arguments defaulting to the configuration file, where `None` is a legitimate value
+_DEFAULT = object()
 
 
 class Client (Configurable):
     """
     Internal. Pythonic interface to the REST APIs of hopaas.
+
+    server, token: `str`, default: `None`
+        address of the server and API token, taken by default from the environment
+        variables `HOPAAS_SERVER` and `HOPAAS_TOKEN`, or from the configuration file.
+
+    config_filename: `str`, default: `None`, force_reconfig: `bool`, default: `False`
+        configuration file, by default `.hopaasrc` (see `Configurable`). Its optional
+        `[connection]` section provides the defaults of the connection arguments below.
+
+    pool_connections, pool_maxsize, pool_block, connect_timeout, read_timeout
+        configuration of the connection pool and timeouts of the requests.
+
+    worker_id: `str`, default: `None`
+        identifier of the worker, sent along with the requests.
+
+    retry_policy: `RetryPolicy`, circuit_breaker: `CircuitBreaker`, default: `None`
+        handling of the transient failures of the server.
+
+    spool: `Spool` or `bool`, default: `None`
+        durable journal of the results, sent to the server in background.
+
+    codec: `str` or `Codec`, default: `"json"`
+        encoding of the requests (see `hopaas_client.codecs`), falling back to JSON on 415.
+
+    gzip_threshold: `int`, default: from the configuration file, else `None`
+        size in bytes above which the requests are compressed, `None` to never compress.
+
+    metrics: `Metrics`, default: `None`
+        recorder of the latency, the retries and the errors of the requests, by endpoint.
+
+    interactive: `bool`, default: `None`
+        whether to prompt for a missing configuration file, by default if stdin is a terminal.
+
+    scheduler: `FairScheduler`, default: `None`
+        caps the requests in flight, shared by the studies (see `Client.shared`).
     """
+    DEFAULT_POOL_CONNECTIONS = 1
+    DEFAULT_POOL_MAXSIZE = 10
+    DEFAULT_CONNECT_TIMEOUT = 10.
+    DEFAULT_READ_TIMEOUT = 60.
+    DEFAULT_GZIP_THRESHOLD = None
+
+    # Clients shared by the studies, by server and token (see `shared`)
+    _registry: Dict[Tuple[str, str], "Client"] = dict()
+    _registry_lock = threading.Lock()
+
     def __init__(self,
                  server: Union[str, None] = None,
                  token: Union[str, None] = None,
                  config_filename: Union[str, None] = None,
-                 force_reconfig: bool = False
+                 force_reconfig: bool = False,
+                 pool_connections: Union[int, None] = None,
+                 pool_maxsize: Union[int, None] = None,
+                 pool_block: Union[bool, None] = None,
+                 connect_timeout: Union[float, None] = None,
+                 read_timeout: Union[float, None] = None,
+                 worker_id: Union[str, None] = None,
+                 retry_policy: Union[RetryPolicy, None] = None,
+                 circuit_breaker: Union[CircuitBreaker, None] = None,
+                 spool: Union[Spool, bool, None] = None,
+                 codec: Union[str, Codec, None] = None,
+                 gzip_threshold: Union[int, None, object] = _DEFAULT,
+                 metrics: Union[Metrics, None] = None,
+                 interactive: Union[bool, None] = None,
+                 scheduler: Union[FairScheduler, None] = None,
                  ):
+        connection = dict()
+        if not force_reconfig:
+            server = server if server is not None else os.environ.get('HOPAAS_SERVER')
+            token = token if token is not None else os.environ.get('HOPAAS_TOKEN')
         if server is None or token is None:
-            Configurable.__init__(self, config_filename, force_reconfig)
+            Configurable.__init__(self, config_filename, force_reconfig, interactive)
             self.server = server if server is not None else \
                 f"{self.config['server']['address']}:{self.config['server']['port']}"
             self.token = token if token is not None else \
                 self.config['auth']['api_token']
+            if self.config.has_section('connection'):
+                connection = self.config['connection']
         else:
             self.server = server
             self.token = token
 
-        # Active studies
-        self._studies = []
+        self.pool_connections = pool_connections if pool_connections is not None else \
+            int(connection.get('pool_connections', self.DEFAULT_POOL_CONNECTIONS))
+        self.pool_maxsize = pool_maxsize if pool_maxsize is not None else \
+            int(connection.get('pool_maxsize', self.DEFAULT_POOL_MAXSIZE))
+        self.pool_block = pool_block if pool_block is not None else \
+            str(connection.get('pool_block', 'false')).lower() in ['true', 'yes', '1']
+        self.timeout = (
+            connect_timeout if connect_timeout is not None else
+            float(connection.get('connect_timeout', self.DEFAULT_CONNECT_TIMEOUT)),
+            read_timeout if read_timeout is not None else
+            float(connection.get('read_timeout', self.DEFAULT_READ_TIMEOUT)),
+        )
+
+        self.codec = codecs.get_codec(codec if codec is not None else connection.get('codec', None))
+        if gzip_threshold is _DEFAULT:
+            gzip_threshold = connection.get('gzip_threshold', self.DEFAULT_GZIP_THRESHOLD)
+            gzip_threshold = None if str(gzip_threshold).lower() in ['none', 'false', ''] else int(gzip_threshold)
+        self.gzip_threshold = gzip_threshold
+
+        self.metrics = metrics
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.circuit_breaker = circuit_breaker if circuit_breaker is not None else CircuitBreaker()
+        self.scheduler = scheduler
+
+        # The HTTP stack is imported and the pool created on the first request
+        self._lock = threading.Lock()
+        self._adapter: Union["HTTPAdapter", None] = None
+        self._local = threading.local()
+
+        # Whether the server implements /api/ask_batch, unknown until the first attempt
+        self._batch_ask_supported: Union[bool, None] = None
+
+        # Whether the server implements /api/register_study, unknown until the first attempt,
+        # and the study ids of the definitions registered, by hash
+        self._register_supported: Union[bool, None] = None
+        self._registrations: Dict[str, str] = dict()
+
+        # Whether the server implements /api/suggest, unknown until the first attempt
+        self._suggest_supported: Union[bool, None] = None
+
+        # Whether the server implements /api/trials, unknown until the first attempt
+        self._trials_supported: Union[bool, None] = None
+
+        # Whether the server implements /api/report_intermediate, unknown until the first attempt
+        self._report_intermediate_supported: Union[bool, None] = None
+
+        # Whether the server implements /api/report_batch, unknown until the first attempt
+        self._report_batch_supported: Union[bool, None] = None
+
+        # Background writer of the trial results, created on first use
+        self._reporter: Union[Reporter, None] = None
+
+        # Background renewal of the leases of the running trials, created on first use
+        self._leases: Union[LeaseKeeper, None] = None
+        self._worker_id = worker_id
+
+        # Studies issuing their requests through this client
+        self._studies: "weakref.WeakSet[Study]" = weakref.WeakSet()
+
+        # Durable journal of the results not acknowledged, resumed from the journals of dead processes
+        self._spool: Union[Spool, None] = Spool() if spool is True else (None if spool is False else spool)
+        if self._spool is not None:
+            self._spool.bind(self.server)
+            for seq, endpoint, payload in self._spool.pending:
+                self.reporter.submit('replay', endpoint=endpoint, payload=payload, seq=seq)
+
+    @classmethod
+    def shared(cls,
+               server: Union[str, None] = None,
+               token: Union[str, None] = None,
+               config_filename: Union[str, None] = None) -> "Client":
+        """
+        The client shared by all the studies of this process with the same server and token,
+        created on first use, and used by default by `Study`. The studies then share a single
+        connection pool and background reporter, and the client schedules their requests
+        with a `FairScheduler`, capping the requests in flight to `pool_maxsize`.
+        The server and the token are resolved at each call, as by the constructor.
+        """
+        key = cls._resolve(server, token, config_filename)
+        with cls._registry_lock:
+            client = cls._registry.get(key)
+            if client is None:
+                client = cls._registry[key] = cls(server=server, token=token, config_filename=config_filename)
+                if client.scheduler is None:
+                    client.scheduler = FairScheduler(max_in_flight=client.pool_maxsize)
+        return client
+
+    @classmethod
+    def _resolve(cls,
+                 server: Union[str, None],
+                 token: Union[str, None],
+                 config_filename: Union[str, None]) -> Tuple[str, str]:
+        """Internal. The server and the token of a client constructed with these arguments"""
+        server = server if server is not None else os.environ.get('HOPAAS_SERVER')
+        token = token if token is not None else os.environ.get('HOPAAS_TOKEN')
+        if server is None or token is None:
+            config = cls.load_config(config_filename if config_filename is not None else cls.get_default_cfgfile(),
+                                     force_reconfig=False)
+            server = server if server is not None else f"{config['server']['address']}:{config['server']['port']}"
+            token = token if token is not None else config['auth']['api_token']
+        return server, token
+
+    @property
+    def studies(self) -> List["Study"]:
+        """The studies issuing their requests through this client"""
+        return list(self._studies)
+
+    def _make_adapter(self) -> "HTTPAdapter":
+        """Internal. Creates the transport adapter holding the pool of keep-alive connections"""
+        from requests.adapters import HTTPAdapter
+        return HTTPAdapter(pool_connections=self.pool_connections,
+                           pool_maxsize=self.pool_maxsize,
+                           pool_block=self.pool_block)
+
+    def _make_session(self) -> "requests.Session":
+        """Internal. Creates an HTTP session issuing the requests through the shared pool"""
+        import requests
+        with self._lock:
+            if self._adapter is None:
+                self._adapter = self._make_adapter()
+        session = requests.Session()
+        session.mount('http://', self._adapter)
+        session.mount('https://', self._adapter)
+        session.headers.update({'Connection': 'keep-alive'})
+        return session
+
+    @property
+    def _session(self) -> "requests.Session":
+        """Internal. The HTTP session of the current thread"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._make_session()
+        return session
+
+    def __getstate__(self):
+        """Internal. Copies the configuration of the client, without the connections, the reporter and the metrics"""
+        state = self.__dict__.copy()
+        state.update(_lock=None, _adapter=None, _local=None, _reporter=None, _leases=None, _spool=None,
+                     metrics=None, _studies=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._adapter = None
+        self._local = threading.local()
+        self._studies = weakref.WeakSet()
+
+    def _request(self,
+                 method: str,
+                 url: str,
+                 data: Union[bytes, None] = None,
+                 headers: Union[Dict[str, str], None] = None,
+                 study: Union[str, None] = None,
+                 ) -> "requests.Response":
+        """
+        Internal. Issues a request through the pooled session, retrying transient failures.
+        Returns the response, possibly with an error status, or raises `HopaasServerError`
+        if the server could not be reached. With a scheduler, each attempt waits for a slot
+        granted fairly among the studies, `study` being the one the request is issued for.
+        """
+        parts = urlparse(url).path.split('/')
+        endpoint = parts[parts.index('api') + 1] if 'api' in parts[:-1] else None
+        headers = dict(headers or {})
+        headers['Accept'] = self.codec.content_type if self.codec is codecs.JSON else \
+            f"{self.codec.content_type}, {codecs.JSON.content_type};q=0.5"
+        if method == 'POST':
+            # The same key identifies all the attempts of the request
+            headers['Idempotency-Key'] = uuid.uuid4().hex
+        metrics = self.metrics
+        if metrics is None:
+            return self._attempts(method, url, endpoint, data, headers, study)
+
+        wall_start, start = time.time(), time.monotonic()
+        status, error = None, None
+        try:
+            res = self._attempts(method, url, endpoint, data, headers, study)
+            status = str(res.status_code)
+            if res.status_code >= 400:
+                error = status
+            return res
+        except HopaasCircuitOpenError:
+            error = 'circuit_open'
+            raise
+        except HopaasServerError:
+            error = 'connection'
+            raise
+        finally:
+            latency = time.monotonic() - start
+            if status is not None:
+                metrics.inc('hopaas_requests_total', endpoint=endpoint, status=status)
+            if error is not None:
+                metrics.inc('hopaas_errors_total', endpoint=endpoint, kind=error)
+            metrics.observe('hopaas_request_seconds', latency, endpoint=endpoint)
+            metrics.span(f"hopaas.{endpoint}", wall_start, latency,
+                         endpoint=endpoint, status=status if status is not None else error)
+
+    def _attempts(self,
+                  method: str,
+                  url: str,
+                  endpoint: Union[str, None],
+                  data: Union[bytes, None],
+                  headers: Dict[str, str],
+                  study: Union[str, None] = None,
+                  ) -> "requests.Response":
+        """Internal. Body of `_request`, attempting the request according to the retry policy"""
+        import requests
+        policy = self.retry_policy
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            self.circuit_breaker.before_request(endpoint)
+            try:
+                if self.scheduler is None:
+                    res = self._session.request(method, url, data=data, headers=headers, timeout=self.timeout)
+                else:
+                    with self.scheduler.slot(study):
+                        res = self._session.request(method, url, data=data, headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                self.circuit_breaker.record_failure()
+                transient = isinstance(e, (requests.ConnectionError, requests.Timeout,
+                                           requests.exceptions.ChunkedEncodingError))
+                if not transient or attempt >= policy.max_retries:
+                    # Neither the message nor the cause: both carry the URL, and the API token with it
+                    raise HopaasServerError(f"{type(e).__name__} on /api/{endpoint}",
+                                            endpoint=endpoint, latency=time.monotonic() - start) from None
+                retry_after = None
+            except BaseException:
+                # Any other way out, e.g. an interrupt, still ends the probe of a half-open circuit
+                self.circuit_breaker.record_failure()
+                raise
+            else:
+                if res.status_code >= 500:
+                    self.circuit_breaker.record_failure()
+                else:
+                    self.circuit_breaker.record_success()
+                if res.status_code not in policy.retry_statuses or attempt >= policy.max_retries:
+                    res.hopaas_endpoint, res.hopaas_latency = endpoint, time.monotonic() - start
+                    return res
+                retry_after = res.headers.get('Retry-After')
+
+            if self.metrics is not None:
+                self.metrics.inc('hopaas_retries_total', endpoint=endpoint)
+            time.sleep(policy.backoff(attempt, retry_after))
+            attempt += 1
+
+    @staticmethod
+    def _error(res: "requests.Response", message: Union[str, None] = None) -> HopaasServerError:
+        """Internal. The error describing an unexpected response"""
+        return HopaasServerError(message,
+                                 status_code=res.status_code,
+                                 endpoint=getattr(res, 'hopaas_endpoint', None),
+                                 latency=getattr(res, 'hopaas_latency', None))
+
+    def _get(self, url: str, study: Union[str, None] = None) -> "requests.Response":
+        """Internal. GET request through the pooled session"""
+        return self._request('GET', url, study=study)
+
+    def _post(self, url: str, payload: dict) -> "requests.Response":
+        """Internal. POST request with an encoded body through the pooled session"""
+        with self._lock:
+            codec, gzip_threshold = self.codec, self.gzip_threshold
+        body = codec.encode(payload)
+        headers = {'Content-Type': codec.content_type}
+        if gzip_threshold is not None and len(body) > gzip_threshold:
+            body = codecs.compress(body)
+            headers['Content-Encoding'] = 'gzip'
+
+        study = self._study_of(payload) if self.scheduler is not None else None
+        res = self._request('POST', url, body, headers, study)
+        if res.status_code == 415 and (codec is not codecs.JSON or 'Content-Encoding' in headers):
+            # Older server, only accepting plain JSON
+            with self._lock:
+                self.codec, self.gzip_threshold = codecs.JSON, None
+            return self._post(url, payload)
+        return res
+
+    @staticmethod
+    def _study_of(payload: dict) -> Union[str, None]:
+        """Internal. The study a request is issued for: its id, or its title before registration"""
+        for nested in ['properties', 'definition']:
+            if isinstance(payload.get(nested), dict):
+                payload = payload[nested]
+        if 'hopaas_trial' in payload:
+            return str(payload['hopaas_trial']).split(':')[0]
+        if 'hopaas_study' in payload:
+            return payload['hopaas_study']
+        config = payload.get('hopaas_config')
+        return config.get('title') if isinstance(config, dict) else None
+
+    @staticmethod
+    def _decode(res: "requests.Response"):
+        """Internal. Decodes the body of a response, according to its content type"""
+        codec = codecs.for_content_type(res.headers.get('Content-Type'))
+        if codec is None or codec is codecs.JSON:
+            return json.loads(res.text)
+        return codec.decode(res.content)
+
+    @property
+    def reporter(self) -> Reporter:
+        """The background writer sending the results of the trials asynchronously"""
+        with self._lock:
+            if self._reporter is None:
+                self._reporter = Reporter(self)
+        return self._reporter
+
+    @property
+    def spool(self) -> Union[Spool, None]:
+        """The journal of the results not acknowledged by the server, if any"""
+        return self._spool
+
+    @property
+    def leases(self) -> LeaseKeeper:
+        """The background thread renewing the leases of the running trials"""
+        with self._lock:
+            if self._leases is None:
+                self._leases = LeaseKeeper(self)
+        return self._leases
+
+    @property
+    def worker_id(self) -> str:
+        """Identifier of this worker, owning the leases of its trials, by default `hostname:pid`"""
+        if self._worker_id is not None:
+            return self._worker_id
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def close(self):
+        """
+        Flushes the pending results, exports the metrics and releases the connections of the pool.
+        Raises `HopaasError` if results could not be reported, see `Reporter.flush`.
+        """
+        try:
+            if self._reporter is not None:
+                self._reporter.flush()
+        finally:
+            if self.metrics is not None:
+                self.metrics.export()
+            if self._spool is not None:
+                self._spool.close()
+            if self._adapter is not None:
+                self._adapter.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
 
     @property
     def backend_version(self):
         """Version of the backend as obtained querying /api/version"""
-        res = requests.get(f"{self.server}/api/version")
+        res = self._get(f"{self.server}/api/version")
         if res.status_code == 200:
             return res.text
 
-        raise HopaasServerError(res.status_code)
+        raise self._error(res)
+
+    def register_study(self, definition: dict, definition_hash: str, force: bool = False) -> Union[str, None]:
+        """
+        Query to /api/register_study endpoint, registering the definition of a study (the body
+        of /api/ask) with its content hash, so that the following asks may send only
+        `hopaas_study` and `hopaas_definition` (the hash). Returns the `study_id`, or None if
+        the server does not implement it. A definition is registered only once per client,
+        unless `force` is True (e.g. after the server answered 409 to an ask).
+        """
+        if self._register_supported is False:
+            return None
+        if not force and definition_hash in self._registrations:
+            return self._registrations[definition_hash]
+
+        res = self._post(f"{self.server}/api/register_study/{self.token}",
+                         dict(definition=definition, hash=definition_hash))
+
+        if res.status_code in [404, 405]:
+            self._register_supported = False
+            return None
+        elif res.status_code != 200:
+            raise self._error(res)
+
+        self._register_supported = True
+        study_id = self._decode(res)['study_id']
+        self._registrations[definition_hash] = study_id
+        return study_id
 
     def ask(self, properties: dict) -> dict:
         """Query to /api/ask endpoint, providing token and study properties, to initialize a new trial"""
-        res = requests.post(f"{self.server}/api/ask/{self.token}",
-                            data=json.dumps(properties))
+        res = self._post(f"{self.server}/api/ask/{self.token}", properties)
 
         if res.status_code == 200:
-            return json.loads(res.text)
+            return self._decode(res)
 
-        raise HopaasServerError(res.status_code)
+        raise self._error(res)
+
+    def ask_batch(self, properties: dict, n_trials: int) -> List[dict]:
+        """
+        Initializes `n_trials` new trials at once, querying the /api/ask_batch endpoint.
+
+        If the server does not implement batched asks, the client falls back
+        (once and for all) to `n_trials` concurrent queries to /api/ask.
+        """
+        if self._batch_ask_supported is not False:
+            res = self._post(f"{self.server}/api/ask_batch/{self.token}",
+                             dict(n_trials=n_trials, properties=properties))
+
+            if res.status_code == 200:
+                self._batch_ask_supported = True
+                return self._decode(res)
+            elif res.status_code not in [404, 405]:
+                raise self._error(res)
+
+            self._batch_ask_supported = False
+
+        with ThreadPoolExecutor(max_workers=max(1, min(n_trials, self.pool_maxsize))) as executor:
+            return list(executor.map(self.ask, [properties] * n_trials))
+
+    def suggest(self, study_id: str, trial_id: int, properties: dict) -> dict:
+        """
+        Query to /api/suggest endpoint, sampling the (stringified) suggestions `properties` for
+        a running trial, as they are defined by run. The values already suggested to the trial
+        are returned unchanged. Raises `HopaasServerError` if the server does not implement it.
+        """
+        if self._suggest_supported is False:
+            raise HopaasServerError("Define-by-run suggestions not supported by the server",
+                                    status_code=404, endpoint='suggest')
+
+        res = self._post(f"{self.server}/api/suggest/{self.token}",
+                         dict(hopaas_trial=f"{study_id}:{trial_id}", properties=properties))
+
+        if res.status_code in [404, 405]:
+            self._suggest_supported = False
+            raise self._error(res, "Define-by-run suggestions not supported by the server")
+        elif res.status_code != 200:
+            raise self._error(res)
+
+        self._suggest_supported = True
+        return self._decode(res)
 
     def tell(self, study_id: str, trial_id: int, loss: float):
         """Query to /api/tell endpoint, providing a trial id, to complete an ongoing trial"""
-        res = requests.post(f"{self.server}/api/tell/{self.token}",
-                            data=json.dumps(dict(
-                                hopaas_trial=f"{study_id}:{trial_id}",
-                                loss=loss
-                            )))
-
-        if res.status_code != 200:
-            raise HopaasServerError
+        self._spooled('tell', dict(
+            hopaas_trial=f"{study_id}:{trial_id}",
+            loss=loss
+        ))
 
     def mark_as_failed(self, study_id: str, trial_id: int, error: str):
         """Query to /api/mark_as_failed endpoint, providing a trial id, to inform hopaas that the trial failed"""
-        res = requests.post(f"{self.server}/api/mark_as_failed/{self.token}",
-                            data=json.dumps(dict(
-                                hopaas_trial=f"{study_id}:{trial_id}",
-                                error=error
-                            )))
+        self._spooled('mark_as_failed', dict(
+            hopaas_trial=f"{study_id}:{trial_id}",
+            error=error
+        ))
+
+    def _spooled(self, endpoint: str, payload: dict):
+        """Internal. Sends a request, or records it in the spool and queues it to the reporter"""
+        if self._spool is None:
+            return self.replay(endpoint, payload)
+
+        seq = self._spool.append(endpoint, payload)
+        self.reporter.submit('replay', endpoint=endpoint, payload=payload, seq=seq)
+
+    def replay(self, endpoint: str, payload: dict, seq: Union[int, None] = None):
+        """
+        Sends a request recorded in the spool, acknowledging the record `seq` once the server
+        accepted it. Requests rejected by the server (4xx, but for the `retry_statuses` of
+        the retry policy) are acknowledged as well, and raise.
+        """
+        res = self._post(f"{self.server}/api/{endpoint}/{self.token}", payload)
+        self._acknowledge(seq, res.status_code)
 
         if res.status_code != 200:
-            raise HopaasServerError
+            raise self._error(res)
+
+    def _acknowledge(self, seq: Union[int, None], status_code: int):
+        """Internal. Acknowledges the spool record `seq` if the server accepted it, or rejected it for good"""
+        rejected = 400 <= status_code < 500 and status_code not in self.retry_policy.retry_statuses
+        if seq is not None and self._spool is not None and (200 <= status_code < 300 or rejected):
+            self._spool.ack(seq)
+
+    def report_batch(self, calls: List[Tuple[str, dict]]) -> List[Union[Exception, None]]:
+        """
+        Sends the results queued to the reporter, as `(method, kwargs)` calls of `tell`,
+        `mark_as_failed` or `replay`, with a single query to /api/report_batch. Returns,
+        for each call, None if it succeeded, or the error it failed with. Any other call
+        is made on its own.
+
+        If the server does not implement batched reports, the client falls back
+        (once and for all) to one query per call.
+        """
+        requests = [self._batched_request(method, kwargs) for method, kwargs in calls]
+        batched = [i for i, request in enumerate(requests) if request is not None]
+        if self._report_batch_supported is not False and len(batched) > 0:
+            res = self._post(f"{self.server}/api/report_batch/{self.token}",
+                             dict(requests=[dict(endpoint=requests[i][0], payload=requests[i][1]) for i in batched]))
+
+            if res.status_code == 200:
+                self._report_batch_supported = True
+                ret: List[Union[Exception, None]] = [None] * len(calls)
+                for i, answer in zip(batched, self._decode(res)):
+                    endpoint, _, seq = requests[i]
+                    self._acknowledge(seq, answer['status'])
+                    if answer['status'] != 200:
+                        ret[i] = HopaasServerError(answer.get('detail'), status_code=answer['status'],
+                                                   endpoint=endpoint)
+                for i in set(range(len(calls))) - set(batched):
+                    ret[i] = self._call(*calls[i])
+                return ret
+            elif res.status_code not in [404, 405]:
+                raise self._error(res)
+
+            self._report_batch_supported = False
+
+        return [self._call(method, kwargs) for method, kwargs in calls]
+
+    def _call(self, method: str, kwargs: dict) -> Union[Exception, None]:
+        """Internal. Calls `method` with the keyword arguments `kwargs`, returning the error raised, if any"""
+        try:
+            getattr(self, method)(**kwargs)
+        except Exception as e:
+            return e
+        return None
+
+    def _batched_request(self, method: str, kwargs: dict) -> Union[Tuple[str, dict, Union[int, None]], None]:
+        """Internal. The `(endpoint, payload, seq)` of a call of `report_batch`, None if it cannot be batched"""
+        if method == 'replay':
+            return kwargs['endpoint'], kwargs['payload'], kwargs.get('seq')
+        if method in ['tell', 'mark_as_failed'] and self._spool is None:
+            fields = dict(kwargs)
+            hopaas_trial = f"{fields.pop('study_id')}:{fields.pop('trial_id')}"
+            return method, dict(hopaas_trial=hopaas_trial, **fields), None
+        return None
 
     def should_prune(self, study_id: str, trial_id: int, loss: float, step: int):
         """Query to /api/should_prune endpoint, providing an intermediate result and requesting if the trial is worth"""
-        res = requests.post(f"{self.server}/api/should_prune/{self.token}",
-                            data=json.dumps(dict(
-                                hopaas_trial=f"{study_id}:{trial_id}",
-                                loss=loss,
-                                step=step
-                            )))
+        try:
+            return self._should_prune(study_id, trial_id, loss, step)
+        except HopaasServerError as e:
+            # Offline with a spool, the trial is continued rather than blocked on the server
+            if self._spool is None or e.status_code is not None:
+                raise
+            return False
+
+    def _should_prune(self, study_id: str, trial_id: int, loss: float, step: int) -> bool:
+        """Internal. Body of `should_prune`"""
+        res = self._post(f"{self.server}/api/should_prune/{self.token}",
+                         dict(
+                             hopaas_trial=f"{study_id}:{trial_id}",
+                             loss=loss,
+                             step=step
+                         ))
 
         if res.status_code != 200:
-            raise HopaasServerError
+            raise self._error(res)
 
-        if res.text.lower() not in ['true', 'false']:
-            raise HopaasServerError
+        answer = res.text if codecs.for_content_type(res.headers.get('Content-Type')) in [None, codecs.JSON] \
+            else str(self._decode(res))
+        if answer.lower() not in ['true', 'false']:
+            raise self._error(res, f"Unexpected response from /api/should_prune: {answer!r}")
 
-        if res.text.lower() == 'true':
+        if answer.lower() == 'true':
             return True
         else:
             return False
 
+    def report_intermediate(self, study_id: str, trial_id: int, values: Sequence[Sequence[float]]) -> bool:
+        """
+        Query to /api/report_intermediate endpoint, uploading a chunk of intermediate values
+        of an ongoing trial as `(step, loss, timestamp)` triplets, without any pruning decision.
+
+        Returns False, and gives up on further uploads, if the server does not implement it:
+        the intermediate values then reach the server only through `should_prune`.
+        """
+        if self._report_intermediate_supported is False:
+            return False
+
+        res = self._post(f"{self.server}/api/report_intermediate/{self.token}",
+                         dict(
+                             hopaas_trial=f"{study_id}:{trial_id}",
+                             intermediate_values=[[int(step), float(loss), float(timestamp)]
+                                                  for step, loss, timestamp in values]
+                         ))
+
+        if res.status_code in [404, 405]:
+            self._report_intermediate_supported = False
+            return False
+        elif res.status_code != 200:
+            raise self._error(res)
+
+        self._report_intermediate_supported = True
+        return True
+
+    def heartbeat(self, leases: Dict[str, float]) -> Union[List[str], None]:
+        """
+        Query to /api/heartbeat endpoint, renewing the leases of the running trials of this worker,
+        given as a dictionary from `"study_id:trial_id"` to the duration of the lease in seconds.
+
+        Returns the trials whose lease was lost, or None if the server does not implement leases.
+        """
+        res = self._post(f"{self.server}/api/heartbeat/{self.token}",
+                         dict(worker=self.worker_id, leases=leases))
+
+        if res.status_code in [404, 405]:
+            return None
+        elif res.status_code != 200:
+            raise self._error(res)
+
+        return self._decode(res)
+
     def get_best_trial(self, study_id: str, trial_id: int) -> int:
         """Query /api/get_best_trial to return the best trial of a given study"""
-        res = requests.get(f"{self.server}/api/get_best_trial/{self.token}?hopaas_trial={study_id}:{trial_id}")
+        res = self._get(f"{self.server}/api/get_best_trial/{self.token}?hopaas_trial={study_id}:{trial_id}",
+                        study_id)
         if res.status_code != 200:
-            raise HopaasServerError
+            raise self._error(res)
 
-        b_study_id, b_trial_id = json.loads(res.text).split(":")
+        b_study_id, b_trial_id = self._decode(res).split(":")
         if study_id != b_study_id:
-            raise HopaasServerError
+            raise self._error(res, f"Best trial of study {b_study_id} returned for study {study_id}")
 
         return int(b_trial_id)
+
+    def get_trials(self, study_id: str, since: Union[str, None] = None) -> Union[dict, None]:
+        """
+        Query /api/trials for the trials of a given study updated after the opaque cursor `since`,
+        or all of them if `since` is None. Returns a dictionary with the updated `trials` and the
+        `cursor` of the next incremental query, or None if the server does not implement it.
+        """
+        if self._trials_supported is False:
+            return None
+
+        query = dict(hopaas_study=study_id)
+        if since is not None:
+            query['since'] = since
+        res = self._get(f"{self.server}/api/trials/{self.token}?{urlencode(query)}", study_id)
+
+        if res.status_code in [404, 405]:
+            self._trials_supported = False
+            return None
+        elif res.status_code != 200:
+            raise self._error(res)
+
+        self._trials_supported = True
+        return self._decode(res)
@@ -1,19 +1,34 @@
+import logging
 import os.path
+import sys
 from os import environ
 
 from typing import Union
 from configparser import ConfigParser
 
+from hopaas_client.Exceptions import HopaasConfigurationError
+
+logger = logging.getLogger(__name__)
+
 
 class Configurable:
-    def __init__(self, config_filename: Union[str, None] = None, force_reconfig: bool = False):
+    def __init__(self,
+                 config_filename: Union[str, None] = None,
+                 force_reconfig: bool = False,
+                 interactive: Union[bool, None] = None):
         self._config_filename = config_filename if config_filename is not None else self.get_default_cfgfile()
-        print (f"Using config file {self._config_filename}")
-        self.config = self.load_config(self._config_filename, force_reconfig)
+        logger.info("Using config file %s", self._config_filename)
+        self.config = self.load_config(self._config_filename, force_reconfig, interactive)
 
     @staticmethod
-    def load_config(config_filename: str, force_reconfig: bool) -> ConfigParser:
+    def load_config(config_filename: str, force_reconfig: bool, interactive: Union[bool, None] = None) -> ConfigParser:
         if force_reconfig or not os.path.exists(config_filename):
+            if not Configurable.is_interactive(interactive):
+                raise HopaasConfigurationError(
+                    f"Configuration file {config_filename} not found and the user cannot be prompted: "
+                    f"set the environment variables HOPAAS_SERVER and HOPAAS_TOKEN, "
+                    f"or pass server and token to the client"
+                )
             prompt_user_for_config(config_filename=config_filename)
 
         config = ConfigParser()
@@ -21,6 +36,22 @@ class Configurable:
 
         return config
 
+    @staticmethod
+    def is_interactive(interactive: Union[bool, None] = None) -> bool:
+        """
+        Whether the user can be prompted for the configuration: `interactive` if not None,
+        otherwise False if the environment variable `HOPAAS_NONINTERACTIVE` is set (to anything
+        but `0`), otherwise whether the standard input is a terminal.
+        """
+        if interactive is not None:
+            return interactive
+        if environ.get('HOPAAS_NONINTERACTIVE', '0') not in ['', '0']:
+            return False
+        try:
+            return sys.stdin is not None and sys.stdin.isatty()
+        except (AttributeError, ValueError):
+            return False
+
     @staticmethod
     def get_default_cfgfile() -> str:
         if 'HOPAAS_CONFIG_FILE' in environ:
@@ -44,4 +75,3 @@ def prompt_user_for_config(config_filename: str) -> None:
 
     with open(config_filename, 'w') as configfile:
         parser.write(configfile)
-
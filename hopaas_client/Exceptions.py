@@ -1,8 +1,47 @@
+from typing import Union
+
+
 class HopaasError (RuntimeError):
     pass
 
 class HopaasServerError(HopaasError):
+    """
+    Error answering a request to the hopaas server.
+
+    status_code: `int`
+        HTTP status of the response, `None` if no response was received.
+
+    endpoint: `str`
+        name of the API endpoint, e.g. `"tell"`.
+
+    latency: `float`
+        time in seconds spent on the request, including retries.
+    """
+    def __init__(self,
+                 message=None,
+                 status_code: Union[int, None] = None,
+                 endpoint: Union[str, None] = None,
+                 latency: Union[float, None] = None):
+        if message is None:
+            message = f"HTTP {status_code} from /api/{endpoint}" if endpoint is not None else status_code
+        super().__init__(*([] if message is None else [message]))
+        self.status_code = status_code
+        self.endpoint = endpoint
+        self.latency = latency
+
+    def __str__(self):
+        message = super().__str__()
+        if self.latency is not None:
+            message += f" (after {self.latency:.3f} s)"
+        return message
+
+class HopaasCircuitOpenError(HopaasServerError):
+    """Request not issued because the server is considered unavailable, see `CircuitBreaker`"""
     pass
 
 class HopaasConsistencyError(HopaasError):
     pass
+
+class HopaasConfigurationError(HopaasError):
+    """The client is not configured, and the user cannot be prompted for the configuration"""
+    pass
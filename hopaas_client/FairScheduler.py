@@ -0,0 +1,82 @@
+import collections
+import contextlib
+import threading
+from typing import Deque, Dict, Hashable
+
+
+class FairScheduler:
+    """
+    Scheduler of the requests of `Client`, capping the number of requests in flight.
+
+    Each request is issued on behalf of a study (its key, e.g. the study id). When all
+    the `max_in_flight` slots are taken, the requests wait in a queue per study, and the
+    slots released are granted to the studies in round-robin, so that a study issuing
+    many requests (e.g. prefetching trials) cannot starve the others sharing the client.
+
+    max_in_flight: `int`, default: `8`
+        maximum number of requests in flight at any time.
+    """
+    def __init__(self, max_in_flight: int = 8):
+        if max_in_flight < 1:
+            raise ValueError(f"Invalid max_in_flight {max_in_flight}, at least one request is needed")
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        # Requests waiting for a slot, by study, in the order the studies are served
+        self._waiting: Dict[Hashable, Deque[threading.Event]] = collections.OrderedDict()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(_lock=None, _in_flight=0, _waiting=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._waiting = collections.OrderedDict()
+
+    @property
+    def in_flight(self) -> int:
+        """Number of slots taken"""
+        with self._lock:
+            return self._in_flight
+
+    @property
+    def n_waiting(self) -> int:
+        """Number of requests waiting for a slot"""
+        with self._lock:
+            return sum(len(queue) for queue in self._waiting.values())
+
+    def acquire(self, key: Hashable = None):
+        """Waits for a slot for a request of the study `key`"""
+        with self._lock:
+            if self._in_flight < self.max_in_flight and len(self._waiting) == 0:
+                self._in_flight += 1
+                return
+            granted = threading.Event()
+            self._waiting.setdefault(key, collections.deque()).append(granted)
+        # The slot is handed over by `release`, without being freed in between
+        granted.wait()
+
+    def release(self):
+        """Frees a slot, or hands it over to the next study in the round-robin"""
+        with self._lock:
+            if len(self._waiting) == 0:
+                self._in_flight -= 1
+                return
+            key = next(iter(self._waiting))
+            queue = self._waiting.pop(key)
+            granted = queue.popleft()
+            if len(queue):
+                # Served: the study waits for its next turn at the end of the round
+                self._waiting[key] = queue
+        granted.set()
+
+    @contextlib.contextmanager
+    def slot(self, key: Hashable = None):
+        """Context manager holding a slot for a request of the study `key`"""
+        self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release()
@@ -1,13 +1,68 @@
-from dataclasses import dataclass
-from typing import Dict, Any
+from types import MappingProxyType
+from typing import Mapping, Any, Union
 
 
-@dataclass(frozen=True)
 class FrozenTrial:
     """
     A copy read-only of a trial.
+
+    When obtained from `Study.trials`, it is a lightweight view on a row of the
+    `TrialStore` of the study: the loss and the properties are read from the
+    store on access, and reflect the latest updates of a running trial.
     """
-    study_id: str
-    trial_id: int
-    loss: float
-    properties: Dict[str, Any]
\ No newline at end of file
+    __slots__ = ('_study_id', '_trial_id', '_loss', '_properties', '_store', '_row')
+
+    def __init__(self, study_id: str, trial_id: int, loss: Union[float, None], properties: Mapping[str, Any]):
+        self._study_id = study_id
+        self._trial_id = trial_id
+        self._loss = loss
+        self._properties = MappingProxyType(dict(properties))
+        self._store = None
+        self._row = None
+
+    @classmethod
+    def view(cls, store, row: int) -> "FrozenTrial":
+        """Internal. A view on the row `row` of a `TrialStore`"""
+        trial = cls.__new__(cls)
+        trial._study_id = store.study_id
+        trial._trial_id = store.trial_id(row)
+        trial._loss = None
+        trial._properties = None
+        trial._store = store
+        trial._row = row
+        return trial
+
+    @property
+    def study_id(self) -> str:
+        return self._study_id
+
+    @property
+    def trial_id(self) -> int:
+        return self._trial_id
+
+    @property
+    def loss(self) -> Union[float, None]:
+        if self._store is not None:
+            return self._store.loss(self._row)
+        return self._loss
+
+    @property
+    def properties(self) -> Mapping[str, Any]:
+        if self._store is not None:
+            return MappingProxyType(self._store.properties(self._row))
+        return self._properties
+
+    def _key(self):
+        return self.study_id, self.trial_id, self.loss, dict(self.properties)
+
+    def __eq__(self, other):
+        if not isinstance(other, FrozenTrial):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        return hash((self.study_id, self.trial_id))
+
+    def __repr__(self):
+        return (f"FrozenTrial(study_id={self.study_id!r}, trial_id={self.trial_id!r}, "
+                f"loss={self.loss!r}, properties={dict(self.properties)!r})")
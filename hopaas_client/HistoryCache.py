@@ -0,0 +1,161 @@
+import json
+import os.path
+import sqlite3
+import threading
+import time
+from typing import Union, List, Dict, Any
+
+from hopaas_client.Configurable import Configurable
+from hopaas_client.FrozenTrial import FrozenTrial
+
+RUNNING = 'running'
+COMPLETE = 'complete'
+PRUNED = 'pruned'
+FAILED = 'failed'
+
+# A trial known to be over is never brought back to running by a late update (e.g. with `async_report`)
+_UPSERT = f"""
+    INSERT INTO trials (study_id, trial_id, state, loss, properties) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (study_id, trial_id) DO UPDATE SET
+        state = CASE WHEN excluded.state = '{RUNNING}' THEN trials.state ELSE excluded.state END,
+        loss = CASE WHEN excluded.state = '{RUNNING}' THEN trials.loss ELSE excluded.loss END,
+        properties = COALESCE(excluded.properties, trials.properties)
+"""
+
+
+class HistoryCache:
+    """
+    Local, on-disk, write-through cache of the history of the studies, keyed by `study_id`.
+
+    The trials run in this process are recorded as they start and end, and the trials
+    run elsewhere are fetched from the server incrementally, asking only for the updates
+    since the previous synchronization (see `Client.get_trials`). Queries on the best
+    trial and on the history are answered by the cache, synchronizing it first only
+    if the latest synchronization is older than `max_staleness` seconds.
+
+    If the server does not expose the history of the studies, the best trial is
+    obtained from the server, and then cached for `max_staleness` seconds.
+
+    path: `str`, default: `None`
+        path to the SQLite database, by default `.hopaas_history.sqlite` next to the
+        configuration file.
+
+    max_staleness: `float`, default: `30`
+        maximum age, in seconds, of the answers obtained from the cache.
+    """
+    def __init__(self, path: Union[str, None] = None, max_staleness: float = 30.):
+        self.path = path if path is not None else os.path.join(
+            os.path.dirname(os.path.abspath(Configurable.get_default_cfgfile())), ".hopaas_history.sqlite"
+        )
+        self.max_staleness = max_staleness
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS trials (
+                study_id TEXT NOT NULL,
+                trial_id INTEGER NOT NULL,
+                state TEXT NOT NULL,
+                loss REAL,
+                properties TEXT,
+                PRIMARY KEY (study_id, trial_id)
+            );
+            CREATE INDEX IF NOT EXISTS trials_by_loss ON trials (study_id, state, loss);
+            CREATE TABLE IF NOT EXISTS syncs (
+                study_id TEXT PRIMARY KEY,
+                cursor TEXT,
+                synced_at REAL,
+                best_trial_id INTEGER
+            );
+        """)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def record(self,
+               study_id: str,
+               trial_id: int,
+               state: str,
+               loss: Union[float, None] = None,
+               properties: Union[Dict[str, Any], None] = None):
+        """Writes the state of a trial, keeping the properties already known if not provided"""
+        with self._lock:
+            self._db.execute(
+                _UPSERT,
+                (study_id, trial_id, state, loss, None if properties is None else json.dumps(properties))
+            )
+
+    def is_stale(self, study_id: str) -> bool:
+        """True if the cache of the study was never synchronized or not recently enough"""
+        with self._lock:
+            row = self._db.execute("SELECT synced_at FROM syncs WHERE study_id = ?", (study_id,)).fetchone()
+        return row is None or row[0] is None or time.time() - row[0] > self.max_staleness
+
+    def sync(self, client, study_id: str, force: bool = False):
+        """Fetches from the server the updates of the study since the previous synchronization"""
+        if not force and not self.is_stale(study_id):
+            return
+
+        with self._lock:
+            row = self._db.execute("SELECT cursor FROM syncs WHERE study_id = ?", (study_id,)).fetchone()
+        cursor = row[0] if row is not None else None
+
+        updates = client.get_trials(study_id, since=cursor)
+        if updates is None:
+            best_trial_id = client.get_best_trial(study_id, 0)
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO syncs (study_id, cursor, synced_at, best_trial_id) VALUES (?, ?, ?, ?)",
+                    (study_id, cursor, time.time(), best_trial_id)
+                )
+            return
+
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                _UPSERT,
+                [(study_id, int(t['trial_id']), t['state'], t.get('loss'),
+                  None if t.get('properties') is None else json.dumps(t['properties']))
+                 for t in updates['trials']]
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO syncs (study_id, cursor, synced_at, best_trial_id) VALUES (?, ?, ?, NULL)",
+                (study_id, updates.get('cursor'), time.time())
+            )
+            self._db.execute("COMMIT")
+
+    def best_trial_id(self, study_id: str, direction: str = 'minimize') -> Union[int, None]:
+        """The id of the completed trial with the best loss, None if there are none"""
+        with self._lock:
+            row = self._db.execute("SELECT best_trial_id FROM syncs WHERE study_id = ?", (study_id,)).fetchone()
+        if row is not None and row[0] is not None:
+            return int(row[0])
+
+        top = self.top_trials(study_id, 1, direction)
+        return top[0].trial_id if len(top) else None
+
+    def top_trials(self, study_id: str, k: int, direction: str = 'minimize') -> List[FrozenTrial]:
+        """The `k` completed trials with the best loss"""
+        order = 'DESC' if direction == 'maximize' else 'ASC'
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT trial_id, loss, properties FROM trials WHERE study_id = ? AND state = ? "
+                f"ORDER BY loss {order} LIMIT ?", (study_id, COMPLETE, k)
+            ).fetchall()
+        return [self._frozen(study_id, *row) for row in rows]
+
+    def trials(self, study_id: str, state: Union[str, None] = None) -> Dict[int, FrozenTrial]:
+        """All the trials of the study known to the cache, possibly filtered by state"""
+        query = "SELECT trial_id, loss, properties FROM trials WHERE study_id = ?"
+        args = (study_id,)
+        if state is not None:
+            query += " AND state = ?"
+            args += (state,)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY trial_id", args).fetchall()
+        return {row[0]: self._frozen(study_id, *row) for row in rows}
+
+    @staticmethod
+    def _frozen(study_id: str, trial_id: int, loss: Union[float, None], properties: Union[str, None]):
+        return FrozenTrial(study_id, trial_id, loss, json.loads(properties) if properties is not None else dict())
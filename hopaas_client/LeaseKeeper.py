@@ -0,0 +1,79 @@
+import threading
+from typing import Dict, Set, Union
+
+
+class LeaseKeeper:
+    """
+    Internal. Background thread renewing the leases of the trials running in this process.
+
+    A study created with a `lease` asks the server to consider each of its trials owned by
+    this worker (see `Client.worker_id`) for `lease` seconds only. The leases of all the
+    running trials are renewed together with a heartbeat every `lease / 3` seconds, and a
+    trial stops being renewed when it ends. If the worker dies, its leases expire and the
+    server can mark its trials as failed, instead of keeping them running forever.
+
+    Trials whose lease was lost (e.g. because of a long network outage) are reported
+    by the server in the response to the heartbeat, see `is_lost`.
+    """
+    def __init__(self, client):
+        self._client = client
+        self._leases: Dict[str, float] = dict()
+        self._lost: Set[str] = set()
+        self._lock = threading.Lock()
+        self._wake_up = threading.Event()
+        self._thread: Union[threading.Thread, None] = None
+        self._supported = True
+
+    @property
+    def active(self) -> Dict[str, float]:
+        """The leases being renewed, as a dictionary from `"study_id:trial_id"` to their duration"""
+        with self._lock:
+            return dict(self._leases)
+
+    def acquire(self, hopaas_trial: str, duration: float):
+        """Starts renewing the lease of a trial, every `duration / 3` seconds at least"""
+        with self._lock:
+            # The heartbeat thread recomputes its interval if it gets shorter
+            if len(self._leases) == 0 or duration < min(self._leases.values()):
+                self._wake_up.set()
+            self._leases[hopaas_trial] = duration
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="hopaas-heartbeat", daemon=True)
+                self._thread.start()
+
+    def release(self, hopaas_trial: str):
+        """Stops renewing the lease of a trial"""
+        with self._lock:
+            self._leases.pop(hopaas_trial, None)
+            self._lost.discard(hopaas_trial)
+
+    def is_lost(self, hopaas_trial: str) -> bool:
+        """True if the server reported that the lease of the trial expired"""
+        return hopaas_trial in self._lost
+
+    def heartbeat(self):
+        """Renews at once all the leases"""
+        leases = self.active
+        if len(leases) == 0 or not self._supported:
+            return
+
+        lost = self._client.heartbeat(leases)
+        if lost is None:
+            self._supported = False
+            return
+
+        with self._lock:
+            self._lost.update(t for t in lost if t in self._leases)
+
+    def _run(self):
+        """Internal. Body of the heartbeat thread"""
+        while self._supported:
+            leases = self.active
+            if self._wake_up.wait(min(leases.values()) / 3. if len(leases) else None):
+                self._wake_up.clear()
+                continue
+            try:
+                self.heartbeat()
+            except Exception:
+                # Failed heartbeats are retried at the next interval, the lease gives some slack
+                pass
@@ -0,0 +1,230 @@
+import hashlib
+import json
+import threading
+import weakref
+from typing import TYPE_CHECKING, Union, Dict, List
+
+from hopaas_client.Exceptions import HopaasServerError, HopaasConsistencyError
+from hopaas_client.Reporter import Reporter
+from hopaas_client.LeaseKeeper import LeaseKeeper
+from hopaas_client.local import parse_space, make_sampler, make_pruner
+from hopaas_client.local.storage import LocalStudy, LocalTrial, COMPLETE, PRUNED, FAILED, RUNNING
+from hopaas_client.metrics import Metrics
+
+if TYPE_CHECKING:
+    from hopaas_client.Study import Study
+
+
+class LocalClient:
+    """
+    Drop-in replacement of `Client` running the samplers and the pruners in-process.
+
+    No server is involved: the studies and their trials live in memory, in this object,
+    and the suggestions are obtained from local implementations, based on NumPy, of the
+    samplers in `hopaas_client.samplers` and of the pruners in `hopaas_client.pruners`.
+    It is meant for offline studies, for very short trials and for testing pipelines.
+
+    For example:
+    ```
+    study = Study("A study", properties=dict(x=Float(-1, 1)), client=LocalClient(seed=42))
+    ```
+
+    seed: `int`, default: `None`
+        seed of the random number generators of the samplers.
+
+    metrics: `Metrics`, default: `None`
+        if set, the phases of the trials are recorded, see `hopaas_client.metrics`.
+    """
+    pool_maxsize = 1
+
+    def __init__(self, seed: Union[int, None] = None, metrics: Union[Metrics, None] = None):
+        self.server = "local"
+        self.token = None
+        self.seed = seed
+        self.metrics = metrics
+        self._lock = threading.RLock()
+        self._local_studies: Dict[str, LocalStudy] = dict()
+        self._reporter: Union[Reporter, None] = None
+        self._leases: Union[LeaseKeeper, None] = None
+        self.worker_id = "local"
+
+        # Studies issuing their requests through this client
+        self._studies: "weakref.WeakSet[Study]" = weakref.WeakSet()
+
+    @property
+    def studies(self) -> List["Study"]:
+        """The studies issuing their requests through this client"""
+        return list(self._studies)
+
+    @property
+    def reporter(self) -> Reporter:
+        """The background writer sending the results of the trials asynchronously"""
+        with self._lock:
+            if self._reporter is None:
+                self._reporter = Reporter(self)
+        return self._reporter
+
+    @property
+    def leases(self) -> LeaseKeeper:
+        """The background thread renewing the leases of the running trials"""
+        with self._lock:
+            if self._leases is None:
+                self._leases = LeaseKeeper(self)
+        return self._leases
+
+    def close(self):
+        """Flushes the pending results and exports the metrics"""
+        if self._reporter is not None:
+            self._reporter.flush()
+        if self.metrics is not None:
+            self.metrics.export()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def backend_version(self):
+        """Version of the local backend"""
+        return "local"
+
+    def study(self, study_id: str) -> LocalStudy:
+        """The in-memory record of a study"""
+        try:
+            return self._local_studies[study_id]
+        except KeyError:
+            raise HopaasServerError(f"Unknown study {study_id}")
+
+    def _trial(self, study_id: str, trial_id: int):
+        study = self.study(study_id)
+        if not 0 <= trial_id < len(study.trials):
+            raise HopaasServerError(f"Unknown trial {study_id}:{trial_id}")
+        return study, study.trials[trial_id]
+
+    @staticmethod
+    def _check_running(study: LocalStudy, trial: LocalTrial):
+        if trial.state != RUNNING:
+            raise HopaasConsistencyError(f"Trial {study.study_id}:{trial.trial_id} is {trial.state}")
+
+    def _get_study(self, config: dict) -> LocalStudy:
+        """Internal. Retrieves, or creates, the study described by the `hopaas_config` of a request"""
+        title = str(config.get('title', 'untitled'))
+        study_id = hashlib.sha1(title.encode()).hexdigest()[:16]
+        if study_id not in self._local_studies:
+            self._local_studies[study_id] = LocalStudy(study_id, title)
+        study = self._local_studies[study_id]
+        study.direction = config.get('direction', study.direction)
+
+        sampler_config = json.dumps(config.get('sampler', dict(name='TPESampler')), sort_keys=True)
+        if sampler_config != study.sampler_config:
+            study.sampler = make_sampler(json.loads(sampler_config), seed=self.seed)
+            study.sampler_config = sampler_config
+            for trial in study.completed_trials():
+                study.sampler.observe(study, trial)
+
+        pruner_config = json.dumps(config.get('pruner', dict(name='NopPruner')), sort_keys=True)
+        if pruner_config != study.pruner_config:
+            study.pruner = make_pruner(json.loads(pruner_config))
+            study.pruner_config = pruner_config
+
+        return study
+
+    def register_study(self, definition: dict, definition_hash: str, force: bool = False) -> None:
+        """Registration is pointless without a server: the studies always ask with their whole definition"""
+        return None
+
+    def ask(self, properties: dict) -> dict:
+        """Initializes a new trial, sampling the suggestions in the properties"""
+        with self._lock:
+            study = self._get_study(properties.get('hopaas_config', dict()))
+            space = parse_space(properties)
+            internal = study.sampler.sample(study, space)
+            params = {name: space[name].from_internal(x) for name, x in internal.items()}
+            internal = {name: space[name].to_internal(v) for name, v in params.items()}
+
+            trial = LocalTrial(len(study.trials), params, internal)
+            study.trials.append(trial)
+
+        ret = {k: params.get(k, v) for k, v in properties.items()
+               if k != 'hopaas_config' and not k.startswith('_')}
+        ret['hopaas_trial'] = f"{study.study_id}:{trial.trial_id}"
+        return ret
+
+    def ask_batch(self, properties: dict, n_trials: int) -> List[dict]:
+        """Initializes `n_trials` new trials at once"""
+        return [self.ask(properties) for _ in range(n_trials)]
+
+    def suggest(self, study_id: str, trial_id: int, properties: dict) -> dict:
+        """Samples the suggestions defined by run for an ongoing trial, unless already suggested"""
+        with self._lock:
+            study, trial = self._trial(study_id, trial_id)
+            self._check_running(study, trial)
+            space = {name: distribution for name, distribution in parse_space(properties).items()
+                     if name not in trial.params}
+            if len(space):
+                internal = study.sampler.sample(study, space)
+                params = {name: space[name].from_internal(x) for name, x in internal.items()}
+                trial.params.update(params)
+                trial.internal.update({name: space[name].to_internal(v) for name, v in params.items()})
+            return {name: trial.params.get(name, value) for name, value in properties.items()}
+
+    def tell(self, study_id: str, trial_id: int, loss: float):
+        """Completes an ongoing trial"""
+        with self._lock:
+            study, trial = self._trial(study_id, trial_id)
+            self._check_running(study, trial)
+            trial.loss = float(loss)
+            trial.state = COMPLETE
+            study.sampler.observe(study, trial)
+
+    def mark_as_failed(self, study_id: str, trial_id: int, error: str):
+        """Marks an ongoing trial as failed"""
+        with self._lock:
+            study, trial = self._trial(study_id, trial_id)
+            self._check_running(study, trial)
+            trial.state = FAILED
+
+    def should_prune(self, study_id: str, trial_id: int, loss: float, step: int) -> bool:
+        """Records an intermediate result and evaluates whether the trial should be pruned"""
+        with self._lock:
+            study, trial = self._trial(study_id, trial_id)
+            self._check_running(study, trial)
+            trial.intermediate[step] = float(loss)
+            if study.pruner.prune(study, trial, step, float(loss)):
+                trial.state = PRUNED
+                trial.loss = float(loss)
+                return True
+            return False
+
+    def report_intermediate(self, study_id: str, trial_id: int, values) -> bool:
+        """Records a chunk of intermediate results, as `(step, loss, timestamp)` triplets"""
+        with self._lock:
+            study, trial = self._trial(study_id, trial_id)
+            self._check_running(study, trial)
+            for step, loss, _ in values:
+                trial.intermediate[int(step)] = float(loss)
+        return True
+
+    def heartbeat(self, leases: Dict[str, float]) -> List[str]:
+        """The trials run in-process cannot outlive their worker: no lease is ever lost"""
+        return []
+
+    def get_best_trial(self, study_id: str, trial_id: int) -> int:
+        """The id of the completed trial with the best loss"""
+        with self._lock:
+            study = self.study(study_id)
+            completed = study.completed_trials()
+            if len(completed) == 0:
+                raise HopaasServerError(f"No completed trial in study {study_id}")
+            return min(completed, key=lambda t: study.sign * t.loss).trial_id
+
+    def get_trials(self, study_id: str, since: Union[str, None] = None) -> dict:
+        """All the trials of a given study: the in-memory history is always complete"""
+        with self._lock:
+            study = self.study(study_id)
+            return dict(cursor=None, trials=[
+                dict(trial_id=t.trial_id, state=t.state, loss=t.loss, properties=t.params)
+                for t in study.trials
+            ])
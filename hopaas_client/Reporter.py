@@ -0,0 +1,168 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Union, List, Tuple
+
+from hopaas_client.Exceptions import HopaasError, HopaasServerError
+from hopaas_client.RetryPolicy import full_jitter
+
+logger = logging.getLogger(__name__)
+
+
+class Reporter:
+    """
+    Internal. Background writer reporting the results of completed trials to the server.
+
+    Results submitted with `submit` are queued and sent by a worker thread, which
+    drains up to `batch_size` of them at each wake-up and sends them with a single
+    request, if the client implements `report_batch`, overlapping the reporting with
+    the computation of the next trial. The results the server did not accept in
+    the batch are then sent one by one.
+
+    A request that fails because the server is unreachable (connection errors,
+    timeouts or the circuit breaker of the client open) is retried forever, with exponential backoff and jitter capped at
+    `max_backoff` seconds. Any other error is retried `max_retries` times before
+    the result is given up: it is logged and recorded in `errors`, and the next
+    `flush` raises `HopaasError` unless the result is kept in the spool of the client.
+
+    Pending results are flushed when `flush` is called and at interpreter exit,
+    waiting at most `exit_timeout` seconds in the latter case.
+    """
+    def __init__(self,
+                 client,
+                 batch_size: int = 32,
+                 initial_backoff: float = 0.5,
+                 max_backoff: float = 30.,
+                 max_retries: int = 5,
+                 exit_timeout: Union[float, None] = 60.
+                 ):
+        self._client = client
+        self.batch_size = batch_size
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.max_retries = max_retries
+        self.exit_timeout = exit_timeout
+        self.errors: List[Tuple[str, dict, Exception]] = []
+        # Results given up and not kept in a spool, raised by the next flush
+        self._lost: List[Tuple[str, dict, Exception]] = []
+        self._queue = queue.Queue()
+        self._thread: Union[threading.Thread, None] = None
+        self._lock = threading.Lock()
+        atexit.register(self._flush_at_exit)
+
+    @property
+    def n_pending(self) -> int:
+        """Number of results submitted and not yet acknowledged by the server"""
+        return self._queue.unfinished_tasks
+
+    def submit(self, method: str, **kwargs):
+        """Queues a call to `method` of the client (e.g. `"tell"`) with keyword arguments `kwargs`"""
+        self._queue.put((method, kwargs))
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="hopaas-reporter", daemon=True)
+                self._thread.start()
+
+    def flush(self, timeout: Union[float, None] = None) -> bool:
+        """
+        Blocks until all the submitted results are acknowledged by the server,
+        or until `timeout` seconds elapsed. Returns False in case of timeout.
+
+        Raises `HopaasError` if results were given up since the previous flush, and lost.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+
+        with self._lock:
+            lost, self._lost = self._lost, []
+        if len(lost):
+            raise HopaasError(f"{len(lost)} results could not be reported to the server, "
+                              f"see `Reporter.errors`") from lost[-1][2]
+        return True
+
+    def _flush_at_exit(self):
+        """Internal. Flush registered with atexit"""
+        if self._queue.unfinished_tasks:
+            try:
+                self.flush(self.exit_timeout)
+            except HopaasError:
+                pass  # Each result was logged when given up
+
+    def _backoff(self, attempt: int) -> float:
+        """Internal. Exponential backoff with full jitter"""
+        return full_jitter(attempt, self.initial_backoff, self.max_backoff)
+
+    @staticmethod
+    def _unreachable(error: Exception) -> bool:
+        """Internal. Whether no response was received: the server is unreachable, rather than rejecting the result"""
+        return isinstance(error, HopaasServerError) and error.status_code is None
+
+    def _give_up(self, method: str, kwargs: dict, error: Exception):
+        """Internal. Records a result given up, lost unless recorded in the spool of the client"""
+        spooled = method == 'replay' and kwargs.get('seq') is not None
+        logger.warning("Result %s given up%s: %s", kwargs.get('payload', kwargs),
+                       ", kept in the spool" if spooled else "", error)
+        with self._lock:
+            self.errors.append((method, kwargs, error))
+            if not spooled:
+                self._lost.append((method, kwargs, error))
+
+    def _send(self, method: str, kwargs: dict):
+        """Internal. Sends a single result, retrying on failures"""
+        attempt = 0
+        while True:
+            try:
+                getattr(self._client, method)(**kwargs)
+                return
+            except Exception as e:
+                if not self._unreachable(e) and attempt >= self.max_retries:
+                    self._give_up(method, kwargs, e)
+                    return
+
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def _send_batch(self, batch: List[Tuple[str, dict]]) -> List[Tuple[str, dict]]:
+        """
+        Internal. Sends several results with a single request, retrying while the server is unreachable.
+        Returns the results to be sent one by one: those not accepted, or all of them if the request failed.
+        """
+        attempt = 0
+        while True:
+            try:
+                errors = self._client.report_batch(batch)
+                return [call for call, error in zip(batch, errors) if error is not None]
+            except Exception as e:
+                if not self._unreachable(e):
+                    return batch
+
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def _run(self):
+        """Internal. Body of the worker thread"""
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                if len(batch) > 1 and hasattr(self._client, 'report_batch'):
+                    batch_left = self._send_batch(batch)
+                else:
+                    batch_left = batch
+                for method, kwargs in batch_left:
+                    self._send(method, kwargs)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
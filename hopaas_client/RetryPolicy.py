@@ -0,0 +1,46 @@
+import random
+from dataclasses import dataclass
+from typing import Tuple, Union
+
+
+def full_jitter(attempt: int, initial_backoff: float, max_backoff: float) -> float:
+    """Exponential backoff with full jitter: uniform in `[0, min(max_backoff, initial_backoff * 2**attempt)]`"""
+    return random.uniform(0, min(max_backoff, initial_backoff * 2 ** attempt))
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Policy of `Client` for retrying the requests failed because of transient errors.
+
+    Requests failing because the server is unreachable (connection errors, timeouts) or
+    answering with one of the `retry_statuses` are retried up to `max_retries` times,
+    waiting an exponential backoff with full jitter, or as long as requested by the
+    server with the `Retry-After` header, if longer. Each request carries an
+    `Idempotency-Key` header, unchanged across retries, for the server to
+    recognize a retry of a request whose response was lost.
+
+    max_retries: `int`, default: `3`
+        maximum number of retries of each request, `0` disables retries.
+
+    initial_backoff: `float`, default: `0.2`
+        upper bound, in seconds, of the wait before the first retry, doubled at each retry.
+
+    max_backoff: `float`, default: `10`
+        maximum wait, in seconds, between two attempts.
+
+    retry_statuses: `tuple`, default: `(429, 502, 503, 504)`
+        HTTP statuses considered transient.
+    """
+    max_retries: int = 3
+    initial_backoff: float = 0.2
+    max_backoff: float = 10.
+    retry_statuses: Tuple[int, ...] = (429, 502, 503, 504)
+
+    def backoff(self, attempt: int, retry_after: Union[str, None] = None) -> float:
+        """Wait before the retry number `attempt` (starting from 0), honouring `Retry-After` in seconds"""
+        wait = full_jitter(attempt, self.initial_backoff, self.max_backoff)
+        try:
+            return min(max(wait, float(retry_after)), self.max_backoff) if retry_after is not None else wait
+        except ValueError:
+            return wait
@@ -0,0 +1,138 @@
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+
+from hopaas_client.Exceptions import HopaasConsistencyError
+from hopaas_client import suggestions as hs
+
+# Relative tolerance on the bounds of the floating-point values returned by the server
+BOUNDS_RTOL = 1e-9
+
+
+@dataclass(frozen=True)
+class Parameter:
+    """Internal. Decoder of the values suggested for a property of the study"""
+    name: str
+
+    def decode(self, value: Any) -> Any:
+        raise NotImplementedError
+
+    def _invalid(self, value: Any) -> HopaasConsistencyError:
+        return HopaasConsistencyError(f"Invalid value {value!r} suggested for {self.name}: expected {self}")
+
+
+@dataclass(frozen=True)
+class IntParameter(Parameter):
+    low: int
+    high: int
+    step: int = 1
+
+    def decode(self, value: Any) -> int:
+        try:
+            x = float(value)
+            ret = int(round(x))
+        except (TypeError, ValueError, OverflowError):
+            raise self._invalid(value) from None
+        if abs(x - ret) > BOUNDS_RTOL * max(1., abs(x)) or not self.low <= ret <= self.high \
+                or (ret - self.low) % self.step != 0:
+            raise self._invalid(value)
+        return ret
+
+
+@dataclass(frozen=True)
+class FloatParameter(Parameter):
+    low: float
+    high: float
+
+    def decode(self, value: Any) -> float:
+        try:
+            ret = float(value)
+        except (TypeError, ValueError):
+            raise self._invalid(value) from None
+        tolerance = BOUNDS_RTOL * max(1., abs(self.low), abs(self.high))
+        if not self.low - tolerance <= ret <= self.high + tolerance:
+            raise self._invalid(value)
+        return min(max(ret, self.low), self.high)
+
+
+@dataclass(frozen=True)
+class CategoricalParameter(Parameter):
+    choices: Tuple[Any, ...]
+
+    def decode(self, value: Any) -> Any:
+        # The choices travel as strings: the original objects are recovered from their representation
+        value = str(value)
+        for choice in self.choices:
+            if value == str(choice):
+                return choice
+        raise self._invalid(value)
+
+
+def compile_suggestion(name: str, suggestion: hs.Suggestion) -> Parameter:
+    """Internal. Validates a suggestion and returns the decoder of its values, raising `ValueError` if invalid"""
+    if isinstance(suggestion, hs.Int):
+        if suggestion.step < 1 or not suggestion.min <= suggestion.max:
+            raise ValueError(f"Invalid range of {name}: {suggestion}")
+        if suggestion.log and (suggestion.min <= 0 or suggestion.step != 1):
+            raise ValueError(f"Invalid log-scaled range of {name}: {suggestion}")
+        return IntParameter(name, int(suggestion.min), int(suggestion.max), int(suggestion.step))
+
+    if isinstance(suggestion, (hs.Float, hs.Uniform)):
+        low, high = suggestion.min, suggestion.max
+    elif isinstance(suggestion, (hs.DiscreteUniform, hs.LogUniform)):
+        low, high = suggestion.low, suggestion.high
+    elif isinstance(suggestion, hs.Categorical):
+        encoded = [str(choice) for choice in suggestion.choices]
+        if len(encoded) == 0:
+            raise ValueError(f"No choices for {name}")
+        if any(',' in choice for choice in encoded):
+            raise ValueError(f"The choices of {name} cannot contain commas: {encoded}")
+        if len(set(encoded)) != len(encoded):
+            raise ValueError(f"The choices of {name} are not distinct once converted to strings: {encoded}")
+        return CategoricalParameter(name, tuple(suggestion.choices))
+    else:
+        raise ValueError(f"Unsupported suggestion {suggestion!r} for {name}")
+
+    if not (math.isfinite(low) and math.isfinite(high) and low <= high):
+        raise ValueError(f"Invalid range of {name}: {suggestion}")
+    if isinstance(suggestion, hs.LogUniform) and low <= 0:
+        raise ValueError(f"Invalid log-scaled range of {name}: {suggestion}")
+    return FloatParameter(name, float(low), float(high))
+
+
+class SearchSpace:
+    """
+    Schema of the properties of a study, compiled once when the `Study` is built.
+
+    properties: `dict`
+        the properties of the study, some of which `hopaas_client.suggestions`.
+
+    The suggestions are validated (raising `ValueError`) and encoded in the format of the
+    requests once, see `encoded`. The values suggested by the server are then cast to the
+    type of the suggestion and checked against its bounds by `decode`, which raises
+    `HopaasConsistencyError` for values outside of the search space.
+    """
+    def __init__(self, properties: Dict[str, Any]):
+        self.parameters: Dict[str, Parameter] = dict()
+        self.encoded: Dict[str, Any] = dict()
+        for name, value in properties.items():
+            if isinstance(value, hs.Suggestion):
+                self.parameters[name] = compile_suggestion(name, value)
+                self.encoded[name] = str(value)
+            else:
+                self.encoded[name] = value
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        """Names of all the properties, suggested or not"""
+        return tuple(self.encoded)
+
+    def decode(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        """The properties of a trial from the response of /api/ask, without `hopaas_trial`"""
+        properties = {k: v for k, v in response.items() if k != 'hopaas_trial'}
+        for name, parameter in self.parameters.items():
+            try:
+                properties[name] = parameter.decode(properties[name])
+            except KeyError:
+                raise HopaasConsistencyError(f"No value suggested for {name}") from None
+        return properties
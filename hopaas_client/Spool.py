@@ -0,0 +1,212 @@
+import glob
+import json
+import os
+import socket
+import threading
+import uuid
+from typing import Union, List, Tuple, Dict
+
+from hopaas_client.Configurable import Configurable
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows: the journals of other processes are never adopted
+    fcntl = None
+
+
+class Spool:
+    """
+    Durable, append-only journal of the requests of `Client` waiting to be acknowledged
+    by the server, such as the final results of the trials (`tell` and `mark_as_failed`).
+
+    Each process appends to a journal of its own, a JSON-lines file in `directory`, with a
+    line per request and a line per acknowledgement. The lines are written to the file
+    immediately, surviving a crash of the process, and synchronized to the disk in batches
+    (`fsync`), at most `fsync_interval` seconds after being written. The journal is emptied
+    as soon as all its requests are acknowledged, and removed when the spool is closed.
+
+    Each request is recorded with the address of its `server`. Journals left behind by
+    processes that died before acknowledging their requests are adopted by the next spool
+    opened on the same directory for the same server, or replayed on demand with
+    `python -m hopaas_client replay`, never sending the requests to another server.
+
+    directory: `str`, default: `None`
+        directory of the journals, by default `.hopaas_spool` next to the configuration file.
+
+    fsync_interval: `float`, default: `0.2`
+        maximum time, in seconds, before the requests written to the journal are synchronized
+        to the disk, `0` synchronizes every request.
+
+    server: `str`, default: `None`
+        address of the server of the requests, by default set by the `Client` of the spool
+        (see `bind`). The journals of dead processes are adopted only once it is known.
+    """
+    COMPACT_SIZE = 1 << 16
+
+    def __init__(self,
+                 directory: Union[str, None] = None,
+                 fsync_interval: float = 0.2,
+                 server: Union[str, None] = None):
+        self.directory = directory if directory is not None else os.path.join(
+            os.path.dirname(os.path.abspath(Configurable.get_default_cfgfile())), ".hopaas_spool"
+        )
+        self.fsync_interval = fsync_interval
+        self.server = None
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.path = os.path.join(self.directory,
+                                 f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl")
+        self._lock = threading.Lock()
+        self._pending: Dict[int, Tuple[str, dict]] = dict()
+        self._next_seq = 0
+        self._size = 0
+        self._unsynced = False
+        self._timer: Union[threading.Timer, None] = None
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+        if server is not None:
+            self.bind(server)
+
+    def bind(self, server: str):
+        """
+        Sets the server of the requests, adopting the journals left behind by dead processes
+        for the same server. Raises `ValueError` if the spool is bound to another server.
+        """
+        with self._lock:
+            if self.server == server:
+                return
+            if self.server is not None:
+                raise ValueError(f"Spool {self.path} is bound to {self.server}, not to {server}")
+            self.server = server
+        self._adopt_orphans()
+
+    @property
+    def pending(self) -> List[Tuple[int, str, dict]]:
+        """The requests not acknowledged yet, as `(seq, endpoint, payload)`, in the order they were issued"""
+        with self._lock:
+            return [(seq, endpoint, payload) for seq, (endpoint, payload) in self._pending.items()]
+
+    def __len__(self):
+        return len(self._pending)
+
+    def append(self, endpoint: str, payload: dict) -> int:
+        """Records a request to `endpoint` (e.g. `"tell"`) and returns its sequence number"""
+        with self._lock:
+            if self._fd is None:
+                raise ValueError(f"Spool {self.path} is closed")
+            seq = self._next_seq
+            self._next_seq += 1
+            self._pending[seq] = (endpoint, payload)
+            self._write(dict(seq=seq, server=self.server, endpoint=endpoint, payload=payload))
+        return seq
+
+    def ack(self, seq: int):
+        """Records that the request `seq` was acknowledged by the server"""
+        with self._lock:
+            if self._fd is None or self._pending.pop(seq, None) is None:
+                return
+            if len(self._pending) == 0 and self._size >= self.COMPACT_SIZE:
+                os.ftruncate(self._fd, 0)
+                self._size = 0
+            else:
+                self._write(dict(ack=seq))
+
+    def sync(self):
+        """Synchronizes the journal to the disk"""
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        """Synchronizes the journal, removing it if no request is pending"""
+        with self._lock:
+            if self._fd is None:
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+            self._sync()
+            if len(self._pending) == 0:
+                os.unlink(self.path)
+            os.close(self._fd)
+            self._fd = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def _write(self, record: dict):
+        """Internal. Appends a record to the journal, under the lock"""
+        line = (json.dumps(record) + "\n").encode()
+        os.write(self._fd, line)
+        self._size += len(line)
+        self._unsynced = True
+        if self.fsync_interval <= 0:
+            self._sync()
+        elif self._timer is None:
+            # Group commit: a single fsync for all the records written in the interval
+            self._timer = threading.Timer(self.fsync_interval, self.sync)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _sync(self):
+        """Internal. Body of `sync`, under the lock"""
+        self._timer = None
+        if self._unsynced and self._fd is not None:
+            os.fsync(self._fd)
+            self._unsynced = False
+
+    @staticmethod
+    def read(path: str) -> List[Tuple[Union[str, None], str, dict]]:
+        """
+        Returns the requests of the journal in `path` not acknowledged, as `(server, endpoint, payload)`,
+        the server being None for the requests recorded before the spool was bound.
+        """
+        pending: Dict[int, Tuple[Union[str, None], str, dict]] = dict()
+        with open(path, 'rb') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # A line truncated by a crash
+                if 'ack' in record:
+                    pending.pop(record['ack'], None)
+                else:
+                    pending[record['seq']] = (record.get('server'), record['endpoint'], record['payload'])
+        return list(pending.values())
+
+    def _adopt_orphans(self):
+        """
+        Internal. Moves the pending requests of the journals of dead processes into this journal,
+        if all of them are for the server of this spool, or for an unknown one
+        """
+        if fcntl is None:
+            return
+
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.jsonl"))):
+            if path == self.path:
+                continue
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                # The journals of live processes are locked, those already adopted are unlinked
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                if os.fstat(fd).st_nlink == 0:
+                    raise FileNotFoundError(path)
+            except OSError:
+                os.close(fd)
+                continue
+            try:
+                requests = self.read(path)
+                if any(server not in (None, self.server) for server, _, _ in requests):
+                    continue  # Left to a spool of their server
+                for _, endpoint, payload in requests:
+                    self.append(endpoint, payload)
+                self.sync()
+                os.unlink(path)
+            finally:
+                os.close(fd)
@@ -1,16 +1,43 @@
+import asyncio
+import atexit
 import contextlib
-from typing import Union, Dict, Any
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Union, Dict, Deque, List, Mapping, Callable, Tuple, Set
+
+import numpy as np
 
 from hopaas_client.Client import Client
+from hopaas_client.Configurable import Configurable
 from hopaas_client.Trial import Trial
-from hopaas_client.Exceptions import HopaasConsistencyError
+from hopaas_client.Exceptions import HopaasConsistencyError, HopaasServerError
 
 from hopaas_client.pruners import Pruner, NopPruner
+from hopaas_client.SuccessiveHalving import SuccessiveHalving
 from hopaas_client.samplers import Sampler, TPESampler
+from hopaas_client.SearchSpace import SearchSpace, Parameter, compile_suggestion
 from hopaas_client.suggestions import Suggestion
 from hopaas_client.FrozenTrial import FrozenTrial
+from hopaas_client.TrialStore import TrialStore
+from hopaas_client.HistoryCache import HistoryCache, RUNNING, COMPLETE, PRUNED, FAILED
+from hopaas_client.metrics import Metrics
+
+if TYPE_CHECKING:
+    from hopaas_client.AsyncClient import AsyncClient
+
+from hopaas_client.utils import valid_properties, definition_hash
+
+logger = logging.getLogger(__name__)
 
-from hopaas_client.utils import valid_properties
+# Name of the file describing a trial in its checkpoint directory, see `Trial.checkpoint_dir`
+CHECKPOINT_STATE = "hopaas_trial.json"
 
 
 class Study:
@@ -20,10 +47,14 @@ class Study:
     name: `str`
         Title of the study to be used as a human-readable identifier.
 
-    properties: `dict`
+    properties: `dict`, default: `None`
         Dictionary of variables representing the context of the study.
         Some or all the variables can be `hopaas_client.suggestions` to
-        be replaced with values as prompted by Hopaas server.
+        be replaced with values as prompted by Hopaas server. The suggestions
+        are validated when the study is built, and the suggested values cast
+        to their type and checked against their bounds, see `SearchSpace`.
+        Further suggestions can be defined by run, within the trials, see
+        `Trial.suggest`.
 
     direction: `str`, default: `"minimize"`
         direction of the optimization, can be either "minimize" or "maximize".
@@ -38,41 +69,204 @@ class Study:
         The `NopPruner`, used as default, never abort studies.
 
     client: `Client`, default: `None`
-        handle to use a specially configured client. By default, the user is
-        prompted for Client configuration in stdin, unless a configuration file
-        `.hopaasrc` is found in the system.
+        handle to use a specially configured client. By default, the client shared
+        by all the studies of the process (see `Client.shared`), configured by the
+        environment or by the configuration file `.hopaasrc`, the user being
+        prompted for the configuration in stdin if neither is found.
+
+    prefetch: `int`, default: `0`
+        number of trial suggestions to be requested in advance to the server
+        and kept in a local queue. When the queue drops below `prefetch // 2`
+        suggestions, it is refilled in background. Prefetching removes the
+        latency of the sampler from the critical path of short trials, at the
+        price of suggestions obtained with a slightly outdated history.
+        With `0`, the default, each trial is requested when it starts.
+        An error of the background refill is raised by the next `trial()`, and the
+        suggestions left in the queue are discarded by `close()` and at exit.
+
+    async_report: `bool`, default: `False`
+        if True, the final results of the trials are queued and sent to the server
+        by a background thread (see `flush()`), so that the next trial can start
+        without waiting for the server to acknowledge the result of the previous one.
+
+    prune_min_interval: `float`, default: `0`
+        minimum time, in seconds, between two queries to the server on whether
+        a trial should be pruned. Reads of `trial.should_prune` in between
+        return the most recent decision.
+
+    history: `HistoryCache`, default: `None`
+        local cache of the history of the study, updated with the trials run here
+        and synchronized incrementally with the server. If provided, `best_trial_id`,
+        `all_trials` and `top_trials` are answered by the cache, querying the server
+        at most once every `history.max_staleness` seconds.
 
+    stream_intermediate: `int`, default: `0`
+        if positive, the intermediate values of the loss (see `trial.history`) are
+        uploaded to the server in chunks of `stream_intermediate` values, and before
+        each query on pruning, rather than only one at a time through `should_prune`.
+        Within `atrial()`, they are uploaded only when pruning is awaited and at the end.
+
+    lease: `float`, default: `None`
+        if set, each trial is owned by this worker (see `Client.worker_id`) for `lease`
+        seconds only, and the lease is renewed by a background heartbeat until the trial
+        ends. The trials of a worker killed without reporting are then released by the
+        server when their lease expires, instead of running forever. A trial whose lease
+        is lost anyway (e.g. after a network outage) is reported as to be pruned.
+
+    memoize: `bool`, default: `False`
+        if True, the losses of the completed trials are memoized by the content hash of
+        their properties and of the definition of the study. A trial suggested with the
+        properties of a trial already completed, here or, with a history cache, anywhere
+        else, is reported right away with the same loss, and `trial()` moves on to the next
+        suggestion without running the objective, see `n_memoized`. Memoization requires
+        the suggestions not to be defined by run.
+
+    checkpoints: `str`, default: `None`
+        root directory of the checkpoint directories of the trials (see `Trial.checkpoint_dir`),
+        by default `.hopaas_checkpoints` next to the configuration file. A trial whose job was
+        preempted can be resumed with `trial(resume=...)`, see `preempted_trials()`.
+
+    halving: `SuccessiveHalving`, default: `None`
+        if set, each trial is granted a budget of resources (see `Trial.budget`) and is
+        promoted or stopped at the end of each rung of the successive halving, locally and
+        without querying the server on pruning. The trials stopped are reported as failed to
+        the server, and as pruned locally. It replaces the pruner, which must be a `NopPruner`.
+
+    The definition of the study (properties, configuration and special properties) is
+    built once and registered to the server before the first trial, so that the following
+    requests of new trials carry only the `study_id` and the content hash of the definition.
+    With servers not supporting the registration, each request carries the whole definition.
+
+    Queries to the server on pruning are skipped on the steps the pruner would
+    never act on (e.g. before `n_warmup_steps` or between `interval_steps`) and
+    when the decision can be taken locally (e.g. by `ThresholdPruner`),
+    see `n_prune_queries_avoided`.
     """
+    # Maximum number of trials reported with a memoized loss by `trial()` before running one anyway
+    MAX_MEMOIZED_IN_A_ROW = 100
+
     def __init__(self,
                  name: str,
-                 properties: dict,
+                 properties: Union[dict, None] = None,
                  special_properties: Union[dict, None] = None,
                  direction: str = 'minimize',
                  pruner: Pruner = NopPruner(),
                  sampler: Sampler = TPESampler(),
-                 client: Union[Client, None] = None
+                 client: Union[Client, None] = None,
+                 prefetch: int = 0,
+                 async_report: bool = False,
+                 prune_min_interval: float = 0.,
+                 history: Union[HistoryCache, None] = None,
+                 stream_intermediate: int = 0,
+                 lease: Union[float, None] = None,
+                 memoize: bool = False,
+                 checkpoints: Union[str, None] = None,
+                 halving: Union[SuccessiveHalving, None] = None
                  ):
         self._name = name
-        self._properties = valid_properties({
-                k: str(v) if isinstance(v, Suggestion)
-                else v for k, v in properties.items()
-            }, allow_none=False
-        )
+        self._space = SearchSpace(valid_properties(properties if properties is not None else dict(),
+                                                   allow_none=False))
+        self._properties = self._space.encoded
         self._special_properties = valid_properties(
             special_properties, allow_none=True
         )
         self._direction = direction
         self._pruner = pruner
         self._sampler = sampler
-        self._client = client if client is not None else Client()
+        self._client = client if client is not None else Client.shared()
+        self._client._studies.add(self)
+        self._async_client: Union["AsyncClient", None] = None
         self._suid: Union[str, None] = None
-        self._trials: Dict[str, Any] = dict()
+        self._trials = TrialStore()
+        self._prefetch_size = prefetch
+        self._prefetched: Deque[dict] = deque()
+        self._refill_thread: Union[threading.Thread, None] = None
+        self._refill_error: Union[Exception, None] = None
+        if prefetch > 0:
+            atexit.register(_close_at_exit, weakref.ref(self))
+        self._async_report = async_report
+        self._prune_min_interval = prune_min_interval
+        self._n_prune_queries_avoided = 0
+        self._history = history
+        self._stream_chunk = stream_intermediate
+        self._lease = lease
+        self._memoize = memoize
+        # Memoized losses by hash of the properties, and the trials of the history cache already hashed
+        self._memo: Dict[str, float] = dict()
+        self._memo_indexed: Set[int] = set()
+        self._n_memoized = 0
+        self._checkpoints = checkpoints
+        if halving is not None and not isinstance(pruner, NopPruner):
+            raise ValueError("A study cannot be pruned both by successive halving and by a pruner")
+        self._halving = halving
+        self._lock = threading.RLock()
+
+        # Static body of /api/ask, registered once to the server (None: not attempted yet)
+        self._definition = dict(self._properties)
+        self._definition['hopaas_config'] = dict(
+            title=self._name,
+            direction=self.direction,
+            sampler=self._sampler.asdict(),
+            pruner=self._pruner.asdict()
+        )
+        if self._special_properties is not None:
+            self._definition.update({
+                f"_{k}": v for k, v in self._special_properties.items()
+            })
+        self._definition_hash = definition_hash(self._definition)
+        self._registered: Union[bool, None] = None
+
+        # Suggestions defined by run (see `Trial.suggest`), encoded and compiled, by name
+        self._by_run: Dict[str, Tuple[str, Parameter]] = dict()
 
     @property
     def direction(self) -> str:
         """Direction of the study, either `'maximize'` or `'minimize'`"""
         return self._direction
 
+    @property
+    def lease(self) -> Union[float, None]:
+        """Duration, in seconds, of the leases of the trials, None if leases are not used"""
+        return self._lease
+
+    @lease.setter
+    def lease(self, value: Union[float, None]):
+        self._lease = value
+
+    @property
+    def halving(self) -> Union[SuccessiveHalving, None]:
+        """The successive halving allocating the resources of the trials, if any"""
+        return self._halving
+
+    @property
+    def n_memoized(self) -> int:
+        """Number of trials reported with a memoized loss, without running the objective"""
+        return self._n_memoized
+
+    @property
+    def checkpoints(self) -> str:
+        """Root directory of the checkpoint directories of the trials, see `Trial.checkpoint_dir`"""
+        if self._checkpoints is None:
+            self._checkpoints = os.path.join(
+                os.path.dirname(os.path.abspath(Configurable.get_default_cfgfile())), ".hopaas_checkpoints"
+            )
+        return self._checkpoints
+
+    @property
+    def search_space(self) -> SearchSpace:
+        """The compiled schema of the properties, validating and casting the suggested values"""
+        return self._space
+
+    @property
+    def definition(self) -> Mapping:
+        """Read-only definition of the study, as registered to the server"""
+        return MappingProxyType(self._definition)
+
+    @property
+    def definition_hash(self) -> str:
+        """Content hash of the definition of the study"""
+        return self._definition_hash
+
     @property
     def is_initialized(self) -> bool:
         """
@@ -91,51 +285,426 @@ class Study:
         """The id (an integer) of the trial obtaining the best score"""
         if not self.is_initialized:
             raise HopaasConsistencyError("Study not initialized")
-        else:
+        elif self._history is None:
             return self._client.get_best_trial(self._suid, 0)
+        else:
+            self._history.sync(self._client, self._suid)
+            return self._history.best_trial_id(self._suid, self.direction)
+
+    @property
+    def history(self) -> Union[HistoryCache, None]:
+        """The local cache of the history of the study, if any"""
+        return self._history
 
     @property
-    def trials(self):
+    def trials(self) -> Mapping[int, FrozenTrial]:
         """
-        Dictionary of the trials run locally.
+        Read-only mapping of the trials run locally, from their id to a `FrozenTrial` view.
+        The mapping is live: iterating it covers the trials present when the iteration starts.
 
         Note that best trial may be obtained in an independent run,
-        and therefore may not be accessible here.
+        and therefore may not be accessible here, see `all_trials`.
+        """
+        return self._trials
+
+    def trials_array(self) -> Dict[str, np.ndarray]:
+        """
+        The trials run locally as a dictionary of NumPy arrays, with the `trial_id`,
+        the `loss`, the `step` and the properties of the trials, without copies.
+        See `TrialStore.to_numpy()`.
+        """
+        return self._trials.to_numpy()
+
+    @property
+    def all_trials(self) -> Mapping[int, FrozenTrial]:
+        """
+        Dictionary of all the trials of the study, including those run in independent runs,
+        as known to the history cache. Without a history cache, the trials run locally.
+        """
+        if self._history is None or not self.is_initialized:
+            return self.trials
+
+        self._history.sync(self._client, self._suid)
+        return self._history.trials(self._suid)
+
+    def top_trials(self, k: int) -> List[FrozenTrial]:
+        """
+        The `k` completed trials with the best loss, as known to the history cache.
+        Without a history cache, only the trials run locally are considered.
+        """
+        if self._history is not None and self.is_initialized:
+            self._history.sync(self._client, self._suid)
+            return self._history.top_trials(self._suid, k, self.direction)
+
+        sign = -1 if self.direction == 'maximize' else 1
+        columns = self._trials.to_numpy()
+        losses = np.where(np.isnan(columns['loss']), np.inf, sign * columns['loss'])
+        best = np.argsort(losses, kind='stable')[:k]
+        return [self._trials[int(columns['trial_id'][row])] for row in best if np.isfinite(losses[row])]
+
+    def _ask_properties(self) -> dict:
+        """
+        Internal. Builds the body of the request to /api/ask: the registered study and the hash
+        of its definition or, if the server does not support the registration, the whole definition
         """
-        return {k: FrozenTrial(self._suid, t.id, t.loss, t.properties)
-                for k, t in self._trials.items()}
+        with self._lock:
+            if self._registered is None:
+                self._register()
+
+        if self._registered:
+            properties = dict(hopaas_study=self._suid, hopaas_definition=self._definition_hash)
+        else:
+            properties = self._definition.copy()
+        if self._lease is not None:
+            properties['hopaas_config'] = dict(properties.get('hopaas_config', dict()),
+                                               lease=dict(duration=self._lease, worker=self._client.worker_id))
+        return properties
+
+    def _register(self, force: bool = False):
+        """Internal. Registers the definition of the study to the server, under the lock"""
+        study_id = self._client.register_study(self._definition, self._definition_hash, force=force)
+        self._registered = study_id is not None
+        if study_id is not None:
+            self._suid = study_id
+            self._trials.study_id = study_id
+
+    def _ask(self, ask: Callable[[dict], Union[dict, List[dict]]]):
+        """Internal. Calls `ask` with the body of /api/ask, registering the study again if the server forgot it"""
+        try:
+            return ask(self._ask_properties())
+        except HopaasServerError as e:
+            if e.status_code != 409 or not self._registered:
+                raise
+
+        with self._lock:
+            self._register(force=True)
+        return ask(self._ask_properties())
+
+    def prefetch(self, n_trials: int):
+        """
+        Requests `n_trials` suggestions to the server with a single batched query
+        and appends them to the local queue served by `trial()`.
+        """
+        self._prefetched.extend(self._acquire_leases(
+            self._ask(lambda properties: self._client.ask_batch(properties, n_trials))
+        ))
+
+    def _refill(self):
+        """Internal. Body of the background thread refilling the queue of prefetched trials"""
+        n_missing = self._prefetch_size - len(self._prefetched)
+        try:
+            if n_missing > 0:
+                self.prefetch(n_missing)
+        except Exception as e:
+            # Raised by the next trial, rather than lost with the thread
+            with self._lock:
+                self._refill_error = e
+
+    def _next_properties(self) -> dict:
+        """
+        Internal. Returns the response of /api/ask for the next trial, popping it
+        from the queue of prefetched trials if available and triggering the
+        background refill of the queue when it drops below the low-water mark.
+        """
+        with self._lock:
+            error, self._refill_error = self._refill_error, None
+        if error is not None:
+            raise error
+
+        try:
+            properties = self._prefetched.popleft()
+        except IndexError:
+            properties = None
+
+        if self._prefetch_size > 0 and len(self._prefetched) <= self._prefetch_size // 2:
+            with self._lock:
+                if self._refill_thread is None or not self._refill_thread.is_alive():
+                    self._refill_thread = threading.Thread(target=self._refill, daemon=True)
+                    self._refill_thread.start()
+
+        if properties is None:
+            properties = self._acquire_leases([self._ask(self._client.ask)])[0]
+
+        return properties
+
+    def _acquire_leases(self, responses: List[dict]) -> List[dict]:
+        """Internal. Starts renewing the leases of the trials in the responses of /api/ask, if any"""
+        if self._lease is not None:
+            for properties in responses:
+                self._client.leases.acquire(properties['hopaas_trial'], self._lease)
+        return responses
+
+    def _release_lease(self, hopaas_trial: str):
+        """Internal. Stops renewing the lease of a trial that ended"""
+        if self._lease is not None:
+            self._client.leases.release(hopaas_trial)
+
+    def discard_prefetched(self):
+        """
+        Informs the server that the prefetched trials still in the queue will not be run,
+        marking them as failed.
+        """
+        if self._refill_thread is not None:
+            self._refill_thread.join()
+
+        while len(self._prefetched):
+            hopaas_trial = self._prefetched.popleft()['hopaas_trial']
+            study_id, trial_id = hopaas_trial.split(':')
+            self._client.mark_as_failed(study_id=study_id,
+                                        trial_id=int(trial_id),
+                                        error="Prefetched trial discarded")
+            self._release_lease(hopaas_trial)
+
+    def close(self):
+        """
+        Discards the prefetched trials (see `discard_prefetched`) and, with `async_report`,
+        waits for the results to be acknowledged by the server (see `flush`).
+        """
+        self.discard_prefetched()
+        if self._async_report:
+            self.flush()
+
+    def _open_trial(self, response: dict) -> Trial:
+        """Internal. Registers a new trial from the response of /api/ask"""
+        suid, trial_id = response['hopaas_trial'].split(':')
+        trial_id = int(trial_id)
+        properties = self._space.decode(response)
+        with self._lock:
+            if trial_id in self._trials:
+                raise HopaasConsistencyError
+
+            self._suid = suid
+            self._trials.study_id = suid
+            trial = Trial(study=self,
+                          properties=properties,
+                          trial_id=trial_id,
+                          row=self._trials.append(trial_id, properties))
+        trial._response = response
+        self._record(trial, RUNNING)
+        return trial
+
+    def _open_next_trial(self, next_properties: Callable[[], dict]) -> Trial:
+        """
+        Internal. Opens a new trial from the responses of /api/ask returned by `next_properties`,
+        reporting right away those whose loss is memoized, at most `MAX_MEMOIZED_IN_A_ROW` in a row
+        """
+        for _ in range(self.MAX_MEMOIZED_IN_A_ROW):
+            trial = self._open_trial(next_properties())
+            loss = self._memoized_loss(trial)
+            if loss is None:
+                return trial
+            self._report_memoized(trial, loss)
+
+        logger.warning("%d memoized trials in a row in study %s: running the next one anyway",
+                       self.MAX_MEMOIZED_IN_A_ROW, self._name)
+        return self._open_trial(next_properties())
+
+    def _memo_key(self, properties: Mapping) -> str:
+        """Internal. Content hash of the properties of a trial and of the definition of the study"""
+        return definition_hash(dict(definition=self._definition_hash, properties=dict(properties)))
+
+    def _memoized_loss(self, trial: Trial) -> Union[float, None]:
+        """
+        Internal. The loss of a completed trial with the same properties, if memoized here
+        or in the history cache, `None` otherwise
+        """
+        if not self._memoize:
+            return None
+
+        key = self._memo_key(trial.properties)
+        with self._lock:
+            loss = self._memo.get(key)
+        if loss is None and self._history is not None:
+            self._history.sync(self._client, self._suid)
+            self._index_history()
+            with self._lock:
+                loss = self._memo.get(key)
+        return loss
+
+    def _index_history(self):
+        """Internal. Memoizes the losses of the completed trials of the history cache not hashed yet"""
+        names = set(self._space.names)
+        for trial_id, frozen in self._history.trials(self._suid, COMPLETE).items():
+            if trial_id in self._memo_indexed:
+                continue
+            self._memo_indexed.add(trial_id)
+            if frozen.loss is None or set(frozen.properties) != names:
+                continue
+            try:
+                properties = self._space.decode(frozen.properties)
+            except HopaasConsistencyError:
+                continue
+            with self._lock:
+                self._memo.setdefault(self._memo_key(properties), frozen.loss)
+
+    def _report_memoized(self, trial: Trial, loss: float):
+        """Internal. Reports a trial as completed with its memoized loss"""
+        with self._lock:
+            self._n_memoized += 1
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.inc('hopaas_trials_memoized_total')
+        try:
+            trial.loss = loss
+            self._record(trial, COMPLETE)
+            self._report('tell', study_id=self._suid, trial_id=trial.id, loss=float(loss))
+        finally:
+            self._release_lease(f"{self._suid}:{trial.id}")
+
+    def _checkpoint_dir(self, trial: Trial) -> str:
+        """
+        Internal. Creates the checkpoint directory of the trial, describing the trial there.
+
+        Use `trial.checkpoint_dir`, instead.
+        """
+        with trial._lock:
+            if trial._checkpoint_dir is None:
+                path = os.path.join(self.checkpoints, str(self._suid).replace(os.sep, '_'), str(trial.id))
+                os.makedirs(path, exist_ok=True)
+                if not os.path.exists(os.path.join(path, CHECKPOINT_STATE)):
+                    self._write_checkpoint_state(path, trial, RUNNING)
+                trial._checkpoint_dir = path
+            return trial._checkpoint_dir
+
+    def _write_checkpoint_state(self, path: str, trial: Trial, state: str):
+        """Internal. Writes atomically the description of the trial in its checkpoint directory"""
+        filename = os.path.join(path, CHECKPOINT_STATE)
+        with open(filename + ".tmp", 'w') as file:
+            json.dump(dict(hopaas_trial=f"{self._suid}:{trial.id}", definition_hash=self._definition_hash,
+                           state=state, response=trial._response), file)
+        os.replace(filename + ".tmp", filename)
+
+    def preempted_trials(self) -> List[str]:
+        """
+        The `hopaas_trial` ids (`"study_id:trial_id"`) of the trials of this study whose checkpoint
+        directory was created and which never ended, e.g. because their job was preempted,
+        to be resumed with `trial(resume=...)`. Note that the trials still running in other
+        processes sharing the checkpoint directories are listed as well.
+        """
+        ret = []
+        for filename in sorted(glob.glob(os.path.join(self.checkpoints, '*', '*', CHECKPOINT_STATE))):
+            try:
+                with open(filename) as file:
+                    state = json.load(file)
+            except (OSError, ValueError):
+                continue
+            if state.get('definition_hash') == self._definition_hash and state.get('state') == RUNNING:
+                ret.append(state['hopaas_trial'])
+        return ret
+
+    def _resume_properties(self, hopaas_trial: str) -> dict:
+        """Internal. The response of /api/ask of a trial to be resumed, from its checkpoint directory"""
+        suid, trial_id = hopaas_trial.split(':')
+        filename = os.path.join(self.checkpoints, suid.replace(os.sep, '_'), trial_id, CHECKPOINT_STATE)
+        try:
+            with open(filename) as file:
+                state = json.load(file)
+        except (OSError, ValueError) as e:
+            raise HopaasConsistencyError(f"Cannot resume trial {hopaas_trial}: {e}") from None
+        if state.get('definition_hash') != self._definition_hash:
+            raise HopaasConsistencyError(f"Cannot resume trial {hopaas_trial}: it belongs to another study definition")
+        if state.get('state') != RUNNING:
+            raise HopaasConsistencyError(f"Cannot resume trial {hopaas_trial}: it is {state.get('state')}")
+        return state['response']
+
+    def _split_suggestions(self, trial: Trial, suggestions: Dict[str, Suggestion]) -> Dict[str, str]:
+        """
+        Internal. Validates the suggestions defined by run, consistently across the trials,
+        and returns the encoded ones not yet suggested to the trial
+        """
+        if self._memoize:
+            raise ValueError("Suggestions cannot be defined by run in a study memoizing the losses")
+        missing = dict()
+        with self._lock:
+            for name, suggestion in suggestions.items():
+                if name in self._properties:
+                    raise ValueError(f"{name} is a property of the study, it cannot be defined by run")
+                if not isinstance(suggestion, Suggestion):
+                    raise ValueError(f"{name} is not a suggestion: {suggestion!r}")
+                encoded = str(suggestion)
+                if name not in self._by_run:
+                    self._by_run[name] = encoded, compile_suggestion(name, suggestion)
+                elif self._by_run[name][0] != encoded:
+                    raise ValueError(f"{name} was defined by run as {self._by_run[name][0]}, not {encoded}")
+                if name not in trial.properties:
+                    missing[name] = encoded
+        return missing
+
+    def _decode_suggested(self, trial: Trial, missing: Dict[str, str], response: dict):
+        """Internal. Casts the values suggested by run and adds them to the properties of the trial"""
+        values = dict()
+        for name in missing:
+            if name not in response:
+                raise HopaasConsistencyError(f"No value suggested for {name}")
+            values[name] = self._by_run[name][1].decode(response[name])
+        trial._set_suggested(values)
+
+    def _suggest(self, trial: Trial, suggestions: Dict[str, Suggestion]) -> dict:
+        """
+        Internal. Samples the suggestions defined by run of a trial with a single request.
+
+        Use `trial.suggest(...)`, instead.
+        """
+        missing = self._split_suggestions(trial, suggestions)
+        if len(missing):
+            self._decode_suggested(trial, missing, self._client.suggest(self._suid, trial.id, missing))
+        return {name: trial.properties[name] for name in suggestions}
+
+    async def _asuggest(self, trial: Trial, suggestions: Dict[str, Suggestion]) -> dict:
+        """
+        Internal. Asynchronous version of `_suggest`.
+
+        Use `await trial.asuggest(...)`, instead.
+        """
+        missing = self._split_suggestions(trial, suggestions)
+        if len(missing):
+            response = await self.async_client.suggest(self._suid, trial.id, missing)
+            self._decode_suggested(trial, missing, response)
+        return {name: trial.properties[name] for name in suggestions}
+
+    def _record(self, trial: Trial, state: str):
+        """Internal. Writes the state of a trial through the history cache, if any"""
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.inc('hopaas_trials_total', state=state)
+        if self._history is not None:
+            self._history.record(self._suid, trial.id, state,
+                                 loss=trial.loss if state in [COMPLETE, PRUNED] else None,
+                                 properties=dict(trial.properties) if state == RUNNING else None)
+        if self._memoize and state == COMPLETE:
+            key = self._memo_key(trial.properties)
+            with self._lock:
+                self._memo[key] = trial.loss
+        if trial._checkpoint_dir is not None and state != RUNNING:
+            self._write_checkpoint_state(trial._checkpoint_dir, trial, state)
 
     @contextlib.contextmanager
-    def trial(self):
+    def trial(self, resume: Union[str, None] = None):
         """
         Context manager handling a trial for this study.
 
         It takes care of getting the suggestion from the hopaas server and
         updating the server with the final result of the trial. It also informs
         the server in case the trial gets aborted for whatever reason.
-        """
-        properties = self._properties.copy()
-        properties.update(hopaas_config=dict(
-            title=self._name,
-            direction=self.direction,
-            sampler=self._sampler.asdict(),
-            pruner=self._pruner.asdict()
-        ))
-        if self._special_properties is not None:
-            properties.update({
-                f"_{k}": v for k, v in self._special_properties.items()
-            })
-        properties = self._client.ask(properties)
-        self._suid, trial_id = properties['hopaas_trial'].split(':')
-        trial_id = int(trial_id)
-        if trial_id in self._trials.keys():
-            raise HopaasConsistencyError
 
-        trial = Trial(study=self,
-                      properties={k: v for k, v in properties.items()
-                                  if k not in ['hopaas_trial']},
-                      trial_id=trial_id)
-        self._trials[trial_id] = trial
+        resume: `str`, default: `None`
+            the `hopaas_trial` id of a trial that never ended, e.g. because its job was
+            preempted, to be resumed with the same id and properties instead of asking for a
+            new trial. The objective finds its checkpoints in `trial.checkpoint_dir`, e.g.:
+            ```
+            for hopaas_trial in study.preempted_trials():
+                with study.trial(resume=hopaas_trial) as trial:
+                    trial.loss = train(trial, checkpoints=trial.checkpoint_dir)
+            ```
+        """
+        metrics = self.metrics
+        start = time.perf_counter()
+        if resume is None:
+            trial = self._open_next_trial(self._next_properties)
+        else:
+            trial = self._open_trial(self._acquire_leases([self._resume_properties(resume)])[0])
+        if metrics is not None:
+            start = self._phase(metrics, 'ask', trial, start)
 
         try:
             yield trial
@@ -145,15 +714,357 @@ class Study:
             trial.loss = None
             raise e
         finally:
-            if trial.loss is not None:
-                if not trial.should_prune:
-                    self._client.tell(study_id=self._suid,
-                                      trial_id=trial.id,
-                                      loss=float(trial.loss))
+            if metrics is not None:
+                start = self._phase(metrics, 'objective', trial, start)
+            self._close_trial(trial)
+            if metrics is not None:
+                self._phase(metrics, 'report', trial, start)
+
+    @property
+    def metrics(self) -> Union[Metrics, None]:
+        """The metrics of the client of the study, None if disabled"""
+        return getattr(self._client, 'metrics', None)
+
+    def _phase(self, metrics: Metrics, phase: str, trial: Trial, start: float) -> float:
+        """Internal. Records a phase of a trial started at `start` (`time.perf_counter()`), returns its end"""
+        end = time.perf_counter()
+        metrics.observe('hopaas_trial_phase_seconds', end - start, phase=phase)
+        metrics.span(f"hopaas.trial.{phase}", time.time() - (end - start), end - start,
+                     study=self._name, trial=str(trial.id))
+        return end
+
+    def _close_trial(self, trial: Trial, error: str = "Computation aborted"):
+        """Internal. Reports the final result of a trial, as completed, pruned or failed"""
+        try:
+            self._report_trial(trial, error)
+        finally:
+            self._release_lease(f"{self._suid}:{trial.id}")
+
+    def _report_trial(self, trial: Trial, error: str):
+        """Internal. Body of `_close_trial`"""
+        if trial.loss is not None:
+            if not trial.should_prune:
+                self._stream_intermediate(trial, force=True)
+                self._record(trial, COMPLETE)
+                self._report('tell', study_id=self._suid,
+                             trial_id=trial.id,
+                             loss=float(trial.loss))
             else:
-                self._client.mark_as_failed(study_id=self._suid,
-                                            trial_id=trial.id,
-                                            error="Computation aborted")
+                self._record(trial, PRUNED)
+                if self._halving is not None:
+                    self._report('mark_as_failed', study_id=self._suid,
+                                 trial_id=trial.id,
+                                 error=self._halving_error(trial))
+        else:
+            self._stream_intermediate(trial, force=True)
+            self._record(trial, FAILED)
+            self._report('mark_as_failed', study_id=self._suid,
+                         trial_id=trial.id,
+                         error=error)
+
+    def _report(self, method: str, **kwargs):
+        """Internal. Sends the final result of a trial, possibly through the background reporter"""
+        if self._async_report:
+            self._client.reporter.submit(method, **kwargs)
+        else:
+            getattr(self._client, method)(**kwargs)
+
+    async def _areport(self, method: str, **kwargs):
+        """Internal. Asynchronous version of `_report`, queuing to the background reporter without blocking"""
+        if self._async_report:
+            self._report(method, **kwargs)
+        else:
+            await self.async_client.run_in_executor(self._report, method, **kwargs)
+
+    def _pending_intermediate(self, trial: Trial, force: bool = False,
+                              before_latest: bool = False) -> Union[List[List[float]], None]:
+        """
+        Internal. The intermediate values of the trial not uploaded yet, if they fill
+        a chunk or if `force`d, and the trial was not pruned by the server.
+
+        With `before_latest`, the latest value is excluded and counted as uploaded,
+        for it is reported by the query on pruning itself.
+        """
+        with trial._lock:
+            n_pending = trial._n_values - trial._n_streamed
+            if self._stream_chunk <= 0 or n_pending == 0 or trial._prune_decision:
+                return None
+            if n_pending < self._stream_chunk and not force:
+                return None
+
+            values = trial._history[trial._n_streamed:trial._n_values - int(before_latest)].tolist()
+            trial._n_streamed = trial._n_values
+            return values or None
+
+    def _stream_intermediate(self, trial: Trial, force: bool = False, before_latest: bool = False):
+        """Internal. Uploads the pending intermediate values of the trial, see `stream_intermediate`"""
+        values = self._pending_intermediate(trial, force, before_latest)
+        if values is not None:
+            self._report('report_intermediate', study_id=self._suid, trial_id=trial.id, values=values)
+
+    async def _astream_intermediate(self, trial: Trial, force: bool = False, before_latest: bool = False):
+        """Internal. Asynchronous version of `_stream_intermediate`"""
+        values = self._pending_intermediate(trial, force, before_latest)
+        if values is not None:
+            await self._areport('report_intermediate', study_id=self._suid, trial_id=trial.id, values=values)
+
+    def flush(self, timeout: Union[float, None] = None) -> bool:
+        """
+        Waits for the results queued with `async_report=True` to be acknowledged
+        by the server, for at most `timeout` seconds. Returns False on timeout, and
+        raises `HopaasError` if results were given up, see `Reporter`.
+        """
+        return self._client.reporter.flush(timeout)
+
+    def optimize(self,
+                 objective: Callable[[Trial], Union[float, None]],
+                 n_trials: Union[int, None] = None,
+                 n_jobs: int = 1,
+                 backend: str = 'thread',
+                 catch: Tuple[type, ...] = (),
+                 timeout: Union[float, None] = None):
+        """
+        Runs `n_trials` trials, or as many as possible in `timeout` seconds, evaluating
+        `objective` on `n_jobs` trials at a time.
+
+        The objective receives the `Trial` and returns its final loss, or `None` if it
+        set `trial.loss` itself (e.g. when stopping early because of pruning). Success,
+        failure and pruning are reported as with `trial()`. For example:
+        ```
+        def objective(trial):
+            return (trial.x - 1)**2
+
+        study.optimize(objective, n_trials=100, n_jobs=8)
+        ```
+
+        objective: `Callable`
+            the function evaluating a trial, it must be picklable with the `"process"` backend.
+
+        n_trials: `int`, default: `None`
+            the number of trials to run, `None` for no limit if `timeout` is given.
+
+        n_jobs: `int`, default: `1`
+            the number of trials run concurrently, `-1` for the number of CPUs.
+
+        backend: `str`, default: `"thread"`
+            `"thread"` runs the objective in a pool of threads of this process, `"process"` in
+            a pool of worker processes, each with a copy of the study. A crash of a worker process
+            only marks as failed the trial it was running.
+
+        catch: `tuple`, default: `()`
+            exception types raised by the objective that mark the trial as failed without
+            stopping the optimization. Other exceptions stop it, after marking the trial as failed.
+
+        timeout: `float`, default: `None`
+            no trial is started after `timeout` seconds, the running ones are completed.
+        """
+        from hopaas_client import executors
+
+        if n_jobs == -1:
+            n_jobs = os.cpu_count() or 1
+        if n_jobs < 1:
+            raise ValueError(f"Invalid number of jobs {n_jobs}")
+        if n_trials is None and timeout is None:
+            raise ValueError("Either n_trials or timeout must be given")
+
+        budget = executors.Budget(n_trials, timeout)
+        if backend == 'thread':
+            executors.run_threads(self, objective, budget, n_jobs, catch)
+        elif backend == 'process':
+            from hopaas_client.LocalClient import LocalClient
+            if isinstance(self._client, LocalClient):
+                raise ValueError("The process backend requires a hopaas server, LocalClient is in-process")
+            if self._halving is not None and self._halving.path is None:
+                raise ValueError("The process backend requires the successive halving to be recorded "
+                                 "in a database shared by the worker processes, see SuccessiveHalving(path=...)")
+            executors.run_processes(self, objective, budget, n_jobs, catch)
+        else:
+            raise ValueError(f"Unknown backend {backend}, use either 'thread' or 'process'")
+
+    def __getstate__(self):
+        """
+        Internal. The configuration of the study, as copied to the worker processes of `optimize`:
+        trials, prefetched suggestions, history cache and background threads are not copied.
+        """
+        state = self.__dict__.copy()
+        state.update(_async_client=None, _prefetch_size=0, _prefetched=deque(), _refill_thread=None,
+                     _refill_error=None, _async_report=False, _history=None, _trials=None, _memo=dict(),
+                     _memo_indexed=set(), _lock=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+        self._trials = TrialStore(self._suid)
+
+    @property
+    def async_client(self) -> "AsyncClient":
+        """The `AsyncClient` used by `atrial()`, sharing the connections of the client of the study"""
+        if self._async_client is None:
+            from hopaas_client.AsyncClient import AsyncClient
+            self._async_client = AsyncClient(self._client)
+        return self._async_client
+
+    @contextlib.asynccontextmanager
+    async def atrial(self):
+        """
+        Asynchronous context manager handling a trial for this study.
+
+        It is the counterpart of `trial()` to be used with `async with`, reporting
+        success, failure and pruning in the same way, without blocking the event loop
+        while waiting for the hopaas server. For example:
+        ```
+        async def run(study):
+            async with study.atrial() as trial:
+                trial.loss = await objective(trial.x)
+
+        await asyncio.gather(*[run(study) for _ in range(20)])
+        ```
+        """
+        client = self.async_client
+        metrics = self.metrics
+        start = time.perf_counter()
+        # Registration, ask and memoized trials in the worker threads of the asynchronous client
+        trial = await client.run_in_executor(self._open_next_trial,
+                                             lambda: self._acquire_leases([self._ask(self._client.ask)])[0])
+        trial._asynchronous = True
+        if metrics is not None:
+            start = self._phase(metrics, 'ask', trial, start)
+
+        try:
+            yield trial
+        except (KeyboardInterrupt, asyncio.CancelledError) as e:
+            trial.loss = None
+            if isinstance(e, asyncio.CancelledError):
+                raise e
+        except Exception as e:
+            trial.loss = None
+            raise e
+        finally:
+            if metrics is not None:
+                start = self._phase(metrics, 'objective', trial, start)
+            try:
+                await self._areport_trial(trial)
+            finally:
+                self._release_lease(f"{self._suid}:{trial.id}")
+                if metrics is not None:
+                    self._phase(metrics, 'report', trial, start)
+
+    async def _areport_trial(self, trial: Trial):
+        """Internal. Asynchronous version of `_report_trial`"""
+        if trial.loss is not None:
+            if not await self.ashould_prune(trial):
+                await self._astream_intermediate(trial, force=True)
+                self._record(trial, COMPLETE)
+                await self._areport('tell', study_id=self._suid,
+                                    trial_id=trial.id,
+                                    loss=float(trial.loss))
+            else:
+                self._record(trial, PRUNED)
+                if self._halving is not None:
+                    await self._areport('mark_as_failed', study_id=self._suid,
+                                        trial_id=trial.id,
+                                        error=self._halving_error(trial))
+        else:
+            await self._astream_intermediate(trial, force=True)
+            self._record(trial, FAILED)
+            await self._areport('mark_as_failed', study_id=self._suid,
+                                trial_id=trial.id,
+                                error="Computation aborted")
+
+    @property
+    def n_prune_queries_avoided(self) -> int:
+        """
+        Number of reads of `trial.should_prune` answered without querying the server,
+        because the pruner would not act on that step, because the decision could be
+        taken locally or because of `prune_min_interval`.
+        """
+        return self._n_prune_queries_avoided
+
+    def _count_avoided_prune_query(self):
+        """Internal. Increments `n_prune_queries_avoided`"""
+        with self._lock:
+            self._n_prune_queries_avoided += 1
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.inc('hopaas_prune_queries_avoided_total')
+
+    def _local_prune_decision(self, trial: Trial) -> Union[bool, None]:
+        """
+        Internal. Returns the pruning decision for the current step of the trial
+        if it can be taken without querying the server, `None` otherwise.
+        """
+        if trial.loss is None:
+            return False
+
+        if trial._prune_step == trial.step:
+            return trial._prune_decision
+
+        if self._lease is not None and self._client.leases.is_lost(f"{self._suid}:{trial.id}"):
+            self._count_avoided_prune_query()
+            return self._store_prune_decision(trial, True)
+
+        if self._halving is not None:
+            self._count_avoided_prune_query()
+            return self._store_prune_decision(trial, self._halving_decision(trial))
+
+        if not self._pruner.is_pruning_step(trial.step):
+            self._count_avoided_prune_query()
+            return trial._prune_decision
+
+        decision = self._pruner.decide(trial.loss, trial.step)
+        if decision is False:
+            self._count_avoided_prune_query()
+            return self._store_prune_decision(trial, False)
+
+        if decision is None and trial._prune_time is not None and \
+                time.monotonic() - trial._prune_time < self._prune_min_interval:
+            self._count_avoided_prune_query()
+            return trial._prune_decision
+
+        return None
+
+    def _halving_decision(self, trial: Trial) -> bool:
+        """
+        Internal. Evaluates the trial on the rungs of the successive halving whose budget it
+        exhausted, promoting it to the next rung, returns True if the trial is to be stopped
+        """
+        with trial._lock:
+            if trial._prune_decision:
+                return True
+            loss, n_resources = trial._loss, trial._step + 1
+
+        rungs = self._halving.rungs
+        while loss is not None and trial._rung < len(rungs) - 1 and n_resources >= rungs[trial._rung]:
+            if not self._halving.promote(self._definition_hash, trial.id, trial._rung, loss, self.direction):
+                return True
+            trial._rung += 1
+        return False
+
+    def _budget(self, trial: Trial) -> Union[int, None]:
+        """
+        Internal. The resources granted to the trial, after evaluating it on the rungs it completed.
+
+        Use `trial.budget`, instead.
+        """
+        if self._halving is None:
+            return None
+        self._store_prune_decision(trial, self._halving_decision(trial))
+        return self._halving.budget(trial._rung)
+
+    @staticmethod
+    def _halving_error(trial: Trial) -> str:
+        """Internal. Reason reported to the server for a trial stopped by the successive halving"""
+        return f"Stopped by successive halving after {trial.step + 1} resources"
+
+    @staticmethod
+    def _store_prune_decision(trial: Trial, decision: bool) -> bool:
+        """Internal. Caches the pruning decision for the current step of the trial"""
+        with trial._lock:
+            trial._prune_decision = decision
+            trial._prune_step = trial.step
+            trial._prune_time = time.monotonic()
+        return decision
 
     def should_prune(self, trial: Trial) -> bool:
         """
@@ -162,10 +1073,38 @@ class Study:
 
         Use `trial.should_prune`, instead.
         """
-        if trial.loss is None:
-            return False
-        else:
-            return self._client.should_prune(study_id=self._suid,
-                                             trial_id=trial.id,
-                                             loss=trial.loss,
-                                             step=trial.step)
+        decision = self._local_prune_decision(trial)
+        if decision is not None:
+            return decision
+
+        self._stream_intermediate(trial, force=True, before_latest=True)
+        return self._store_prune_decision(trial, self._client.should_prune(study_id=self._suid,
+                                                                           trial_id=trial.id,
+                                                                           loss=trial.loss,
+                                                                           step=trial.step))
+
+    async def ashould_prune(self, trial: Trial) -> bool:
+        """
+        Internal. Asynchronous version of `should_prune`.
+
+        Use `await trial.ashould_prune()`, instead.
+        """
+        decision = self._local_prune_decision(trial)
+        if decision is not None:
+            return decision
+
+        await self._astream_intermediate(trial, force=True, before_latest=True)
+        return self._store_prune_decision(trial, await self.async_client.should_prune(study_id=self._suid,
+                                                                                      trial_id=trial.id,
+                                                                                      loss=trial.loss,
+                                                                                      step=trial.step))
+
+
+def _close_at_exit(study_ref: "weakref.ref[Study]"):
+    """Internal. Discards the prefetched trials of a study still alive at exit"""
+    study = study_ref()
+    if study is not None:
+        try:
+            study.discard_prefetched()
+        except Exception as e:
+            logger.warning("Prefetched trials of study %s not discarded: %s", study._name, e)
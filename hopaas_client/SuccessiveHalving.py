@@ -0,0 +1,126 @@
+import collections
+import sqlite3
+import threading
+from typing import Union, Dict, Tuple, List
+
+from hopaas_client.pruners import HyperbandPruner
+
+
+class SuccessiveHalving:
+    """
+    Client-side asynchronous successive halving (ASHA) of the trials of a study.
+
+    Each trial is granted an explicit budget of resources (see `Trial.budget`), counted as
+    the number of updates of its loss, e.g. epochs. The budgets grow geometrically along the
+    rungs `min_resources`, `min_resources * reduction_factor`, ... up to `max_resources`.
+    When a trial exhausts the budget of a rung, its loss is compared with those of the other
+    trials that reached the same rung: the trial is promoted to the next rung if its loss is
+    among the best `1 / reduction_factor` of them, otherwise it is stopped and reported as
+    pruned. The decisions are taken without waiting for the other trials and without
+    querying the server, see `Study(halving=...)`.
+
+    min_resources: `int`, default: `1`
+        budget of the first rung.
+
+    max_resources: `int`, default: `81`
+        budget of the last rung, the trials reaching it run to completion.
+
+    reduction_factor: `int`, default: `3`
+        growth factor of the budgets between consecutive rungs, the inverse of the
+        fraction of the trials promoted.
+
+    path: `str`, default: `None`
+        path to a SQLite database recording the losses on the rungs, shared by all the
+        processes (e.g. the workers of `Study.optimize(backend="process")` or independent
+        jobs on a shared filesystem). By default, the losses are recorded in memory and
+        shared by the threads of this process only.
+    """
+    def __init__(self,
+                 min_resources: int = 1,
+                 max_resources: int = 81,
+                 reduction_factor: int = 3,
+                 path: Union[str, None] = None):
+        if min_resources < 1 or max_resources < min_resources:
+            raise ValueError(f"Invalid resources [{min_resources}, {max_resources}]")
+        if reduction_factor < 2:
+            raise ValueError(f"Invalid reduction factor {reduction_factor}, at least 2 is needed")
+        self.min_resources = int(min_resources)
+        self.max_resources = int(max_resources)
+        self.reduction_factor = int(reduction_factor)
+        self.path = path
+
+        rungs = []
+        budget = self.min_resources
+        while budget < self.max_resources:
+            rungs.append(budget)
+            budget *= self.reduction_factor
+        self.rungs: Tuple[int, ...] = tuple(rungs) + (self.max_resources,)
+
+        self._lock = threading.Lock()
+        # Losses on the rungs, by study and rung, then by trial (without `path`)
+        self._values: Dict[Tuple[str, int], Dict[int, float]] = collections.defaultdict(dict)
+        self._db: Union[sqlite3.Connection, None] = None
+
+    @classmethod
+    def from_hyperband(cls, pruner: HyperbandPruner, path: Union[str, None] = None) -> "SuccessiveHalving":
+        """The successive halving with the resources and the reduction factor of a `HyperbandPruner`"""
+        if pruner.max_resources == 'auto':
+            raise ValueError("The maximum resources of the pruner must be given explicitly")
+        return cls(pruner.min_resources, int(pruner.max_resources), pruner.reduction_factor, path)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(_lock=None, _values=None, _db=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._values = collections.defaultdict(dict)
+
+    def budget(self, rung: int) -> int:
+        """The resources granted to the trials promoted to `rung`"""
+        return self.rungs[min(rung, len(self.rungs) - 1)]
+
+    def promote(self, study: str, trial_id: int, rung: int, loss: float, direction: str = 'minimize') -> bool:
+        """
+        Records the loss of a trial that exhausted the budget of `rung`, and returns whether
+        it is promoted to the next rung, given the losses of the trials of `study` on the rung.
+        """
+        competing = sorted(self._record(study, trial_id, rung, float(loss)))
+        if direction == 'maximize':
+            competing.reverse()
+        # The first trials on a rung are promoted only if they are the best so far
+        n_promoted = max(1, len(competing) // self.reduction_factor)
+        best = competing[n_promoted - 1]
+        return loss >= best if direction == 'maximize' else loss <= best
+
+    def _record(self, study: str, trial_id: int, rung: int, loss: float) -> List[float]:
+        """Internal. Records the loss of the trial on the rung, returns all the losses on the rung"""
+        with self._lock:
+            if self.path is None:
+                values = self._values[study, rung]
+                values[trial_id] = loss
+                return list(values.values())
+
+            db = self._connect()
+            db.execute("INSERT OR REPLACE INTO rungs (study, rung, trial_id, loss) VALUES (?, ?, ?, ?)",
+                       (study, rung, trial_id, loss))
+            rows = db.execute("SELECT loss FROM rungs WHERE study = ? AND rung = ?", (study, rung)).fetchall()
+            return [row[0] for row in rows]
+
+    def _connect(self) -> sqlite3.Connection:
+        """Internal. Opens the database, once per process, under the lock"""
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30.)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS rungs (
+                    study TEXT NOT NULL,
+                    rung INTEGER NOT NULL,
+                    trial_id INTEGER NOT NULL,
+                    loss REAL NOT NULL,
+                    PRIMARY KEY (study, rung, trial_id)
+                )
+            """)
+        return self._db
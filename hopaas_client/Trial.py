@@ -1,7 +1,14 @@
-from copy import deepcopy
-from typing import Union
+import threading
+import time
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Union, Mapping, Any, Dict, Sequence
 
-from hopaas_client import Study
+import numpy as np
+
+from hopaas_client import suggestions as hs
+
+if TYPE_CHECKING:
+    from hopaas_client.Study import Study
 
 
 class Trial:
@@ -20,16 +27,45 @@ class Trial:
         trial.loss = trial.x**2
     ```
     """
-    def __init__(self, study: Study, properties: dict, trial_id: int):
+    # Number of intermediate values preallocated for each trial, doubled when exceeded
+    HISTORY_CAPACITY = 16
+
+    def __init__(self, study: "Study", properties: dict, trial_id: int, row: Union[int, None] = None):
         self._properties = properties
+        # The properties are plain instance attributes, read without calling `__getattr__`,
+        # unless shadowed by the members of the class
+        self.__dict__.update({k: v for k, v in properties.items() if k not in _MEMBERS and k[:1] != '_'})
+        # Properties defined by run, see `suggest`
+        self._suggested: Dict[str, Any] = dict()
+        self._row = row
         self._study = study
         self._loss = None
         self._step = -1
         self._id = trial_id
+        # Response of /api/ask the trial was opened from, and its checkpoint directory once created
+        self._response: Union[dict, None] = None
+        self._checkpoint_dir: Union[str, None] = None
+        # Serializes the updates of the loss, of its history and of the pruning decision
+        self._lock = threading.Lock()
+
+        # (step, loss, timestamp) of each update of the loss, the first `_n_values` rows are valid
+        self._history = np.empty((self.HISTORY_CAPACITY, 3))
+        self._n_values = 0
+        # Number of intermediate values already uploaded to the server, see `Study(stream_intermediate=...)`
+        self._n_streamed = 0
+        # Whether the trial is run within `Study.atrial()`, uploading intermediate values only when awaited
+        self._asynchronous = False
+
+        # Most recent pruning decision obtained from the server and when it was taken
+        self._prune_decision = False
+        self._prune_step: Union[int, None] = None
+        self._prune_time: Union[float, None] = None
+        # Rung of the successive halving the trial is running for, see `budget`
+        self._rung = 0
 
     def __getattr__(self, item):
         """
-        Simplified method to access the properties
+        Simplified method to access the properties shadowed by the members of the class
         """
         if item in self._properties.keys():
             return self._properties[item]
@@ -43,6 +79,16 @@ class Trial:
         """
         return self._id
 
+    @property
+    def checkpoint_dir(self) -> str:
+        """
+        Directory where the objective can save its checkpoints, created on first access as
+        `<study.checkpoints>/<study_id>/<trial_id>`. If the job running the trial is preempted,
+        the trial can be resumed with the same id with `study.trial(resume=...)`, finding
+        the checkpoints it saved in the same directory.
+        """
+        return self._study._checkpoint_dir(self)
+
     @property
     def loss(self) -> Union[float, None]:
         """The most recent loss evaluation"""
@@ -52,15 +98,118 @@ class Trial:
         return float(self._loss)
 
     @property
-    def properties(self):
-        """Read-only version of the properties (here suggestions are parsed, already)"""
-        return deepcopy(self._properties)
+    def properties(self) -> Mapping[str, Any]:
+        """Read-only view of the properties (here suggestions are parsed, already)"""
+        return MappingProxyType(self._properties)
 
     @loss.setter
     def loss(self, value: float):
         """Setter for the loss, used to update the loss computation. Automatically updates the step number."""
-        self._step += 1
-        self._loss = float(value) if value is not None else None
+        with self._lock:
+            self._step += 1
+            self._loss = float(value) if value is not None else None
+            if self._loss is not None:
+                if self._n_values == len(self._history):
+                    extension = np.empty((max(self._n_values, self.HISTORY_CAPACITY), 3))
+                    self._history = np.concatenate([self._history, extension])
+                self._history[self._n_values] = self._step, self._loss, time.time()
+                self._n_values += 1
+
+            if self._row is not None:
+                self._study._trials.set_result(self._row, self._loss, self._step)
+        if not self._asynchronous:
+            self._study._stream_intermediate(self)
+
+    def suggest(self, suggestions: Dict[str, hs.Suggestion]) -> Dict[str, Any]:
+        """
+        Define-by-run suggestions: the values for this trial of `suggestions`, a dictionary
+        from the names of new properties to `hopaas_client.suggestions`.
+
+        The suggestions not yet sampled for this trial are sampled by the server with a
+        single request, the others are returned with no request. The values are then
+        available as any other property, e.g. `trial.lr`. Suggesting only the properties
+        relevant to the branch taken by the trial keeps the search space of the sampler small:
+        ```
+        with study.trial() as trial:
+            if trial.suggest_categorical("optimizer", ["sgd", "adam"]) == "sgd":
+                lr, momentum = trial.suggest(dict(lr=LogUniform(1e-5, 1e-1), momentum=Float(0, 1))).values()
+            else:
+                lr = trial.suggest_float("lr", 1e-5, 1e-1, log=True)
+        ```
+        A name must always be suggested with the same domain, and not be a property of the study.
+        """
+        return self._study._suggest(self, suggestions)
+
+    async def asuggest(self, suggestions: Dict[str, hs.Suggestion]) -> Dict[str, Any]:
+        """
+        Asynchronous version of `suggest`, to be awaited within `Study.atrial()`.
+        """
+        return await self._study._asuggest(self, suggestions)
+
+    def suggest_int(self, name: str, low: int, high: int, step: int = 1, log: bool = False) -> int:
+        """Define-by-run integer in `[low, high]`, see `suggest`"""
+        return self.suggest({name: hs.Int(low, high, step, log)})[name]
+
+    def suggest_float(self, name: str, low: float, high: float, log: bool = False) -> float:
+        """Define-by-run floating-point number in `[low, high]`, see `suggest`"""
+        return self.suggest({name: hs.LogUniform(low, high) if log else hs.Float(low, high)})[name]
+
+    def suggest_categorical(self, name: str, choices: Sequence[Any]) -> Any:
+        """Define-by-run choice among `choices`, see `suggest`"""
+        return self.suggest({name: hs.Categorical(list(choices))})[name]
+
+    def _set_suggested(self, values: Dict[str, Any]):
+        """Internal. Adds the values defined by run to the properties"""
+        self._properties.update(values)
+        self._suggested.update(values)
+        self.__dict__.update({k: v for k, v in values.items() if k not in _MEMBERS and k[:1] != '_'})
+        if self._row is not None:
+            self._study._trials.set_properties(self._row, values)
+
+    def _export_state(self) -> dict:
+        """Internal. The results of the trial, to be transferred from a worker process"""
+        return dict(loss=self._loss, step=self._step, history=self.history.copy(), n_streamed=self._n_streamed,
+                    prune_decision=self._prune_decision, prune_step=self._prune_step,
+                    suggested=dict(self._suggested), checkpoint_dir=self._checkpoint_dir, rung=self._rung)
+
+    def _import_state(self, state: dict):
+        """Internal. Updates the trial with the results obtained in a worker process"""
+        with self._lock:
+            self._loss, self._step = state['loss'], state['step']
+            self._history, self._n_values = state['history'], len(state['history'])
+            self._n_streamed = state['n_streamed']
+            self._prune_decision, self._prune_step = state['prune_decision'], state['prune_step']
+            self._checkpoint_dir = state['checkpoint_dir']
+            self._rung = state['rung']
+        self._set_suggested(state['suggested'])
+        if self._row is not None:
+            self._study._trials.set_result(self._row, self._loss, self._step)
+
+    @property
+    def history(self) -> np.ndarray:
+        """
+        The learning curve of the trial: a read-only array of shape `(n_updates, 3)`
+        with the step, the loss and the timestamp of each update of the loss.
+        """
+        with self._lock:
+            view = self._history[:self._n_values]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def budget(self) -> Union[int, None]:
+        """
+        The resources granted to the trial by the successive halving of the study, as the number
+        of updates of the loss (e.g. epochs), `None` without successive halving. When the trial
+        exhausts its budget, it is either promoted, and the budget grows, or stopped, and the
+        budget stays the same, see `Study(halving=...)`. For example:
+        ```
+        while trial.step + 1 < trial.budget:
+            model.fit(epochs=1)
+            trial.loss = model.evaluate()
+        ```
+        """
+        return self._study._budget(self)
 
     @property
     def step(self) -> int:
@@ -74,3 +223,13 @@ class Trial:
         given the most recent update of the loss.
         """
         return self._study.should_prune(self)
+
+    async def ashould_prune(self) -> bool:
+        """
+        Asynchronous version of `should_prune`, to be awaited within `Study.atrial()`.
+        """
+        return await self._study.ashould_prune(self)
+
+
+# Names of the members of `Trial`, taking precedence over the properties
+_MEMBERS = frozenset(dir(Trial))
@@ -0,0 +1,188 @@
+import threading
+from collections.abc import Mapping
+from typing import Union, Dict, Any, Iterator
+
+import numpy as np
+
+from hopaas_client.FrozenTrial import FrozenTrial
+
+# Kinds of the columns of the properties, in order of generality of the numerical ones
+_BOOL, _INT, _FLOAT, _OBJECT = 'bool', 'int', 'float', 'object'
+_KINDS = (_BOOL, _INT, _FLOAT, _OBJECT)
+
+
+def _kind(value) -> str:
+    """Internal. Kind of the column needed to store a property value"""
+    if isinstance(value, (bool, np.bool_)):
+        return _BOOL
+    if isinstance(value, (int, np.integer)) and abs(value) < 2**53:
+        return _INT
+    if isinstance(value, (float, np.floating)):
+        return _FLOAT
+    return _OBJECT
+
+
+class TrialStore (Mapping):
+    """
+    Columnar, in-memory store of the trials of a study.
+
+    Trial ids, losses and steps are stored in preallocated NumPy arrays, with one
+    row per trial, and each property is stored in a column of its own: a `float64`
+    array for numerical (and boolean) properties, an `object` array otherwise.
+    Missing values are tracked with a boolean mask per column, and the kind of
+    each value, so that it is read back with the type it was stored with.
+
+    The store is a read-only mapping from the trial id to a `FrozenTrial` view on
+    the corresponding row, see `Study.trials`, and `to_numpy()` exports the columns
+    without copying them. Writes are serialized by a lock, so that trials can be
+    appended and updated by several threads.
+    """
+    INITIAL_CAPACITY = 64
+
+    def __init__(self, study_id: Union[str, None] = None):
+        self.study_id = study_id
+        self._n_trials = 0
+        self._rows: Dict[int, int] = dict()
+        self._ids = np.empty(self.INITIAL_CAPACITY, dtype=np.int64)
+        self._losses = np.full(self.INITIAL_CAPACITY, np.nan)
+        self._has_loss = np.zeros(self.INITIAL_CAPACITY, dtype=bool)
+        self._steps = np.full(self.INITIAL_CAPACITY, -1, dtype=np.int64)
+        self._columns: Dict[str, np.ndarray] = dict()
+        self._present: Dict[str, np.ndarray] = dict()
+        self._kinds: Dict[str, str] = dict()
+        self._row_kinds: Dict[str, np.ndarray] = dict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return len(self._ids)
+
+    def _grow(self):
+        """Internal. Doubles the capacity of the store"""
+        def extend(array, fill):
+            return np.concatenate([array, np.full(len(array), fill, dtype=array.dtype)])
+
+        self._ids = extend(self._ids, 0)
+        self._losses = extend(self._losses, np.nan)
+        self._has_loss = extend(self._has_loss, False)
+        self._steps = extend(self._steps, -1)
+        for name, column in self._columns.items():
+            self._columns[name] = extend(column, None if column.dtype == object else np.nan)
+            self._present[name] = extend(self._present[name], False)
+            self._row_kinds[name] = extend(self._row_kinds[name], 0)
+
+    def _store_value(self, name: str, row: int, value):
+        """Internal. Writes a property value, creating or generalizing its column if needed"""
+        kind = _kind(value)
+        if name not in self._columns:
+            dtype = object if kind == _OBJECT else np.float64
+            self._columns[name] = np.full(self.capacity, None if kind == _OBJECT else np.nan, dtype=dtype)
+            self._present[name] = np.zeros(self.capacity, dtype=bool)
+            self._row_kinds[name] = np.zeros(self.capacity, dtype=np.int8)
+            self._kinds[name] = kind
+        elif kind != self._kinds[name]:
+            if _OBJECT in (kind, self._kinds[name]):
+                if self._columns[name].dtype != object:
+                    column = self._columns[name].astype(object)
+                    column[~self._present[name]] = None
+                    # Restore the original python types of the values converted to float
+                    rows = np.flatnonzero(self._present[name])
+                    column[rows] = [self._cast(_KINDS[self._row_kinds[name][r]])(column[r]) for r in rows]
+                    self._columns[name] = column
+                self._kinds[name] = _OBJECT
+            else:
+                self._kinds[name] = max(kind, self._kinds[name], key=_KINDS.index)
+
+        self._columns[name][row] = value
+        self._present[name][row] = True
+        self._row_kinds[name][row] = _KINDS.index(kind)
+
+    @staticmethod
+    def _cast(kind: str):
+        return dict(bool=bool, int=int, float=float).get(kind, lambda v: v)
+
+    def append(self, trial_id: int, properties: Dict[str, Any]) -> int:
+        """Adds a new trial, returning its row"""
+        with self._lock:
+            if trial_id in self._rows:
+                raise KeyError(f"Trial {trial_id} already in the store")
+
+            if self._n_trials == self.capacity:
+                self._grow()
+
+            row = self._n_trials
+            self._ids[row] = trial_id
+            for name, value in properties.items():
+                self._store_value(name, row, value)
+
+            self._rows[trial_id] = row
+            self._n_trials += 1
+            return row
+
+    def set_properties(self, row: int, properties: Dict[str, Any]):
+        """Adds properties to the trial in the row `row`, e.g. those defined by run"""
+        with self._lock:
+            for name, value in properties.items():
+                self._store_value(name, row, value)
+
+    def set_result(self, row: int, loss: Union[float, None], step: int):
+        """Updates the loss and the step of the trial in the row `row`"""
+        with self._lock:
+            self._has_loss[row] = loss is not None
+            self._losses[row] = loss if loss is not None else np.nan
+            self._steps[row] = step
+
+    def trial_id(self, row: int) -> int:
+        return int(self._ids[row])
+
+    def loss(self, row: int) -> Union[float, None]:
+        return float(self._losses[row]) if self._has_loss[row] else None
+
+    def step(self, row: int) -> int:
+        return int(self._steps[row])
+
+    def properties(self, row: int) -> Dict[str, Any]:
+        """A new dictionary with the properties of the trial in the row `row`"""
+        ret = dict()
+        with self._lock:
+            for name, column in self._columns.items():
+                if self._present[name][row]:
+                    ret[name] = self._cast(_KINDS[self._row_kinds[name][row]])(column[row])
+        return ret
+
+    def to_numpy(self) -> Dict[str, np.ndarray]:
+        """
+        The columns of the store as NumPy arrays, with one element per trial.
+
+        The arrays are views on the store, not copies: they reflect the updates of
+        the trials in place, but not the trials added afterwards. Numerical properties
+        are exported as `float64` arrays, with `nan` where missing.
+        """
+        with self._lock:
+            n = self._n_trials
+            ret = dict(trial_id=self._ids[:n], loss=self._losses[:n], step=self._steps[:n])
+            ret.update({name: column[:n] for name, column in self._columns.items()})
+        return ret
+
+    def __getitem__(self, trial_id: int) -> FrozenTrial:
+        return FrozenTrial.view(self, self._rows[trial_id])
+
+    def __contains__(self, trial_id) -> bool:
+        return trial_id in self._rows
+
+    def __iter__(self) -> Iterator[int]:
+        # Over a copy of the ids, as the trials may be appended by other threads meanwhile
+        with self._lock:
+            return iter(list(self._rows))
+
+    def __len__(self) -> int:
+        return self._n_trials
@@ -1,3 +1,47 @@
-from .Client import Client
-from .Study import Study
-from .Trial import Trial
+"""
+Client of the Hopaas (Hyperparameter OPtimization As A Service) server.
+
+The public classes are imported on first access (PEP 562), so that `import hopaas_client`
+does not pay for the HTTP stack and NumPy until they are needed.
+"""
+import importlib
+import sys
+import types
+
+# Public names, by submodule defining them
+_EXPORTS = dict(
+    Client="Client",
+    AsyncClient="AsyncClient",
+    LocalClient="LocalClient",
+    Study="Study",
+    Trial="Trial",
+)
+
+__all__ = list(_EXPORTS)
+
+# Submodules used as namespaces, e.g. `hopaas_client.suggestions.Int`
+_SUBMODULES = ("suggestions", "samplers", "pruners")
+
+
+class _Package(types.ModuleType):
+    """Internal. Binds the classes, rather than the homonymous submodules, as attributes of the package"""
+    def __setattr__(self, name, value):
+        # Importing e.g. `hopaas_client.Client` binds the submodule to the package, shadowing the class
+        if name in _EXPORTS and isinstance(value, types.ModuleType) and hasattr(value, name):
+            value = getattr(value, name)
+        super().__setattr__(name, value)
+
+
+def __getattr__(name: str):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | set(_SUBMODULES))
+
+
+sys.modules[__name__].__class__ = _Package
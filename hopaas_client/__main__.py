@@ -0,0 +1,59 @@
+"""
+Command line utilities of `hopaas_client`, installed as `hopaas-client`.
+
+For example, to send to the server the results recorded in the spool by
+workers that lost the connection to the server:
+```
+python -m hopaas_client replay --timeout 60
+```
+"""
+import argparse
+import sys
+from typing import List, Union
+
+from hopaas_client.Client import Client
+from hopaas_client.Spool import Spool
+
+
+def replay(args: argparse.Namespace) -> int:
+    # Only the results for this server are adopted from the journals
+    client = Client(server=args.server, token=args.token)
+    spool = Spool(args.directory, server=client.server)
+    n_pending = len(spool)
+    client = Client(server=client.server, token=client.token, spool=spool)
+    reporter = client.reporter
+    # The results not acknowledged stay in the journal, there is no point in waiting at exit
+    reporter.exit_timeout = 0
+    reporter.flush(args.timeout)
+
+    n_left = len(spool)
+    print(f"Replayed {n_pending - n_left} of {n_pending} results from {spool.directory}")
+    for method, kwargs, error in reporter.errors:
+        print(f"  {kwargs.get('endpoint', method)} {kwargs.get('payload')}: {error}", file=sys.stderr)
+
+    spool.close()
+    return 0 if n_left == 0 else 1
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="hopaas-client", description="Utilities of the hopaas client")
+    parser.add_argument("--server", default=None, help="address of the server (default: from the configuration)")
+    parser.add_argument("--token", default=None, help="API token (default: from the configuration)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    replay_parser = commands.add_parser("replay", help="sends to the server the results recorded in the spool")
+    replay_parser.add_argument("--directory", default=None,
+                               help="directory of the spool (default: .hopaas_spool next to the configuration)")
+    replay_parser.add_argument("--timeout", type=float, default=None,
+                               help="give up after this number of seconds (default: no limit)")
+    replay_parser.set_defaults(func=replay)
+    return parser
+
+
+def main(argv: Union[List[str], None] = None) -> int:
+    args = make_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
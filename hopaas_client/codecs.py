@@ -0,0 +1,113 @@
+"""
+Codecs of the bodies of the requests to, and of the responses from, the hopaas server.
+
+The codec of a request is declared with its `Content-Type` header, and the codec
+preferred for the response with the `Accept` header. JSON is the default and is
+understood by any server; msgpack is more compact and faster to decode, and it is
+available if the `msgpack` package is installed.
+
+Optionally, bodies larger than a threshold are compressed with gzip (`Content-Encoding: gzip`).
+"""
+import gzip
+import json
+from typing import Any, Dict, List, Union
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class Codec:
+    """Base class of the codecs, identified by `name` and by the media type `content_type`"""
+    name: str = None
+    content_type: str = None
+
+    def encode(self, obj: Any) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}()"
+
+    def __reduce__(self):
+        # Unpickled as the registered instance, so that codecs can be compared by identity
+        return get_codec, (self.name,)
+
+
+class JSONCodec(Codec):
+    name = 'json'
+    content_type = 'application/json'
+
+    def encode(self, obj: Any) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode()
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+
+class MsgpackCodec(Codec):
+    name = 'msgpack'
+    content_type = 'application/msgpack'
+
+    def __init__(self):
+        if msgpack is None:
+            raise ImportError("The msgpack codec requires the msgpack package: pip install msgpack")
+
+    def encode(self, obj: Any) -> bytes:
+        return msgpack.packb(obj, use_bin_type=True)
+
+    def decode(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False)
+
+
+JSON = JSONCodec()
+
+_codecs: Dict[str, Codec] = dict()
+
+
+def register(codec: Codec):
+    """Makes `codec` available by name and by content type"""
+    _codecs[codec.name] = codec
+    _codecs[codec.content_type] = codec
+
+
+def get_codec(codec: Union[str, Codec, None]) -> Codec:
+    """Returns the codec named `codec` (e.g. `"msgpack"`), JSON if None"""
+    if codec is None:
+        return JSON
+    if isinstance(codec, Codec):
+        return codec
+    if codec == 'msgpack' and codec not in _codecs:
+        MsgpackCodec()  # Raises ImportError
+    try:
+        return _codecs[codec]
+    except KeyError:
+        raise ValueError(f"Unknown codec {codec}, available: {available()}") from None
+
+
+def available() -> List[str]:
+    """Names of the registered codecs"""
+    return sorted(set(codec.name for codec in _codecs.values()))
+
+
+def for_content_type(content_type: Union[str, None]) -> Union[Codec, None]:
+    """Returns the codec of a `Content-Type` header, None if unknown"""
+    if content_type is None:
+        return None
+    return _codecs.get(content_type.split(';')[0].strip().lower())
+
+
+def compress(data: bytes) -> bytes:
+    return gzip.compress(data, compresslevel=5)
+
+
+def decompress(data: bytes) -> bytes:
+    return gzip.decompress(data)
+
+
+register(JSON)
+if msgpack is not None:
+    register(MsgpackCodec())
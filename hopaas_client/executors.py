@@ -0,0 +1,163 @@
+"""
+Internal. Execution of the trials of `Study.optimize` over pools of threads or processes.
+"""
+import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Tuple, Dict, List, Union
+
+from hopaas_client.Trial import Trial
+
+Objective = Callable[[Trial], Union[float, None]]
+
+# Study and objective of the current worker process, see `_init_worker`
+_worker_study = None
+_worker_objective: Union[Objective, None] = None
+
+
+def _run_objective(trial: Trial, objective: Objective):
+    """Internal. Runs the objective, assigning its return value, if any, as the final loss"""
+    loss = objective(trial)
+    if loss is not None:
+        trial.loss = loss
+
+
+class Budget:
+    """
+    Internal. Number of trials still to be started, `None` for unlimited, and time limit
+    in seconds, `None` for unlimited, shared by the workers of `Study.optimize`.
+    """
+    def __init__(self, n_trials: Union[int, None], timeout: Union[float, None]):
+        self._n_left = n_trials
+        self._deadline = None if timeout is None else time.monotonic() + timeout
+        self._lock = threading.Lock()
+        self.stopped = False
+
+    def take(self) -> bool:
+        """Accounts for a new trial, returns False if the budget is spent"""
+        with self._lock:
+            if self.stopped or self._n_left == 0:
+                return False
+            if self._deadline is not None and time.monotonic() >= self._deadline:
+                return False
+            if self._n_left is not None:
+                self._n_left -= 1
+            return True
+
+    def stop(self):
+        self.stopped = True
+
+
+def run_threads(study, objective: Objective, budget: Budget, n_jobs: int, catch: Tuple[type, ...]):
+    """Internal. Runs trials with `study.trial()` in `n_jobs` threads, until the budget is spent"""
+    def work():
+        while budget.take():
+            try:
+                with study.trial() as trial:
+                    _run_objective(trial, objective)
+            except catch:
+                pass
+            except BaseException:
+                budget.stop()
+                raise
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        futures = [pool.submit(work) for _ in range(n_jobs)]
+        try:
+            for future in futures:
+                future.result()
+        except BaseException:
+            budget.stop()
+            raise
+
+
+def _init_worker(study, objective: Objective):
+    """Internal. Initializer of the worker processes, receiving a copy of the study and the objective"""
+    global _worker_study, _worker_objective
+    # Forked workers inherit the study as is: copied through pickle, as with the other start methods,
+    # the client opens connections of its own instead of sharing the sockets of the parent process
+    _worker_study, _worker_objective = pickle.loads(pickle.dumps(study)), objective
+
+
+def _run_in_worker(properties: dict) -> dict:
+    """Internal. Runs a trial in a worker process, returning its results to the parent process"""
+    study = _worker_study
+    suid, trial_id = properties['hopaas_trial'].split(':')
+    study._suid = suid
+    trial = Trial(study=study,
+                  properties=study.search_space.decode(properties),
+                  trial_id=int(trial_id))
+    trial._response = properties
+    _run_objective(trial, _worker_objective)
+    return trial._export_state()
+
+
+def run_processes(study, objective: Objective, budget: Budget, n_jobs: int, catch: Tuple[type, ...]):
+    """
+    Internal. Runs trials in a pool of `n_jobs` processes, until the budget is spent.
+
+    The trials are obtained and reported by this process, while the objective runs
+    in the workers, on a copy of the study. If a worker crashes, the pool is replaced
+    and the trials running at the time are run again, each in a process of its own:
+    only those crashing again are marked as failed.
+    """
+    pools: List[ProcessPoolExecutor] = []
+
+    def make_pool(n_workers: int) -> ProcessPoolExecutor:
+        pools.append(ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                         initargs=(study, objective)))
+        return pools[-1]
+
+    pool = make_pool(n_jobs)
+    # Single-worker pools rerunning the trials interrupted by a crash
+    retries = set()
+    # Trial, response of /api/ask and executor of the running trials, by future
+    running: Dict[Future, Tuple[Trial, dict, ProcessPoolExecutor]] = dict()
+    spent = False
+    try:
+        while not spent or len(running):
+            while not spent and sum(e is pool for *_, e in running.values()) < n_jobs:
+                if not budget.take():
+                    spent = True
+                    break
+                trial = study._open_next_trial(study._next_properties)
+                properties = trial._response
+                running[pool.submit(_run_in_worker, properties)] = (trial, properties, pool)
+
+            if len(running) == 0:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                trial, properties, executor = running.pop(future)
+                isolated = executor in retries
+                try:
+                    trial._import_state(future.result())
+                except BrokenProcessPool:
+                    if isolated:
+                        study._close_trial(trial, error="Worker process crashed")
+                    else:
+                        if executor is pool:
+                            pool = make_pool(n_jobs)
+                        retry = make_pool(1)
+                        retries.add(retry)
+                        running[retry.submit(_run_in_worker, properties)] = (trial, properties, retry)
+                    continue
+                except BaseException as e:
+                    trial.loss = None
+                    study._close_trial(trial)
+                    if not isinstance(e, catch):
+                        raise
+                    continue
+                finally:
+                    if isolated:
+                        executor.shutdown(wait=False)
+
+                study._close_trial(trial)
+    finally:
+        for trial, *_ in running.values():
+            trial.loss = None
+            study._close_trial(trial)
+        for executor in pools:
+            executor.shutdown(wait=False, cancel_futures=True)
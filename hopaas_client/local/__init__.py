@@ -0,0 +1,3 @@
+from .space import parse_space, parse_suggestion
+from .samplers import make_sampler
+from .pruners import make_pruner
@@ -0,0 +1,204 @@
+"""
+Internal. Parzen estimators used by the local implementation of the TPE sampler.
+
+Numerical estimators are vectorized over the dimensions of the search space:
+observations are arranged in `(n_observations, n_dimensions)` arrays, each
+column sorted independently, and missing or excluded observations are masked
+out rather than removed, so that the same arrays can be reused while the
+history grows.
+"""
+import math
+
+import numpy as np
+
+_LOG_SQRT_2PI = 0.5 * math.log(2 * math.pi)
+_EPS = 1e-12
+
+# Maximum number of elements of the temporary arrays used to evaluate the densities
+_CHUNK_ELEMENTS = 1 << 20
+
+
+def erf(x: np.ndarray) -> np.ndarray:
+    """Vectorized error function (Abramowitz and Stegun 7.1.26, |error| < 1.5e-7)"""
+    sign = np.sign(x)
+    x = np.abs(x)
+    t = 1. / (1. + 0.3275911 * x)
+    y = 1. - (((((1.061405429 * t - 1.453152027) * t) + 1.421413741) * t - 0.284496736) * t
+              + 0.254829592) * t * np.exp(-x * x)
+    return sign * y
+
+
+def normal_cdf(x: np.ndarray) -> np.ndarray:
+    return 0.5 * (1. + erf(x / math.sqrt(2.)))
+
+
+def _neighbours(sorted_values: np.ndarray, kept: np.ndarray, low: np.ndarray, high: np.ndarray):
+    """
+    Internal. For each element of the column-wise sorted `sorted_values`, the closest kept
+    values on the left and on the right in the same column, or the domain boundaries.
+    """
+    n_rows = len(sorted_values)
+    rows = np.arange(n_rows)[:, None]
+
+    previous = np.maximum.accumulate(np.where(kept, rows, -1), axis=0)
+    previous = np.vstack([np.full((1, kept.shape[1]), -1), previous[:-1]])
+    following = np.minimum.accumulate(np.where(kept, rows, n_rows)[::-1], axis=0)[::-1]
+    following = np.vstack([following[1:], np.full((1, kept.shape[1]), n_rows)])
+
+    left = np.where(previous >= 0,
+                    np.take_along_axis(sorted_values, np.clip(previous, 0, n_rows - 1), axis=0),
+                    low[None, :])
+    right = np.where(following < n_rows,
+                     np.take_along_axis(sorted_values, np.clip(following, 0, n_rows - 1), axis=0),
+                     high[None, :])
+    return left, right
+
+
+class ParzenEstimator:
+    """
+    Internal. For each dimension, a mixture of normal distributions truncated to `[low, high]`,
+    centered on the observations plus a wide prior component centered in the middle of the domain.
+
+    The bandwidth of each component is the largest distance to its neighbours (the
+    prior included), clipped to the domain width and, with `consider_magic_clip`,
+    from below to `(high - low) / min(100, 1 + n_observations)`.
+
+    sorted_values: `np.ndarray`
+        observations, shape `(n_observations, n_dimensions)`, sorted along each column,
+        with missing values (`nan`) at the end.
+
+    kept: `np.ndarray`
+        boolean mask of the same shape, selecting the observations entering the mixture.
+    """
+    # Above this number of observations, the components with the minimal bandwidth are binned
+    N_BINS = 2048
+
+    def __init__(self,
+                 sorted_values: np.ndarray,
+                 kept: np.ndarray,
+                 low: np.ndarray,
+                 high: np.ndarray,
+                 consider_magic_clip: bool = True,
+                 prior_weight: float = 1.
+                 ):
+        self.low, self.high = low, high
+        width = high - low
+        middle = 0.5 * (low + high)
+        # Excluded components stay in place, with null weight, to preserve the ordering
+        mus = np.where(np.isnan(sorted_values), high[None, :], sorted_values)
+
+        if len(mus):
+            left, right = _neighbours(mus, kept, low, high)
+            left = np.where((middle[None, :] > left) & (middle[None, :] <= mus), middle[None, :], left)
+            right = np.where((middle[None, :] < right) & (middle[None, :] >= mus), middle[None, :], right)
+            sigmas = np.maximum(mus - left, right - mus)
+        else:
+            sigmas = np.empty_like(mus)
+
+        n_kept = kept.sum(axis=0)
+        min_sigma = width / np.minimum(100., 1. + n_kept) if consider_magic_clip else np.full_like(width, _EPS)
+        sigmas = np.clip(sigmas, min_sigma[None, :], width[None, :])
+
+        norm = n_kept + prior_weight
+        self.mus, self.sigmas = mus, sigmas
+        self.weights = kept / norm[None, :]
+        self.prior_weight = prior_weight / norm
+        self._prior = (middle, width, self._coefficients(self.prior_weight, middle, width))
+        coefficients = self._coefficients(self.weights, mus, sigmas)
+
+        # With many observations most of the components have the minimal bandwidth:
+        # they are accumulated in a fine histogram and the others are evaluated exactly
+        binned = kept & (sigmas <= min_sigma[None, :]) if len(mus) > self.N_BINS else np.zeros_like(kept)
+        exact = kept & ~binned
+        rows = np.argsort(~exact, axis=0, kind='stable')[:exact.sum(axis=0).max(initial=0)]
+        self._exact = tuple(np.take_along_axis(a, rows, axis=0).T.copy()
+                            for a in (mus, sigmas, np.where(exact, coefficients, 0.)))
+
+        self._binned = None
+        if binned.any():
+            bins = np.clip(((mus - low[None, :]) / width[None, :] * self.N_BINS).astype(int), 0, self.N_BINS - 1)
+            centers = low[None, :] + (np.arange(self.N_BINS)[:, None] + 0.5) / self.N_BINS * width[None, :]
+            histogram = np.stack([
+                np.bincount(bins[:, j], weights=np.where(binned[:, j], coefficients[:, j], 0.),
+                            minlength=self.N_BINS) for j in range(len(low))
+            ], axis=1)
+            self._binned = (centers, np.broadcast_to(min_sigma[None, :], centers.shape), histogram)
+
+    def _coefficients(self, weights, mus, sigmas):
+        """
+        Internal. Normalized weights of the truncated normal components, divided by their
+        bandwidth. Truncation is neglected farther than 8 bandwidths from the boundaries.
+        """
+        shape = np.broadcast(mus, sigmas).shape
+        mus, sigmas = np.broadcast_to(mus, shape), np.broadcast_to(sigmas, shape)
+        low, high = np.broadcast_to(self.low, shape), np.broadcast_to(self.high, shape)
+        truncated = (mus - low < 8. * sigmas) | (high - mus < 8. * sigmas)
+
+        norm = np.ones(shape)
+        t_mus, t_sigmas = mus[truncated], sigmas[truncated]
+        norm[truncated] = np.maximum(
+            normal_cdf((high[truncated] - t_mus) / t_sigmas) - normal_cdf((low[truncated] - t_mus) / t_sigmas), _EPS
+        )
+        return weights / (sigmas * norm) * math.exp(-_LOG_SQRT_2PI)
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        """Samples of shape `(size, n_dimensions)`"""
+        mus = np.vstack([self.mus, self._prior[0][None, :]])
+        sigmas = np.vstack([self.sigmas, self._prior[1][None, :]])
+        cumulative = np.cumsum(np.vstack([self.weights, self.prior_weight[None, :]]), axis=0)
+        cumulative[-1] = 1.
+        uniform = rng.random((size, mus.shape[1]))
+        components = np.empty(uniform.shape, dtype=int)
+        chunk = max(1, _CHUNK_ELEMENTS // cumulative.size)
+        for start in range(0, size, chunk):
+            components[start:start + chunk] = \
+                (cumulative[None, :, :] < uniform[start:start + chunk, None, :]).sum(axis=1)
+
+        mus = np.take_along_axis(mus, components, axis=0)
+        sigmas = np.take_along_axis(sigmas, components, axis=0)
+        samples = rng.normal(mus, sigmas)
+        for _ in range(100):
+            outside = (samples < self.low[None, :]) | (samples > self.high[None, :])
+            if not outside.any():
+                break
+            samples[outside] = rng.normal(mus[outside], sigmas[outside])
+        return np.clip(samples, self.low[None, :], self.high[None, :])
+
+    @staticmethod
+    def _sum(x: np.ndarray, mus: np.ndarray, sigmas: np.ndarray, coefficients: np.ndarray) -> np.ndarray:
+        """
+        Internal. Densities in `x`, of shape `(n_samples, n_dimensions)`, summed over the
+        components described by arrays of shape `(n_dimensions, n_components)`.
+        """
+        result = np.zeros(x.shape)
+        chunk = max(1, _CHUNK_ELEMENTS // max(1, x.size))
+        for start in range(0, mus.shape[1], chunk):
+            z = (x[:, :, None] - mus[None, :, start:start + chunk]) / sigmas[None, :, start:start + chunk]
+            result += (coefficients[None, :, start:start + chunk] * np.exp(-0.5 * z * z)).sum(axis=-1)
+        return result
+
+    def log_pdf(self, x: np.ndarray) -> np.ndarray:
+        """
+        Log-density of the samples `x`, of shape `(n_samples, n_dimensions)`.
+
+        The mixture is summed in linear space: the prior component, as wide as the
+        domain, bounds the density from below and prevents underflows.
+        """
+        result = self._sum(x, *(a[:, None] for a in self._prior))
+        result += self._sum(x, *self._exact)
+        if self._binned is not None:
+            result += self._sum(x, *(a.T for a in self._binned))
+        return np.log(result)
+
+
+class CategoricalEstimator:
+    """Internal. Frequencies of the observed choices, smoothed with a uniform prior"""
+    def __init__(self, counts: np.ndarray, prior_weight: float = 1.):
+        counts = np.asarray(counts, dtype=float) + prior_weight / len(counts)
+        self.probabilities = counts / counts.sum()
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        return rng.choice(len(self.probabilities), size=size, p=self.probabilities).astype(float)
+
+    def log_pdf(self, x: np.ndarray) -> np.ndarray:
+        return np.log(self.probabilities[x.astype(int)])
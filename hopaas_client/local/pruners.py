@@ -0,0 +1,123 @@
+"""
+Internal. In-process implementations of the pruners of `hopaas_client.pruners`.
+"""
+import math
+from typing import Dict, Union
+
+import numpy as np
+
+from hopaas_client import pruners
+from hopaas_client.local.storage import LocalStudy, LocalTrial
+
+
+class NopEngine:
+    """Internal. Never prunes"""
+    def __init__(self):
+        self.config = pruners.NopPruner()
+
+    def prune(self, study: LocalStudy, trial: LocalTrial, step: int, loss: float) -> bool:
+        return False
+
+
+class ThresholdEngine:
+    """Internal. Prunes the trials whose intermediate loss is out of the `[lower, upper]` range"""
+    def __init__(self, **kwargs):
+        self.config = pruners.ThresholdPruner(**kwargs)
+
+    def prune(self, study: LocalStudy, trial: LocalTrial, step: int, loss: float) -> bool:
+        return self.config.is_pruning_step(step) and self.config.decide(loss, step)
+
+
+class MedianEngine:
+    """
+    Internal. Prunes the trials whose best intermediate loss is worse than the median
+    of the losses reported at the same step by the completed trials.
+    """
+    def __init__(self, **kwargs):
+        self.config = pruners.MedianPruner(**kwargs)
+
+    def prune(self, study: LocalStudy, trial: LocalTrial, step: int, loss: float) -> bool:
+        if not self.config.is_pruning_step(step):
+            return False
+
+        completed = study.completed_trials()
+        if len(completed) < self.config.n_startup_trials:
+            return False
+
+        others = [study.sign * t.intermediate[step] for t in completed if step in t.intermediate]
+        if len(others) < self.config.n_min_trials:
+            return False
+
+        best = np.nanmin([study.sign * v for v in trial.intermediate.values()])
+        return bool(best > np.nanmedian(others))
+
+
+class HyperbandEngine:
+    """
+    Internal. Hyperband as a set of asynchronous successive halving brackets.
+
+    Each trial is assigned to a bracket, defining the resource (the step) at which
+    it is first compared to the other trials in the same bracket. At each rung, the
+    trial is promoted only if it ranks in the best `1 / reduction_factor` fraction.
+    With `max_resources='auto'`, the maximum resource is the number of steps of the
+    first completed trial and no trial is pruned before.
+    """
+    def __init__(self, **kwargs):
+        self.config = pruners.HyperbandPruner(**kwargs)
+        self._rungs: Dict[int, Dict[int, float]] = dict()
+
+    def n_brackets(self, study: LocalStudy) -> Union[int, None]:
+        max_resources = self.config.max_resources
+        if max_resources == 'auto':
+            completed = [t for t in study.completed_trials() if len(t.intermediate)]
+            if len(completed) == 0:
+                return None
+            max_resources = max(completed[0].intermediate.keys()) + 1
+
+        ratio = max(float(max_resources) / self.config.min_resources, 1.)
+        return int(math.floor(math.log(ratio, self.config.reduction_factor) + 1e-9)) + 1
+
+    def prune(self, study: LocalStudy, trial: LocalTrial, step: int, loss: float) -> bool:
+        n_brackets = self.n_brackets(study)
+        if n_brackets is None:
+            return False
+
+        if math.isnan(loss):
+            return True
+
+        eta = self.config.reduction_factor
+        bracket = trial.trial_id % n_brackets
+        rungs = self._rungs.setdefault(trial.trial_id, dict())
+        rung = len(rungs)
+        while True:
+            if step < self.config.min_resources * eta ** (bracket + rung):
+                return False
+
+            rungs[rung] = loss
+            competing = sorted(
+                [study.sign * self._rungs[t.trial_id][rung] for t in study.trials
+                 if t.trial_id % n_brackets == bracket and rung in self._rungs.get(t.trial_id, dict())]
+            )
+            if len(competing) <= self.config.bootstrap_count:
+                return True
+
+            promotable_idx = max(len(competing) // eta - 1, 0)
+            if study.sign * loss > competing[promotable_idx]:
+                return True
+
+            rung += 1
+
+
+ENGINES = {
+    'NopPruner': NopEngine,
+    'ThresholdPruner': ThresholdEngine,
+    'MedianPruner': MedianEngine,
+    'HyperbandPruner': HyperbandEngine,
+}
+
+
+def make_pruner(config: dict):
+    """Internal. Builds the engine described by `Pruner.asdict()`"""
+    if config['name'] not in ENGINES:
+        raise NotImplementedError(f"Pruner {config['name']} is not available locally")
+    return ENGINES[config['name']](**config.get('args', dict()))
@@ -0,0 +1,190 @@
+"""
+Internal. In-process implementations of the samplers of `hopaas_client.samplers`.
+
+Samplers operate in the internal representation of the distributions,
+see `hopaas_client.local.space`. They are informed of each completed trial
+with `observe`, so that they can update their state incrementally.
+"""
+import math
+from typing import Dict, Union
+
+import numpy as np
+
+from hopaas_client import samplers
+from hopaas_client.local.space import Distribution
+from hopaas_client.local.storage import LocalStudy, LocalTrial
+from hopaas_client.local.parzen import ParzenEstimator, CategoricalEstimator
+
+
+class RandomEngine:
+    """Internal. Independent uniform sampling of each suggestion"""
+    def __init__(self, seed: Union[int, None] = None):
+        self.config = samplers.RandomSampler(seed=seed)
+        self._rng = np.random.default_rng(seed)
+
+    def observe(self, study: LocalStudy, trial: LocalTrial):
+        pass
+
+    def sample(self, study: LocalStudy, space: Dict[str, Distribution]) -> Dict[str, float]:
+        return {name: float(distribution.sample(self._rng, 1)[0]) for name, distribution in space.items()}
+
+
+class TPEEngine:
+    """
+    Internal. Univariate Tree-structured Parzen Estimator.
+
+    After `n_startup_trials` random trials, the completed trials are split into the
+    best `min(ceil(0.1 n), 25)` ones and the others, a Parzen estimator is fit to each
+    group, and the candidate maximizing the ratio of the two densities among
+    `n_ei_candidates` drawn from the former is suggested, independently for each
+    suggestion.
+
+    The history is stored in preallocated arrays with one row per completed trial
+    and one column per suggestion. A sorted copy of each column, contiguous in memory,
+    is also kept up to date inserting each trial as it completes. Sampling never loops over the trials: the split is
+    obtained with a partial sort of the losses and the estimators of all the
+    numerical suggestions are built and evaluated at once on the sorted columns.
+    """
+    INITIAL_CAPACITY = 64
+
+    def __init__(self,
+                 n_startup_trials: int = 10,
+                 n_ei_candidates: int = 24,
+                 consider_magic_clip: bool = True,
+                 seed: Union[int, None] = None
+                 ):
+        self.config = samplers.TPESampler(n_startup_trials, n_ei_candidates, consider_magic_clip)
+        self._rng = np.random.default_rng(seed)
+        self._random = RandomEngine(None if seed is None else seed + 1)
+
+        self._n_trials = 0
+        self._columns: Dict[str, int] = dict()
+        self._losses = np.empty(self.INITIAL_CAPACITY)
+        self._values = np.empty((self.INITIAL_CAPACITY, 0))
+        self._sorted = np.empty((0, self.INITIAL_CAPACITY))
+        self._order = np.empty((0, self.INITIAL_CAPACITY), dtype=int)
+
+    @property
+    def n_trials(self) -> int:
+        """Number of completed trials in the history"""
+        return self._n_trials
+
+    @staticmethod
+    def n_below(n_trials: int) -> int:
+        return min(int(math.ceil(0.1 * n_trials)), 25)
+
+    def _add_column(self, name: str):
+        """Internal. Extends the history with a suggestion, missing in the previous trials"""
+        capacity = len(self._losses)
+        self._columns[name] = self._values.shape[1]
+        self._values = np.hstack([self._values, np.full((capacity, 1), np.nan)])
+        self._sorted = np.vstack([self._sorted, np.full((1, capacity), np.nan)])
+        self._order = np.vstack([self._order, np.arange(capacity)[None, :]])
+
+    def _grow(self):
+        """Internal. Doubles the capacity of the history"""
+        capacity, n_columns = self._values.shape
+        self._losses = np.concatenate([self._losses, np.empty(capacity)])
+        self._values = np.vstack([self._values, np.full((capacity, n_columns), np.nan)])
+        self._sorted = np.hstack([self._sorted, np.full((n_columns, capacity), np.nan)])
+        self._order = np.hstack([self._order, np.zeros((n_columns, capacity), dtype=int)])
+
+    def observe(self, study: LocalStudy, trial: LocalTrial):
+        """Appends a completed trial to the history, inserting its values in the sorted columns"""
+        for name in trial.internal.keys():
+            if name not in self._columns:
+                self._add_column(name)
+
+        if self._n_trials == len(self._losses):
+            self._grow()
+
+        row = self._n_trials
+        self._losses[row] = trial.loss
+        for name, column in self._columns.items():
+            value = trial.internal.get(name, np.nan)
+            self._values[row, column] = value
+            position = row if np.isnan(value) else \
+                int(np.searchsorted(self._sorted[column, :row], value, side='right'))
+            self._sorted[column, position + 1:row + 1] = self._sorted[column, position:row]
+            self._order[column, position + 1:row + 1] = self._order[column, position:row]
+            self._sorted[column, position] = value
+            self._order[column, position] = row
+
+        self._n_trials += 1
+
+    def sample(self, study: LocalStudy, space: Dict[str, Distribution]) -> Dict[str, float]:
+        n_trials = self._n_trials
+        if n_trials == 0 or n_trials < self.config.n_startup_trials:
+            return self._random.sample(study, space)
+
+        for name in space.keys():
+            if name not in self._columns:
+                self._add_column(name)
+
+        losses = study.sign * self._losses[:n_trials]
+        n_below = self.n_below(n_trials)
+        below = np.argpartition(losses, n_below - 1)[:n_below] if n_below < n_trials else np.arange(n_trials)
+        is_below = np.zeros(n_trials, dtype=bool)
+        is_below[below] = True
+
+        params = dict()
+        numerical = [name for name, distribution in space.items() if not distribution.is_categorical]
+        if len(numerical):
+            params.update(self._sample_numerical(space, numerical, below, is_below))
+
+        for name, distribution in space.items():
+            if distribution.is_categorical:
+                params[name] = self._sample_categorical(distribution, self._columns[name], below)
+
+        return params
+
+    def _sample_numerical(self, space, names, below, is_below) -> Dict[str, float]:
+        """Internal. Samples all the numerical suggestions at once"""
+        n_trials = self._n_trials
+        columns = [self._columns[name] for name in names]
+        low = np.array([space[name].low for name in names], dtype=float)
+        high = np.array([space[name].high for name in names], dtype=float)
+        magic_clip = self.config.consider_magic_clip
+
+        below_values = np.sort(self._values[below][:, columns], axis=0)
+        l_x = ParzenEstimator(below_values, ~np.isnan(below_values), low, high, magic_clip)
+
+        above_values = self._sorted[columns, :n_trials].T
+        above_kept = ~(np.isnan(above_values) | is_below[self._order[columns, :n_trials].T])
+        g_x = ParzenEstimator(above_values, above_kept, low, high, magic_clip)
+
+        candidates = l_x.sample(self._rng, self.config.n_ei_candidates)
+        scores = l_x.log_pdf(candidates) - g_x.log_pdf(candidates)
+        best = candidates[np.argmax(scores, axis=0), np.arange(len(names))]
+        return {name: float(x) for name, x in zip(names, best)}
+
+    def _sample_categorical(self, distribution: Distribution, column: int, below: np.ndarray) -> float:
+        """Internal. Samples a categorical suggestion"""
+        n_choices = int(distribution.high)
+        values = self._values[:self._n_trials, column]
+        all_counts = np.bincount(values[~np.isnan(values)].astype(int), minlength=n_choices)[:n_choices]
+        below_values = values[below]
+        below_counts = np.bincount(below_values[~np.isnan(below_values)].astype(int),
+                                   minlength=n_choices)[:n_choices]
+
+        l_x = CategoricalEstimator(below_counts)
+        g_x = CategoricalEstimator(all_counts - below_counts)
+        candidates = l_x.sample(self._rng, self.config.n_ei_candidates)
+        scores = l_x.log_pdf(candidates) - g_x.log_pdf(candidates)
+        return float(candidates[np.argmax(scores)])
+
+
+ENGINES = {
+    'RandomSampler': RandomEngine,
+    'TPESampler': TPEEngine,
+}
+
+
+def make_sampler(config: dict, seed: Union[int, None] = None):
+    """Internal. Builds the engine described by `Sampler.asdict()`"""
+    args = dict(config.get('args', dict()))
+    if config['name'] not in ENGINES:
+        raise NotImplementedError(f"Sampler {config['name']} is not available locally")
+    if args.get('seed') is None:
+        args['seed'] = seed
+    return ENGINES[config['name']](**args)
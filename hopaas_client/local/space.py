@@ -0,0 +1,129 @@
+"""
+Internal. Decoding of the stringified `hopaas_client.suggestions` into distributions.
+
+Each distribution maps the values it may take onto a continuous internal
+representation, where samplers operate: the logarithm of the value for
+log-scaled domains and the index of the choice for categorical ones.
+"""
+import math
+import re
+from typing import Any, Dict, List, Union
+
+import numpy as np
+
+_SUGGESTION_RE = re.compile(r"^optuna#(\w+)\((.*)\)$")
+
+
+class Distribution:
+    """Internal. Domain of a suggested value"""
+    is_categorical = False
+
+    # Bounds of the internal representation
+    low: float
+    high: float
+
+    def to_internal(self, value: Any) -> float:
+        raise NotImplementedError
+
+    def from_internal(self, x: float) -> Any:
+        raise NotImplementedError
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        """Uniform samples in the internal representation"""
+        return rng.uniform(self.low, self.high, size)
+
+
+class FloatDistribution(Distribution):
+    def __init__(self, low: float, high: float, log: bool = False):
+        if not low <= high:
+            raise ValueError(f"Invalid range [{low}, {high}]")
+        if log and low <= 0:
+            raise ValueError(f"Invalid range [{low}, {high}] for a log-scaled domain")
+        self.log = log
+        self.low, self.high = (math.log(low), math.log(high)) if log else (float(low), float(high))
+
+    def to_internal(self, value: float) -> float:
+        return math.log(value) if self.log else float(value)
+
+    def from_internal(self, x: float) -> float:
+        return min(max(math.exp(x) if self.log else float(x), self.external_low), self.external_high)
+
+    @property
+    def external_low(self) -> float:
+        return math.exp(self.low) if self.log else self.low
+
+    @property
+    def external_high(self) -> float:
+        return math.exp(self.high) if self.log else self.high
+
+
+class IntDistribution(Distribution):
+    def __init__(self, low: int, high: int, step: int = 1, log: bool = False):
+        if not low <= high or step <= 0:
+            raise ValueError(f"Invalid range [{low}, {high}] with step {step}")
+        if log and (low <= 0 or step != 1):
+            raise ValueError(f"Invalid range [{low}, {high}] with step {step} for a log-scaled domain")
+        self.int_low, self.int_high, self.step, self.log = low, high - (high - low) % step, step, log
+        if log:
+            self.low, self.high = math.log(self.int_low - 0.5), math.log(self.int_high + 0.5)
+        else:
+            self.low, self.high = self.int_low - 0.5 * step, self.int_high + 0.5 * step
+
+    def to_internal(self, value: int) -> float:
+        return math.log(value) if self.log else float(value)
+
+    def from_internal(self, x: float) -> int:
+        value = math.exp(x) if self.log else x
+        value = self.int_low + self.step * int(round((value - self.int_low) / self.step))
+        return min(max(value, self.int_low), self.int_high)
+
+
+class CategoricalDistribution(Distribution):
+    is_categorical = True
+
+    def __init__(self, choices: List[Any]):
+        if len(choices) == 0:
+            raise ValueError("Categorical distribution with no choices")
+        self.choices = list(choices)
+        self.low, self.high = 0, len(self.choices)
+
+    def to_internal(self, value: Any) -> float:
+        return float(self.choices.index(value))
+
+    def from_internal(self, x: float) -> Any:
+        return self.choices[int(x)]
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        return rng.integers(0, len(self.choices), size).astype(float)
+
+
+def parse_suggestion(value: Any) -> Union[Distribution, None]:
+    """Decodes a stringified suggestion (e.g. `optuna#int(0,10,2,false)`), None for any other value"""
+    if not isinstance(value, str):
+        return None
+
+    match = _SUGGESTION_RE.match(value)
+    if match is None:
+        return None
+
+    kind, args = match.group(1), match.group(2).split(',')
+    if kind == 'int':
+        return IntDistribution(int(args[0]), int(args[1]), int(args[2]), args[3].lower() == 'true')
+    elif kind in ['uniform', 'float', 'discrete_uniform']:
+        return FloatDistribution(float(args[0]), float(args[1]))
+    elif kind == 'loguniform':
+        return FloatDistribution(float(args[0]), float(args[1]), log=True)
+    elif kind == 'categorical':
+        return CategoricalDistribution(args)
+
+    raise ValueError(f"Unexpected suggestion {value}")
+
+
+def parse_space(properties: Dict[str, Any]) -> Dict[str, Distribution]:
+    """Distributions of the properties of a request to /api/ask that are suggestions"""
+    space = dict()
+    for key, value in properties.items():
+        distribution = parse_suggestion(value)
+        if distribution is not None:
+            space[key] = distribution
+    return space
@@ -0,0 +1,43 @@
+"""
+Internal. In-memory records of the studies and trials handled by `LocalClient`.
+"""
+from typing import Any, Dict, List, Union
+
+RUNNING = 'running'
+COMPLETE = 'complete'
+PRUNED = 'pruned'
+FAILED = 'failed'
+
+
+class LocalTrial:
+    """Internal. State of a trial run against `LocalClient`"""
+    __slots__ = ('trial_id', 'params', 'internal', 'state', 'loss', 'intermediate')
+
+    def __init__(self, trial_id: int, params: Dict[str, Any], internal: Dict[str, float]):
+        self.trial_id = trial_id
+        self.params = params
+        self.internal = internal
+        self.state = RUNNING
+        self.loss: Union[float, None] = None
+        self.intermediate: Dict[int, float] = dict()
+
+
+class LocalStudy:
+    """Internal. State of a study run against `LocalClient`"""
+    def __init__(self, study_id: str, title: str, direction: str = 'minimize'):
+        self.study_id = study_id
+        self.title = title
+        self.direction = direction
+        self.trials: List[LocalTrial] = []
+        self.sampler = None
+        self.sampler_config: Union[str, None] = None
+        self.pruner = None
+        self.pruner_config: Union[str, None] = None
+
+    @property
+    def sign(self) -> float:
+        """Factor turning the losses into quantities to be minimized"""
+        return -1. if self.direction == 'maximize' else 1.
+
+    def completed_trials(self) -> List[LocalTrial]:
+        return [t for t in self.trials if t.state == COMPLETE]
@@ -0,0 +1,282 @@
+"""
+Instrumentation of the requests of `Client` and of the phases of the trials.
+
+Metrics are disabled by default: the client and the studies check for a `Metrics`
+object before recording anything. Pass one to the client to enable them:
+```
+metrics = Metrics(exporters=[PrometheusExporter("/var/lib/node_exporter/hopaas.prom")])
+study = Study(..., client=Client(metrics=metrics))
+...
+print(format_summary(metrics.summary()))
+metrics.export()
+```
+
+Recorded metrics:
+ - `hopaas_requests_total{endpoint, status}`: requests answered by the server;
+ - `hopaas_request_seconds{endpoint}`: latency of the requests, retries included;
+ - `hopaas_retries_total{endpoint}`: requests retried after a transient failure;
+ - `hopaas_errors_total{endpoint, kind}`: requests failed, by status code, `"connection"`
+   or `"circuit_open"`;
+ - `hopaas_trial_phase_seconds{phase}`: time spent waiting for the suggestion (`"ask"`),
+   running the objective (`"objective"`) and reporting the result (`"report"`);
+ - `hopaas_trials_total{state}`: trials started (`"running"`), completed, pruned and failed;
+ - `hopaas_prune_queries_avoided_total`: reads of `should_prune` answered locally;
+ - `hopaas_trials_memoized_total`: trials reported with a memoized loss, see `Study(memoize=True)`.
+
+Spans of the requests and of the phases of the trials are forwarded to the exporters
+supporting them, e.g. `OpenTelemetryExporter`.
+"""
+import bisect
+import collections
+import math
+import os
+import threading
+from typing import Union, Dict, List, Tuple, Sequence, Deque
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1., 2.5, 5., 10., 30., 60., 120., 300., 900., 3600., 14400.)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Distribution of the observed values in buckets with the upper bounds `buckets` (plus +Inf)"""
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimate of the quantile `q`, interpolating linearly within the bucket"""
+        if self.count == 0:
+            return math.nan
+        rank = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            if n > 0 and cumulative + n >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i > 0 else 0.
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / n
+            cumulative += n
+        return self.buckets[-1]
+
+    def summary(self) -> dict:
+        return dict(count=self.count,
+                    sum=self.sum,
+                    mean=self.sum / self.count if self.count else math.nan,
+                    p50=self.quantile(0.5),
+                    p90=self.quantile(0.9),
+                    p99=self.quantile(0.99))
+
+
+class Exporter:
+    """Base class of the exporters of the metrics"""
+    def span(self, name: str, start: float, duration: float, attributes: Dict[str, str]):
+        """Records a span started at `start` (seconds since the epoch), lasting `duration` seconds"""
+        pass
+
+    def export(self, metrics: "Metrics"):
+        """Exports the current value of the metrics"""
+        pass
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters and histograms, identified by a name and a set of labels.
+
+    exporters: `list`, default: `None`
+        the `Exporter`s receiving the spans as they are recorded, and the metrics on `export()`.
+
+    buckets: `tuple`, default: `DEFAULT_BUCKETS`
+        upper bounds, in seconds, of the buckets of the histograms.
+    """
+    def __init__(self,
+                 exporters: Union[Sequence[Exporter], None] = None,
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.exporters = list(exporters or [])
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = collections.defaultdict(dict)
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = collections.defaultdict(dict)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1., **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counters = self._counters[name]
+            counters[key] = counters.get(key, 0.) + value
+
+    def observe(self, name: str, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            histograms = self._histograms[name]
+            histogram = histograms.get(key)
+            if histogram is None:
+                histogram = histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def span(self, name: str, start: float, duration: float, **attributes: str):
+        """Forwards a span to the exporters"""
+        for exporter in self.exporters:
+            exporter.span(name, start, duration, attributes)
+
+    def counter(self, name: str, **labels: str) -> float:
+        """Value of a counter, `0` if never incremented"""
+        with self._lock:
+            return self._counters.get(name, dict()).get(tuple(sorted(labels.items())), 0.)
+
+    def histogram(self, name: str, **labels: str) -> Union[Histogram, None]:
+        """A histogram, None if nothing was observed"""
+        with self._lock:
+            return self._histograms.get(name, dict()).get(tuple(sorted(labels.items())))
+
+    def collect(self) -> Tuple[Dict[str, Dict[Labels, float]], Dict[str, Dict[Labels, Histogram]]]:
+        """Copies of the counters and of the histograms"""
+        with self._lock:
+            counters = {name: dict(values) for name, values in self._counters.items()}
+            histograms = dict()
+            for name, values in self._histograms.items():
+                histograms[name] = dict()
+                for labels, histogram in values.items():
+                    copy = histograms[name][labels] = Histogram(histogram.buckets)
+                    copy.counts, copy.count, copy.sum = list(histogram.counts), histogram.count, histogram.sum
+        return counters, histograms
+
+    def summary(self) -> Dict[str, Dict[str, Union[float, dict]]]:
+        """
+        The metrics as a dictionary from their name to a dictionary from their labels,
+        formatted as `key=value,...`, to the value of the counters or the summary of the
+        histograms (count, sum, mean and quantiles).
+        """
+        counters, histograms = self.collect()
+        ret = {name: {_format_labels(labels): value for labels, value in values.items()}
+               for name, values in counters.items()}
+        ret.update({name: {_format_labels(labels): histogram.summary() for labels, histogram in values.items()}
+                    for name, values in histograms.items()})
+        return ret
+
+    def export(self):
+        """Exports the metrics through all the exporters"""
+        for exporter in self.exporters:
+            exporter.export(self)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+def _format_labels(labels: Labels) -> str:
+    return ",".join(f"{k}={v}" for k, v in labels)
+
+
+def format_summary(summary: Dict[str, Dict[str, Union[float, dict]]]) -> str:
+    """Human-readable table of `Metrics.summary()`"""
+    lines = []
+    for name in sorted(summary):
+        for labels, value in sorted(summary[name].items()):
+            key = f"{name}{{{labels}}}" if labels else name
+            if isinstance(value, dict):
+                lines.append(f"{key:60s} n={value['count']:<6d} mean={value['mean']:.4g}s "
+                             f"p50={value['p50']:.4g}s p90={value['p90']:.4g}s p99={value['p99']:.4g}s")
+            else:
+                lines.append(f"{key:60s} {value:g}")
+    return "\n".join(lines)
+
+
+class InMemoryExporter(Exporter):
+    """
+    Keeps the last `max_spans` spans, as `(name, start, duration, attributes)`,
+    and the summary of the metrics at the last export.
+    """
+    def __init__(self, max_spans: int = 10000):
+        self.spans: Deque[Tuple[str, float, float, Dict[str, str]]] = collections.deque(maxlen=max_spans)
+        self.last_summary: Union[dict, None] = None
+
+    def span(self, name: str, start: float, duration: float, attributes: Dict[str, str]):
+        self.spans.append((name, start, duration, attributes))
+
+    def export(self, metrics: Metrics):
+        self.last_summary = metrics.summary()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def prometheus_text(metrics: Metrics) -> str:
+    """The metrics in the Prometheus text exposition format"""
+    counters, histograms = metrics.collect()
+    lines: List[str] = []
+
+    def format_labels(labels: Labels, **extra: str) -> str:
+        pairs = list(labels) + list(extra.items())
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}" if pairs else ""
+
+    for name in sorted(counters):
+        lines.append(f"# TYPE {name} counter")
+        for labels, value in sorted(counters[name].items()):
+            lines.append(f"{name}{format_labels(labels)} {value:g}")
+
+    for name in sorted(histograms):
+        lines.append(f"# TYPE {name} histogram")
+        for labels, histogram in sorted(histograms[name].items()):
+            cumulative = 0
+            for bound, n in zip(histogram.buckets + (math.inf,), histogram.counts):
+                cumulative += n
+                le = "+Inf" if math.isinf(bound) else f"{bound:g}"
+                lines.append(f"{name}_bucket{format_labels(labels, le=le)} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum:g}")
+            lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusExporter(Exporter):
+    """
+    Writes the metrics to the text file `path` on export, in the Prometheus text format,
+    e.g. for the textfile collector of the node exporter. The file is replaced atomically.
+    """
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, metrics: Metrics):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as file:
+            file.write(prometheus_text(metrics))
+        os.replace(tmp, self.path)
+
+
+class OpenTelemetryExporter(Exporter):
+    """
+    Records the spans with an OpenTelemetry tracer, by default the one named
+    `hopaas_client` of the global tracer provider. Requires the `opentelemetry-api` package.
+    """
+    def __init__(self, tracer=None):
+        if tracer is None:
+            try:
+                from opentelemetry import trace
+            except ImportError:
+                raise ImportError("OpenTelemetryExporter requires the opentelemetry-api package: "
+                                  "pip install opentelemetry-api") from None
+            tracer = trace.get_tracer("hopaas_client")
+        self.tracer = tracer
+
+    def span(self, name: str, start: float, duration: float, attributes: Dict[str, str]):
+        span = self.tracer.start_span(name, start_time=int(start * 1e9), attributes=attributes)
+        span.end(end_time=int((start + duration) * 1e9))
@@ -1,4 +1,5 @@
 import dataclasses
+import math
 from dataclasses import dataclass
 from typing import Union
 
@@ -18,10 +19,29 @@ class Pruner:
             args=dataclasses.asdict(self)
         )
 
+    def is_pruning_step(self, step: int) -> bool:
+        """
+        Whether the pruner may act on the intermediate value reported at `step`.
+        On other steps the client does not need to query the server.
+        """
+        return True
+
+    def decide(self, loss: float, step: int) -> Union[bool, None]:
+        """
+        Pruning decision taken on the client, if possible from the configuration
+        of the pruner alone. `None` if the server has to be queried.
+        """
+        return None
+
+
+def _is_interval_step(step: int, n_warmup_steps: int, interval_steps: int) -> bool:
+    return step >= n_warmup_steps and (step - n_warmup_steps) % interval_steps == 0
+
 
 @dataclass(frozen=True)
 class NopPruner(Pruner):
-    pass
+    def is_pruning_step(self, step: int) -> bool:
+        return False
 
 
 @dataclass(frozen=True)
@@ -29,6 +49,7 @@ class HyperbandPruner(Pruner):
     min_resources: int = 1
     max_resources: Union[str, int] = 'auto'
     bootstrap_count: int = 0
+    reduction_factor: int = 3
 
 
 @dataclass(frozen=True)
@@ -38,6 +59,9 @@ class MedianPruner(Pruner):
     interval_steps: int = 1
     n_min_trials: int = 1
 
+    def is_pruning_step(self, step: int) -> bool:
+        return _is_interval_step(step, self.n_warmup_steps, self.interval_steps)
+
 
 @dataclass(frozen=True)
 class ThresholdPruner(Pruner):
@@ -45,3 +69,15 @@ class ThresholdPruner(Pruner):
     upper: Union[float, None] = None
     n_warmup_steps: int = 0
     interval_steps: int = 1
+
+    def is_pruning_step(self, step: int) -> bool:
+        return _is_interval_step(step, self.n_warmup_steps, self.interval_steps)
+
+    def decide(self, loss: float, step: int) -> bool:
+        if math.isnan(loss):
+            return True
+        if self.lower is not None and loss < self.lower:
+            return True
+        if self.upper is not None and loss > self.upper:
+            return True
+        return False
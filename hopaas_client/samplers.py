@@ -1,8 +1,10 @@
 import dataclasses
 from dataclasses import dataclass
+from typing import Union
 
 testables = [
-    'TPESampler'
+    'TPESampler',
+    'RandomSampler'
 ]
 
 
@@ -20,3 +22,8 @@ class TPESampler(Sampler):
     n_startup_trials: int = 10
     n_ei_candidates: int = 24
     consider_magic_clip: bool = True
+
+
+@dataclass(frozen=True)
+class RandomSampler(Sampler):
+    seed: Union[int, None] = None
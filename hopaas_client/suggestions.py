@@ -66,4 +66,4 @@ class Categorical(Suggestion):
     choices: List[str]
 
     def __str__(self):
-        return f"optuna#categorical({','.join(self.choices)})"
+        return f"optuna#categorical({','.join(map(str, self.choices))})"
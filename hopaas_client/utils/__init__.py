@@ -1 +1,2 @@
-from .valid_properties import valid_properties
\ No newline at end of file
+from .valid_properties import valid_properties
+from .definition_hash import definition_hash
@@ -0,0 +1,11 @@
+import hashlib
+import json
+
+
+def definition_hash(definition: dict) -> str:
+    """
+    Content hash of the definition of a study (the body of /api/ask without the
+    suggestions sampled), independent of the order of the keys.
+    """
+    canonical = json.dumps(definition, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
@@ -0,0 +1,498 @@
+"""
+Minimal, in-process imitation of the Hopaas server.
+
+It implements the subset of the REST APIs used by `hopaas_client.Client`
+with a trivial random sampler and it is meant for testing and benchmarking
+the client without a live server. It is not a reference implementation of
+the Hopaas backend.
+
+For example:
+```
+with MockHopaasServer() as server:
+    client = Client(server=server.address, token="test")
+    print(client.backend_version)
+```
+"""
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple, Union
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+from hopaas_client import codecs
+from hopaas_client.codecs import available as available_codecs
+from hopaas_client.local.space import parse_suggestion
+from hopaas_client.utils.definition_hash import definition_hash
+
+MOCK_VERSION = "mock-0.0"
+GZIP_THRESHOLD = 4096
+
+
+def sample_suggestion(value, rng: np.random.Generator):
+    """Replaces a stringified `hopaas_client.suggestions` with a random value"""
+    distribution = parse_suggestion(value)
+    if distribution is None:
+        return value
+
+    return distribution.from_internal(distribution.sample(rng, 1)[0])
+
+
+class _MockStudy:
+    def __init__(self, study_id: str):
+        self.study_id = study_id
+        self.direction = 'minimize'
+        self.n_trials = 0
+        self.losses: Dict[int, float] = dict()
+        self.failed: Dict[int, str] = dict()
+        self.intermediate: Dict[int, Dict[int, float]] = dict()
+        self.properties: Dict[int, dict] = dict()
+        # Sequence number of the latest update of each trial, for the incremental history
+        self.n_updates = 0
+        self.updated: Dict[int, int] = dict()
+        # Expiration time (time.monotonic) and owner of the leases of the running trials
+        self.leases: Dict[int, float] = dict()
+        self.workers: Dict[int, str] = dict()
+
+    def touch(self, trial_id: int):
+        self.n_updates += 1
+        self.updated[trial_id] = self.n_updates
+
+    def state(self, trial_id: int) -> str:
+        if trial_id in self.losses:
+            return 'complete'
+        if trial_id in self.failed:
+            return 'failed'
+        return 'running'
+
+
+class _MockHTTPError (Exception):
+    """Raised by the handlers of the APIs to answer with an error status"""
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class _MockHandler (BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "_MockHTTPServer"
+
+    def setup(self):
+        super().setup()
+        self.server.mock.count_connection()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body: Union[str, bytes], content_type: str = "application/json",
+               content_encoding: Union[str, None] = None):
+        encoded = body.encode() if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if content_encoding is not None:
+            self.send_header("Content-Encoding", content_encoding)
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def _send(self, status: int, obj):
+        """Replies with `obj` encoded with the preferred codec of the client among those accepted"""
+        mock = self.server.mock
+        codec = codecs.JSON
+        for media_range in self.headers.get('Accept', '').split(','):
+            candidate = codecs.for_content_type(media_range)
+            if candidate is not None and candidate.name in mock.codecs:
+                codec = candidate
+                break
+
+        body = codec.encode(obj)
+        if mock.gzip and 'gzip' in self.headers.get('Accept-Encoding', '') and len(body) > GZIP_THRESHOLD:
+            return self._reply(status, codecs.compress(body), codec.content_type, 'gzip')
+        return self._reply(status, body, codec.content_type)
+
+    def _payload(self) -> Union[dict, None]:
+        """Decodes the body of the request, None if the encoding is not supported"""
+        mock = self.server.mock
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        codec = codecs.for_content_type(self.headers.get('Content-Type', codecs.JSON.content_type))
+        encoding = self.headers.get('Content-Encoding')
+        mock.count_encoding(codec.name if codec is not None else None, encoding)
+        if codec is None or codec.name not in mock.codecs or encoding not in [None, 'gzip'] or \
+                (encoding == 'gzip' and not mock.gzip):
+            return None
+        if encoding == 'gzip':
+            body = codecs.decompress(body)
+        return codec.decode(body) if len(body) else dict()
+
+    def _route(self):
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split('/') if p != '']
+        if len(parts) < 2 or parts[0] != 'api':
+            return None, None, parse_qs(url.query)
+        token = parts[2] if len(parts) > 2 else None
+        return parts[1], token, parse_qs(url.query)
+
+    def do_GET(self):
+        endpoint, token, query = self._route()
+        mock = self.server.mock
+        mock.count(endpoint)
+        mock.wait(endpoint)
+        error = mock.injected_error(endpoint)
+        if error is not None:
+            return self._send(error[0], "Injected error")
+        if endpoint == 'version':
+            return self._reply(200, MOCK_VERSION)
+        if token != mock.token:
+            return self._send(403, "Invalid token")
+        if endpoint == 'get_best_trial':
+            study_id, _ = query['hopaas_trial'][0].split(':')
+            return self._send(200, f"{study_id}:{mock.best_trial(study_id)}")
+        if endpoint == 'trials' and endpoint not in mock.disabled_endpoints:
+            since = query.get('since', ['0'])[0]
+            return self._send(200, mock.trials(query['hopaas_study'][0], int(since)))
+
+        return self._send(404, "Not found")
+
+    def do_POST(self):
+        endpoint, token, _ = self._route()
+        payload = self._payload()
+        mock = self.server.mock
+        mock.count(endpoint)
+        mock.wait(endpoint)
+        if token != mock.token:
+            return self._send(403, "Invalid token")
+        if payload is None:
+            return self._send(415, "Unsupported Media Type")
+
+        handler = getattr(mock, f"api_{endpoint}", None)
+        if handler is None or endpoint in mock.disabled_endpoints:
+            return self._send(404, "Not found")
+
+        error = mock.injected_error(endpoint)
+        if error is not None and not error[1]:
+            return self._send(error[0], "Injected error")
+
+        # A retry of a processed request is answered with the response of the first attempt
+        key = self.headers.get('Idempotency-Key')
+        response = mock.replayed(key)
+        if response is None:
+            try:
+                response = handler(payload)
+            except _MockHTTPError as e:
+                return self._send(e.status, str(e))
+            mock.remember(key, response)
+
+        if error is not None:
+            return self._send(error[0], "Injected error")
+        return self._send(200, response)
+
+
+class _MockHTTPServer (ThreadingHTTPServer):
+    daemon_threads = True
+    mock: "MockHopaasServer"
+
+
+class MockHopaasServer:
+    """
+    Threaded HTTP/1.1 server, listening on localhost, imitating the Hopaas APIs.
+
+    host: `str`, default: `"127.0.0.1"`
+        interface the server binds to.
+
+    port: `int`, default: `0`
+        port the server binds to, `0` picks a free port.
+
+    token: `str`, default: `"test"`
+        the only API token accepted by the server.
+
+    seed: `int`, default: `None`
+        seed of the random sampler.
+
+    disabled_endpoints: `list`, default: `None`
+        endpoints (e.g. `["ask_batch"]`) answered with 404, to imitate older servers.
+
+    codecs: `list`, default: `None`
+        names of the codecs understood by the server (see `hopaas_client.codecs`),
+        by default all the available ones; `["json"]` imitates older servers.
+
+    gzip: `bool`, default: `True`
+        if False, compressed requests are rejected with 415, to imitate older servers.
+
+    latency: `float` or `dict`, default: `0`
+        time, in seconds, spent on each request before answering, either for all the
+        endpoints or by endpoint (e.g. `{"ask": 0.05}`).
+
+    error_rate: `float` or `dict`, default: `0`
+        probability that a request fails with `error_status`, either for all the endpoints
+        or by endpoint. Failed POST requests are not processed.
+
+    error_status: `int`, default: `503`
+        HTTP status of the errors injected randomly.
+
+    The responses to POST requests are remembered by their `Idempotency-Key` header,
+    so that retried requests are not processed twice. Transient failures of the
+    server can be imitated with `inject_errors`.
+    """
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 0,
+                 token: str = "test",
+                 seed: Union[int, None] = None,
+                 disabled_endpoints: Union[List[str], None] = None,
+                 codecs: Union[List[str], None] = None,
+                 gzip: bool = True,
+                 latency: Union[float, Dict[str, float]] = 0.,
+                 error_rate: Union[float, Dict[str, float]] = 0.,
+                 error_status: int = 503):
+        self.token = token
+        self.disabled_endpoints = set(disabled_endpoints or [])
+        self.codecs = set(codecs if codecs is not None else available_codecs())
+        self.gzip = gzip
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._error_rng = random.Random(seed)
+        self.encodings: Dict[str, int] = dict()
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._studies: Dict[str, _MockStudy] = dict()
+        self.requests: Dict[str, int] = dict()
+        # Number of TCP connections accepted, each serving any number of keep-alive requests
+        self.n_connections = 0
+        self._errors: Dict[str, List[Tuple[int, bool]]] = dict()
+        self._responses: Dict[str, Any] = dict()
+        self._definitions: Dict[str, dict] = dict()
+        self._httpd = _MockHTTPServer((host, port), _MockHandler)
+        self._httpd.mock = self
+        self._thread: Union[threading.Thread, None] = None
+
+    @property
+    def address(self) -> str:
+        """Address of the server in the form expected by `Client(server=...)`"""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockHopaasServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def count(self, endpoint: str):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def count_connection(self):
+        with self._lock:
+            self.n_connections += 1
+
+    def inject_errors(self, endpoint: str, status_codes: List[int], after_processing: bool = False):
+        """
+        Answers the next requests to `endpoint` with the given `status_codes`, one per request.
+        With `after_processing`, the requests are processed before failing, as if the response was lost.
+        """
+        with self._lock:
+            self._errors.setdefault(endpoint, []).extend((code, after_processing) for code in status_codes)
+
+    def injected_error(self, endpoint: str) -> Union[Tuple[int, bool], None]:
+        error_rate = self.error_rate.get(endpoint, 0.) if isinstance(self.error_rate, dict) else self.error_rate
+        with self._lock:
+            errors = self._errors.get(endpoint, [])
+            if len(errors):
+                return errors.pop(0)
+            if error_rate > 0 and self._error_rng.random() < error_rate:
+                return self.error_status, False
+        return None
+
+    def wait(self, endpoint: str):
+        """Imitates the latency of the server"""
+        latency = self.latency.get(endpoint, 0.) if isinstance(self.latency, dict) else self.latency
+        if latency > 0:
+            time.sleep(latency)
+
+    def count_encoding(self, codec: Union[str, None], encoding: Union[str, None]):
+        key = f"{codec}+{encoding}" if encoding is not None else str(codec)
+        with self._lock:
+            self.encodings[key] = self.encodings.get(key, 0) + 1
+
+    def replayed(self, key: Union[str, None]) -> Any:
+        with self._lock:
+            return self._responses.get(key) if key is not None else None
+
+    def remember(self, key: Union[str, None], response: Any):
+        if key is not None:
+            with self._lock:
+                self._responses[key] = response
+
+    def study(self, study_id: str) -> _MockStudy:
+        return self._studies[study_id]
+
+    def _trial(self, hopaas_trial: str):
+        study_id, trial_id = hopaas_trial.split(':')
+        return self._studies[study_id], int(trial_id)
+
+    def best_trial(self, study_id: str) -> int:
+        with self._lock:
+            study = self._studies[study_id]
+            if len(study.losses) == 0:
+                return 0
+            sign = 1 if study.direction == 'minimize' else -1
+            return min(study.losses, key=lambda t: sign * study.losses[t])
+
+    def trials(self, study_id: str, since: int = 0) -> dict:
+        """The trials of a study updated after the update number `since`"""
+        with self._lock:
+            study = self._studies[study_id]
+            return dict(
+                cursor=str(study.n_updates),
+                trials=[dict(trial_id=t, state=study.state(t), loss=study.losses.get(t),
+                             properties=study.properties.get(t))
+                        for t, n in sorted(study.updated.items()) if n > since]
+            )
+
+    def expire_leases(self):
+        """Marks as failed the running trials whose lease expired"""
+        now = time.monotonic()
+        with self._lock:
+            for study in self._studies.values():
+                for trial_id, expiration in list(study.leases.items()):
+                    if study.state(trial_id) != 'running':
+                        del study.leases[trial_id]
+                    elif expiration < now:
+                        del study.leases[trial_id]
+                        study.failed[trial_id] = "Lease expired"
+                        study.touch(trial_id)
+
+    def api_heartbeat(self, payload: dict) -> List[str]:
+        self.expire_leases()
+        lost = []
+        with self._lock:
+            for hopaas_trial, duration in payload['leases'].items():
+                study, trial_id = self._trial(hopaas_trial)
+                if study.state(trial_id) != 'running' or study.workers.get(trial_id) != payload['worker']:
+                    lost.append(hopaas_trial)
+                else:
+                    study.leases[trial_id] = time.monotonic() + duration
+        return lost
+
+    def forget_definitions(self):
+        """Forgets the registered definitions of the studies, as after a restart of the server"""
+        with self._lock:
+            self._definitions.clear()
+
+    def api_register_study(self, payload: dict) -> dict:
+        definition = payload['definition']
+        if definition_hash(definition) != payload['hash']:
+            raise _MockHTTPError(400, "Hash not matching the definition")
+        with self._lock:
+            self._definitions[payload['hash']] = definition
+        title = definition.get('hopaas_config', dict()).get('title', 'untitled')
+        return dict(study_id="mock-" + str(title).replace(':', '_'))
+
+    def api_ask(self, properties: dict) -> dict:
+        self.expire_leases()
+        if 'hopaas_definition' in properties:
+            with self._lock:
+                definition = self._definitions.get(properties['hopaas_definition'])
+            if definition is None:
+                raise _MockHTTPError(409, "Unknown study definition, register the study again")
+            config = dict(definition['hopaas_config'], **properties.get('hopaas_config', dict()))
+            properties = dict(definition, hopaas_config=config)
+        config = properties.get('hopaas_config', dict())
+        study_id = "mock-" + str(config.get('title', 'untitled')).replace(':', '_')
+        with self._lock:
+            if study_id not in self._studies:
+                self._studies[study_id] = _MockStudy(study_id)
+            study = self._studies[study_id]
+            study.direction = config.get('direction', study.direction)
+            trial_id = study.n_trials
+            study.n_trials += 1
+            ret = {k: sample_suggestion(v, self._rng) for k, v in properties.items()
+                   if k != 'hopaas_config' and not k.startswith('_')}
+            study.properties[trial_id] = dict(ret)
+            study.touch(trial_id)
+            if 'lease' in config:
+                study.leases[trial_id] = time.monotonic() + config['lease']['duration']
+                study.workers[trial_id] = config['lease']['worker']
+
+        ret['hopaas_trial'] = f"{study_id}:{trial_id}"
+        return ret
+
+    def api_ask_batch(self, payload: dict) -> List[dict]:
+        return [self.api_ask(payload['properties']) for _ in range(payload['n_trials'])]
+
+    def api_suggest(self, payload: dict) -> dict:
+        study, trial_id = self._trial(payload['hopaas_trial'])
+        with self._lock:
+            if study.state(trial_id) != 'running':
+                raise _MockHTTPError(409, "The trial is not running")
+            params = study.properties.setdefault(trial_id, dict())
+            for name, value in payload['properties'].items():
+                if name not in params:
+                    params[name] = sample_suggestion(value, self._rng)
+            study.touch(trial_id)
+            return {name: params[name] for name in payload['properties']}
+
+    def api_tell(self, payload: dict) -> str:
+        study, trial_id = self._trial(payload['hopaas_trial'])
+        with self._lock:
+            study.losses[trial_id] = payload['loss']
+            study.leases.pop(trial_id, None)
+            study.touch(trial_id)
+        return "ok"
+
+    def api_mark_as_failed(self, payload: dict) -> str:
+        study, trial_id = self._trial(payload['hopaas_trial'])
+        with self._lock:
+            study.failed[trial_id] = payload['error']
+            study.leases.pop(trial_id, None)
+            study.touch(trial_id)
+        return "ok"
+
+    def api_report_batch(self, payload: dict) -> List[dict]:
+        """Processes several `tell` and `mark_as_failed` requests, answering with the status of each"""
+        ret = []
+        for request in payload['requests']:
+            endpoint = request['endpoint']
+            if endpoint not in ['tell', 'mark_as_failed'] or endpoint in self.disabled_endpoints:
+                ret.append(dict(status=404, detail="Not found"))
+                continue
+            error = self.injected_error(endpoint)
+            if error is not None and not error[1]:
+                ret.append(dict(status=error[0], detail="Injected error"))
+                continue
+            try:
+                getattr(self, f"api_{endpoint}")(request['payload'])
+            except _MockHTTPError as e:
+                ret.append(dict(status=e.status, detail=str(e)))
+                continue
+            ret.append(dict(status=200, detail="ok") if error is None else dict(status=error[0], detail="Injected error"))
+        return ret
+
+    def api_should_prune(self, payload: dict) -> bool:
+        study, trial_id = self._trial(payload['hopaas_trial'])
+        with self._lock:
+            study.intermediate.setdefault(trial_id, dict())[payload['step']] = payload['loss']
+        return False
+
+    def api_report_intermediate(self, payload: dict) -> str:
+        study, trial_id = self._trial(payload['hopaas_trial'])
+        with self._lock:
+            study.intermediate.setdefault(trial_id, dict()).update(
+                {int(step): loss for step, loss, _ in payload['intermediate_values']}
+            )
+        return "ok"
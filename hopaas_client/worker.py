@@ -0,0 +1,91 @@
+"""
+Command line entry point of the hopaas workers, installed as `hopaas-worker`.
+
+A worker pulls the trials of a study, defined in a Python module, and evaluates them
+with an objective function, until the budget in number of trials or time is spent.
+Many workers, on as many nodes, can run the same study: each trial is leased to the
+worker running it, so that the trials of a killed worker do not run forever.
+
+For example, with a module `sweep.py` defining `study = Study(...)` and
+`def objective(trial): ...`:
+```
+hopaas-worker sweep:study sweep:objective --timeout 3600 --n-jobs 4
+```
+"""
+import argparse
+import importlib
+import os
+import sys
+from typing import List, Union
+
+from hopaas_client.Study import Study
+
+
+def load(spec: str):
+    """Imports the object defined by `spec`, in the form `module:attribute`"""
+    module_name, _, attribute = spec.partition(':')
+    if attribute == '':
+        raise ValueError(f"Invalid specification {spec}, expected module:attribute")
+
+    obj = importlib.import_module(module_name)
+    for name in attribute.split('.'):
+        obj = getattr(obj, name)
+    return obj
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="hopaas-worker",
+        description="Pulls and evaluates the trials of a hopaas study until the budget is spent",
+    )
+    parser.add_argument("study", help="the Study, or a function returning it, as module:attribute")
+    parser.add_argument("objective", help="the objective function, taking a trial and returning "
+                                          "its loss, as module:attribute")
+    parser.add_argument("--n-trials", type=int, default=None,
+                        help="number of trials to evaluate (default: no limit)")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="no trial is started after this number of seconds (default: no limit)")
+    parser.add_argument("--n-jobs", type=int, default=1,
+                        help="number of trials evaluated concurrently, -1 for the number of CPUs (default: 1)")
+    parser.add_argument("--backend", choices=["thread", "process"], default="thread",
+                        help="run the objective in threads or in processes (default: thread)")
+    parser.add_argument("--lease", type=float, default=60.,
+                        help="duration in seconds of the leases of the trials, "
+                             "unless defined by the study (default: 60)")
+    parser.add_argument("--fail-fast", action="store_true",
+                        help="stop at the first exception raised by the objective, "
+                             "instead of marking the trial as failed and continuing")
+    return parser
+
+
+def main(argv: Union[List[str], None] = None) -> int:
+    args = make_parser().parse_args(argv)
+    if args.n_trials is None and args.timeout is None:
+        print("hopaas-worker: either --n-trials or --timeout is required", file=sys.stderr)
+        return 2
+
+    # Modules in the working directory are importable, as with `python -m`
+    sys.path.insert(0, os.getcwd())
+    study = load(args.study)
+    if not isinstance(study, Study) and callable(study):
+        study = study()
+    objective = load(args.objective)
+
+    if study.lease is None:
+        study.lease = args.lease
+
+    try:
+        study.optimize(objective,
+                       n_trials=args.n_trials,
+                       n_jobs=args.n_jobs,
+                       backend=args.backend,
+                       catch=() if args.fail_fast else (Exception,),
+                       timeout=args.timeout)
+    finally:
+        study._client.close()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
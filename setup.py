@@ -13,5 +13,11 @@ setup(
         'numpy',
         'pytest',
         'requests'
-    ]
+    ],
+    entry_points={
+        'console_scripts': [
+            'hopaas-worker=hopaas_client.worker:main',
+            'hopaas-client=hopaas_client.__main__:main',
+        ],
+    },
 )
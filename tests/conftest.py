@@ -0,0 +1,36 @@
+import pytest
+
+
+@pytest.fixture
+def mock_options():
+    """Options of the `MockHopaasServer` of the `server` fixture, overridden by the test modules"""
+    return dict()
+
+
+@pytest.fixture
+def server(mock_options):
+    from hopaas_client.utils.mock_server import MockHopaasServer
+    with MockHopaasServer(seed=42, **mock_options) as server:
+        yield server
+
+
+@pytest.fixture
+def make_client(server):
+    """Factory of the clients of the mock server"""
+    def make_client(**kwargs):
+        from hopaas_client import Client
+        return Client(server=server.address, token=server.token, **kwargs)
+    return make_client
+
+
+@pytest.fixture
+def make_study(make_client):
+    """Factory of the studies on the mock server, by default on `x` in [-1, 1], each with a client of its own"""
+    def make_study(title="TEST::Study", properties=None, client=None, **kwargs):
+        from hopaas_client import Study
+        from hopaas_client import suggestions as hs
+        return Study(title,
+                     properties=properties if properties is not None else dict(x=hs.Float(-1, 1)),
+                     client=client if client is not None else make_client(),
+                     **kwargs)
+    return make_study
@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+
+
+@pytest.fixture
+def study(make_study):
+    from hopaas_client.suggestions import Uniform
+    return make_study('TEST::AsyncStudy', dict(x=Uniform(-1, 1)))
+
+
+###############################################################################
+
+
+def test_concurrent_atrials(server, study):
+    async def run():
+        async with study.atrial() as trial:
+            await asyncio.sleep(0.01)
+            trial.loss = trial.x ** 2
+            assert await trial.ashould_prune() is False
+
+    async def main():
+        await asyncio.gather(*[run() for _ in range(20)])
+
+    asyncio.run(main())
+    assert len(study.trials) == 20
+    assert len(server.study(study.study_id).losses) == 20
+
+
+def test_atrial_failure(server, study):
+    async def main():
+        async with study.atrial() as trial:
+            raise ZeroDivisionError
+
+    with pytest.raises(ZeroDivisionError):
+        asyncio.run(main())
+
+    assert len(server.study(study.study_id).failed) == 1
+
+
+def test_atrial_async_report(server, make_study):
+    from hopaas_client.suggestions import Uniform
+    study = make_study('TEST::AsyncStudy', dict(x=Uniform(-1, 1)), async_report=True)
+    server.latency = dict(tell=0.2)
+
+    async def main():
+        async with study.atrial() as trial:
+            trial.loss = trial.x ** 2
+
+    # The trial does not wait for the server to acknowledge its result
+    asyncio.run(asyncio.wait_for(main(), timeout=0.15))
+    assert study._client.reporter.n_pending == 1
+    assert study.flush(timeout=10)
+    assert len(server.study(study.study_id).losses) == 1
+
+
+def test_run_in_executor(study):
+    async def main():
+        return await study.async_client.run_in_executor(sum, [1, 2], start=3)
+
+    assert asyncio.run(main()) == 6
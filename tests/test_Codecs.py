@@ -0,0 +1,87 @@
+import json
+import pickle
+
+import pytest
+
+from hopaas_client import codecs
+
+
+class CompactJSONCodec(codecs.JSONCodec):
+    """A codec unknown to older servers"""
+    name = 'compact-json'
+    content_type = 'application/x-compact-json'
+
+
+codecs.register(CompactJSONCodec())
+
+
+@pytest.fixture
+def run_trial(server, make_client, make_study):
+    """Runs a trial with a client configured with the keyword arguments, returns the client"""
+    def run_trial(**kwargs):
+        from hopaas_client import suggestions as hs
+        client = make_client(**kwargs)
+        study = make_study("TEST::Codecs", dict(x=hs.Float(-1, 1), comment="x" * 1000), client)
+        with study.trial() as trial:
+            trial.loss = trial.x ** 2
+        assert server.study(study.study_id).losses == {trial.id: trial.x ** 2}
+        return client
+    return run_trial
+
+
+###############################################################################
+
+
+def test_get_codec():
+    assert codecs.get_codec(None) is codecs.JSON
+    assert codecs.get_codec('compact-json') is codecs.for_content_type('application/x-compact-json; charset=utf-8')
+    with pytest.raises(ValueError):
+        codecs.get_codec('xml')
+    assert pickle.loads(pickle.dumps(codecs.JSON)) is codecs.JSON
+
+
+def test_default(server, run_trial):
+    client = run_trial()
+    assert server.encodings == {'json': 3}
+    # Compression is opt-in, older servers reject it
+    assert client.gzip_threshold is None
+
+
+def test_negotiated_codec(server, run_trial):
+    client = run_trial(codec='compact-json')
+    assert server.encodings == {'compact-json': 3}
+    assert client.codec.name == 'compact-json'
+    assert pickle.loads(pickle.dumps(client)).codec is client.codec
+
+
+def test_gzip(server, run_trial):
+    client = run_trial(gzip_threshold=256)
+    assert server.encodings == {'json+gzip': 1, 'json': 2}
+    assert client.gzip_threshold == 256
+
+
+@pytest.mark.parametrize('mock_options', [dict(codecs=['json'], gzip=False)], ids=['legacy'])
+def test_fallback_to_json(server, run_trial):
+    client = run_trial(codec='compact-json', gzip_threshold=256)
+    assert server.encodings == {'compact-json+gzip': 1, 'json': 3}
+    assert client.codec is codecs.JSON
+    assert client.gzip_threshold is None
+
+
+def test_msgpack(server, run_trial):
+    pytest.importorskip("msgpack")
+    run_trial(codec='msgpack')
+    assert server.encodings == {'msgpack': 3}
+
+
+def test_msgpack_not_installed(monkeypatch):
+    monkeypatch.setattr(codecs, 'msgpack', None)
+    monkeypatch.setattr(codecs, '_codecs', {k: v for k, v in codecs._codecs.items() if k != 'msgpack'})
+    with pytest.raises(ImportError):
+        codecs.get_codec('msgpack')
+
+
+def test_compact_json():
+    payload = dict(x=1, hopaas_config=dict(title="Title", sampler=dict(name="TPESampler", args=dict())))
+    assert json.loads(codecs.JSON.encode(payload)) == payload
+    assert len(codecs.JSON.encode(payload)) < len(json.dumps(payload))
@@ -0,0 +1,67 @@
+import pytest
+
+
+def test_pooled_roundtrips(server, make_client):
+    with make_client(pool_maxsize=2) as client:
+        assert client.backend_version == "mock-0.0"
+        properties = client.ask(dict(x=1, hopaas_config=dict(title="TEST::Connection")))
+        study_id, trial_id = properties['hopaas_trial'].split(':')
+        for step in range(10):
+            assert client.should_prune(study_id, int(trial_id), 1.23, step) is False
+        client.tell(study_id, int(trial_id), 1.23)
+        assert client.get_best_trial(study_id, int(trial_id)) == int(trial_id)
+    # 14 sequential requests over a single keep-alive connection
+    assert sum(server.requests.values()) == 14
+    assert server.n_connections == 1
+
+
+def test_connection_config(tmp_path):
+    from hopaas_client import Client
+    cfg = tmp_path / "hopaasrc"
+    cfg.write_text("[server]\naddress = http://localhost\nport = 80\n"
+                   "[auth]\napi_token = abc\n"
+                   "[connection]\npool_maxsize = 32\nread_timeout = 5\n")
+    client = Client(config_filename=str(cfg), read_timeout=7)
+    assert client.pool_maxsize == 32
+    assert client.timeout == (Client.DEFAULT_CONNECT_TIMEOUT, 7)
+
+
+def test_environment_config(tmp_path, monkeypatch):
+    from hopaas_client import Client
+    monkeypatch.setenv("HOPAAS_SERVER", "https://hopaas.example.com:443")
+    monkeypatch.setenv("HOPAAS_TOKEN", "abc")
+    client = Client(config_filename=str(tmp_path / "missing"))
+    assert (client.server, client.token) == ("https://hopaas.example.com:443", "abc")
+    assert not (tmp_path / "missing").exists()
+    assert Client(token="def").token == "def"
+
+
+def test_non_interactive(tmp_path, monkeypatch):
+    from hopaas_client import Client
+    from hopaas_client.Exceptions import HopaasConfigurationError
+    monkeypatch.delenv("HOPAAS_SERVER", raising=False)
+    monkeypatch.setenv("HOPAAS_NONINTERACTIVE", "1")
+    monkeypatch.setattr("builtins.input", lambda prompt: pytest.fail("The user was prompted"))
+    with pytest.raises(HopaasConfigurationError):
+        Client(config_filename=str(tmp_path / "missing"), token="abc")
+    with pytest.raises(HopaasConfigurationError):
+        Client(config_filename=str(tmp_path / "missing"), interactive=False)
+
+
+def test_lazy_imports():
+    import subprocess
+    import sys
+    code = ("import sys; import hopaas_client; assert 'requests' not in sys.modules; "
+            "from hopaas_client import Client; client = Client(server='http://localhost:1', token='x'); "
+            "assert 'requests' not in sys.modules and 'numpy' not in sys.modules; "
+            "assert hopaas_client.Client is Client and isinstance(Client, type)")
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_lazy_submodules():
+    import subprocess
+    import sys
+    code = ("import hopaas_client as hpc; assert hpc.suggestions.Int(1, 10).max == 10; "
+            "assert hpc.pruners.MedianPruner and hpc.samplers.TPESampler; "
+            "assert 'hopaas_client.Study' not in __import__('sys').modules")
+    subprocess.run([sys.executable, "-c", code], check=True)
@@ -0,0 +1,73 @@
+import pytest
+
+from hopaas_client import suggestions as hs
+
+
+@pytest.fixture
+def study(make_study):
+    """Factory of the studies defined by run, on the mock server unless a client is given"""
+    return lambda client=None: make_study("TEST::DefineByRun", dict(n_layers=3), client)
+
+
+def objective(trial):
+    if trial.suggest_categorical("optimizer", ["sgd", "adam"]) == "sgd":
+        lr, momentum = trial.suggest(dict(lr=hs.LogUniform(1e-5, 1e-1), momentum=hs.Float(0, 1))).values()
+        assert 0 <= momentum <= 1
+    else:
+        lr = trial.suggest_float("lr", 1e-5, 1e-1, log=True)
+    assert trial.suggest_float("lr", 1e-5, 1e-1, log=True) == lr == trial.lr
+    return lr
+
+
+###############################################################################
+
+
+def test_define_by_run(server, study):
+    study = study()
+    for _ in range(5):
+        with study.trial() as trial:
+            trial.loss = objective(trial)
+            assert set(trial.properties) >= {'n_layers', 'optimizer', 'lr'}
+    assert all('lr' in trial.properties for trial in study.trials.values())
+
+    properties = server.study(study.study_id).properties
+    assert all(set(p) == {'n_layers', 'optimizer', 'lr', 'momentum'} if p['optimizer'] == 'sgd'
+               else set(p) == {'n_layers', 'optimizer', 'lr'} for p in properties.values())
+    # One request per branch, none for the values already suggested
+    assert server.requests['suggest'] == 10
+
+
+def test_local_client(study):
+    from hopaas_client import LocalClient
+    study = study(LocalClient(seed=42))
+    study.optimize(objective, n_trials=30)
+    params = [t.params for t in study._client.study(study.study_id).trials]
+    assert all(('momentum' in p) == (p['optimizer'] == 'sgd') for p in params)
+    assert all(type(p['lr']) is float for p in params)
+
+
+def test_process_backend(study):
+    study = study()
+    study.optimize(objective, n_trials=4, n_jobs=2, backend='process')
+    assert all('lr' in trial.properties for trial in study.trials.values())
+
+
+def test_inconsistent_suggestions(study):
+    from hopaas_client import LocalClient
+    study = study(LocalClient(seed=42))
+    with study.trial() as trial:
+        trial.suggest_int("units", 1, 10)
+        with pytest.raises(ValueError):
+            trial.suggest_int("units", 1, 20)
+        with pytest.raises(ValueError):
+            trial.suggest_int("n_layers", 1, 3)
+        trial.loss = 0.
+
+
+@pytest.mark.parametrize('mock_options', [dict(disabled_endpoints=['suggest'])], ids=['legacy'])
+def test_unsupported(study):
+    from hopaas_client.Exceptions import HopaasServerError
+    with study().trial() as trial:
+        with pytest.raises(HopaasServerError):
+            trial.suggest_int("units", 1, 10)
+        trial.loss = 0.
@@ -0,0 +1,78 @@
+import pytest
+
+
+@pytest.fixture
+def cached_study(make_study, tmp_path):
+    """Factory of the studies with a history cache in `directory`, by default `tmp_path`"""
+    def cached_study(directory=tmp_path, title='TEST::History', max_staleness=3600.):
+        from hopaas_client.HistoryCache import HistoryCache
+        return make_study(title, history=HistoryCache(str(directory / "history.sqlite"), max_staleness=max_staleness))
+    return cached_study
+
+
+def run(study, n_trials):
+    for _ in range(n_trials):
+        with study.trial() as trial:
+            trial.loss = trial.x ** 2
+
+
+###############################################################################
+
+
+def test_best_trial_from_cache(server, cached_study):
+    study = cached_study()
+    run(study, 10)
+    best = study.best_trial_id
+    assert best == server.best_trial(study.study_id)
+    n_queries = dict(server.requests)
+
+    for _ in range(100):
+        assert study.best_trial_id == best
+        assert len(study.top_trials(3)) == 3
+        assert len(study.all_trials) == 10
+
+    assert server.requests == n_queries
+    assert 'get_best_trial' not in server.requests
+
+
+def test_incremental_sync(server, cached_study, tmp_path):
+    # Independent caches, each synchronized with the server
+    (tmp_path / "writer").mkdir()
+    (tmp_path / "reader").mkdir()
+    writer = cached_study(tmp_path / "writer", title='TEST::Shared')
+    reader = cached_study(tmp_path / "reader", title='TEST::Shared', max_staleness=0.)
+    run(writer, 5)
+    with reader.trial() as trial:
+        trial.loss = 100.
+
+    assert len(reader.all_trials) == 6
+    run(writer, 5)
+    trials = reader.all_trials
+    assert len(trials) == 11
+    assert all(t.loss is not None and 'x' in t.properties for t in trials.values())
+    assert reader.best_trial_id == server.best_trial(reader.study_id)
+
+    top = reader.top_trials(3)
+    assert [t.loss for t in top] == sorted(t.loss for t in trials.values())[:3]
+
+
+def test_persistence(server, cached_study, tmp_path):
+    study = cached_study()
+    run(study, 5)
+    best = study.best_trial_id
+    study.history.close()
+
+    from hopaas_client.HistoryCache import HistoryCache
+    history = HistoryCache(str(tmp_path / "history.sqlite"))
+    assert history.best_trial_id(study.study_id) == best
+    assert len(history.trials(study.study_id)) == 5
+
+
+@pytest.mark.parametrize('mock_options', [dict(disabled_endpoints=['trials'])], ids=['legacy'])
+def test_fallback_to_best_trial(server, cached_study):
+    study = cached_study()
+    run(study, 5)
+    best = study.best_trial_id
+    for _ in range(10):
+        assert study.best_trial_id == best
+    assert server.requests['get_best_trial'] == 1
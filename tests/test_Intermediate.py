@@ -0,0 +1,94 @@
+import asyncio
+import functools
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def make_study(make_study):
+    return functools.partial(make_study, "TEST::Intermediate", dict(x=1))
+
+
+###############################################################################
+
+
+def test_learning_curve(server, make_study):
+    study = make_study()
+    with study.trial() as trial:
+        for epoch in range(100):
+            trial.loss = 1. / (1 + epoch)
+        history = trial.history
+
+    assert history.shape == (100, 3)
+    assert np.array_equal(history[:, 0], np.arange(100))
+    assert np.allclose(history[:, 1], 1. / (1 + np.arange(100)))
+    assert (np.diff(history[:, 2]) >= 0).all()
+    with pytest.raises(ValueError):
+        history[0, 1] = 0.
+    assert 'report_intermediate' not in server.requests
+
+
+@pytest.mark.parametrize("async_report", [False, True])
+def test_streaming(server, make_study, async_report):
+    study = make_study(stream_intermediate=16, async_report=async_report)
+    with study.trial() as trial:
+        for epoch in range(100):
+            trial.loss = float(epoch)
+    study.flush(timeout=10)
+
+    assert server.requests['report_intermediate'] == 7
+    assert server.study(study.study_id).intermediate[trial.id] == {i: float(i) for i in range(100)}
+
+
+def test_streaming_before_pruning(server, make_study):
+    from hopaas_client.pruners import MedianPruner
+    study = make_study(stream_intermediate=1000, pruner=MedianPruner(interval_steps=10))
+    with study.trial() as trial:
+        for epoch in range(50):
+            trial.loss = float(epoch)
+            if trial.should_prune:
+                break
+
+    # The value of each step queried is carried by the query itself
+    assert server.requests['report_intermediate'] == server.requests['should_prune']
+    assert len(server.study(study.study_id).intermediate[trial.id]) == 50
+
+
+def test_streaming_each_step(server, make_study):
+    from hopaas_client.pruners import MedianPruner
+    study = make_study(stream_intermediate=10, pruner=MedianPruner())
+    for _ in range(2):
+        with study.trial() as trial:
+            for epoch in range(20):
+                trial.loss = float(epoch)
+                assert not trial.should_prune
+
+    assert server.requests.get('report_intermediate', 0) <= 2
+    assert len(server.study(study.study_id).intermediate[trial.id]) == 20
+
+
+@pytest.mark.parametrize('mock_options', [dict(disabled_endpoints=['report_intermediate'])], ids=['legacy'])
+def test_streaming_unsupported(server, make_study):
+    study = make_study(stream_intermediate=4)
+    for _ in range(3):
+        with study.trial() as trial:
+            for epoch in range(20):
+                trial.loss = float(epoch)
+
+    assert server.requests['report_intermediate'] == 1
+    assert len(server.study(study.study_id).losses) == 3
+
+
+def test_streaming_atrial(server, make_study):
+    study = make_study(stream_intermediate=8)
+
+    async def run():
+        async with study.atrial() as trial:
+            for epoch in range(20):
+                trial.loss = float(epoch)
+        return trial
+
+    trial = asyncio.run(run())
+    assert server.requests['report_intermediate'] == 1
+    assert len(server.study(study.study_id).intermediate[trial.id]) == 20
@@ -0,0 +1,99 @@
+from hopaas_client import samplers, pruners
+import pytest
+
+all_suggestions = [
+    ('Uniform', (0, 1)),
+    ('Int', (0, 10, 2, False)),
+    ('Int', (1, 1000, 1, True)),
+    ('Float', (-10., 10.)),
+    ('DiscreteUniform', (-1., 1.)),
+    ('LogUniform', (1e-3, 1e+3)),
+    ('Categorical', (['successful', 'unsuccessful', 'improvable'],)),
+]
+
+all_samplers = [getattr(samplers, s) for s in samplers.testables]
+all_pruners = [getattr(pruners, p) for p in pruners.testables]
+
+
+def make_study(name, properties, **kwargs):
+    from hopaas_client import Study, LocalClient
+    return Study(name, properties=properties, client=LocalClient(seed=42), **kwargs)
+
+
+###############################################################################
+
+
+@pytest.mark.parametrize('sampler', all_samplers)
+@pytest.mark.parametrize('pruner', all_pruners)
+@pytest.mark.parametrize('suggested', all_suggestions)
+def test_local_one_shot(sampler, pruner, suggested):
+    from hopaas_client import suggestions
+    from hopaas_client.local import parse_suggestion
+    suggestion = getattr(suggestions, suggested[0])(*suggested[1])
+    distribution = parse_suggestion(str(suggestion))
+    study = make_study(
+        'TEST::LocalClient::one_shot',
+        properties={'x': 1, 'y': suggestion},
+        sampler=sampler(),
+        pruner=pruner() if pruner != pruners.ThresholdPruner else pruner(upper=2)
+    )
+
+    for _ in range(15):
+        with study.trial() as trial:
+            assert trial.x == 1
+            assert distribution.from_internal(distribution.to_internal(trial.y)) == pytest.approx(trial.y)
+            for step in range(3):
+                trial.loss = 1.23
+                if trial.should_prune:
+                    break
+
+
+def test_tpe_converges():
+    from hopaas_client.suggestions import Float
+    study = make_study('TEST::LocalClient::x_squared', dict(x=Float(-50, 50)),
+                       sampler=samplers.TPESampler(n_startup_trials=10))
+    for _ in range(60):
+        with study.trial() as trial:
+            trial.loss = trial.x ** 2
+    best = study.trials[study.best_trial_id]
+    assert abs(best.properties['x']) < 5
+
+
+@pytest.mark.parametrize('pruner', [pruners.MedianPruner(n_startup_trials=2),
+                                    pruners.HyperbandPruner(max_resources=27)])
+def test_pruners_prune(pruner):
+    from hopaas_client.suggestions import Float
+    study = make_study('TEST::LocalClient::pruning', dict(x=Float(0, 1)), pruner=pruner)
+    n_pruned = 0
+    for _ in range(30):
+        with study.trial() as trial:
+            for step in range(27):
+                trial.loss = trial.x + 1. / (1 + step)
+                if trial.should_prune:
+                    n_pruned += 1
+                    break
+    assert n_pruned > 0
+
+
+def test_tpe_incremental_history():
+    import numpy as np
+    from hopaas_client.local.samplers import TPEEngine
+    from hopaas_client.local.space import FloatDistribution, CategoricalDistribution
+    from hopaas_client.local.storage import LocalStudy, LocalTrial
+
+    space = dict(x=FloatDistribution(-1, 1), c=CategoricalDistribution(['a', 'b']))
+    study, engine = LocalStudy('s', 'TEST::LocalClient::tpe'), TPEEngine(seed=1)
+    rng = np.random.default_rng(1)
+    for i in range(300):
+        internal = engine.sample(study, space)
+        if i % 3 == 0:
+            internal.update(y=float(rng.uniform()))
+        trial = LocalTrial(i, dict(), internal)
+        trial.loss = internal['x'] ** 2
+        engine.observe(study, trial)
+
+    n_trials = engine.n_trials
+    for column in engine._columns.values():
+        values = engine._values[:n_trials, column]
+        np.testing.assert_array_equal(engine._sorted[column, :n_trials], np.sort(values))
+        np.testing.assert_array_equal(values[engine._order[column, :n_trials]], np.sort(values))
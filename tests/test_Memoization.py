@@ -0,0 +1,92 @@
+import functools
+import os
+
+import pytest
+
+
+@pytest.fixture
+def make_study(make_study, tmp_path):
+    from hopaas_client import suggestions as hs
+    return functools.partial(make_study, "TEST::Memoization", dict(x=hs.Categorical([1, 2, 3]), y=2),
+                             checkpoints=str(tmp_path / "checkpoints"))
+
+
+###############################################################################
+
+
+def test_memoized_trials(server, make_study):
+    study = make_study(memoize=True)
+    evaluated = []
+    for _ in range(3):
+        with study.trial() as trial:
+            evaluated.append(trial.x)
+            trial.loss = trial.x ** 2
+
+    assert sorted(evaluated) == [1, 2, 3]
+
+    # The search space is exhausted: a trial is run anyway after a few memoized ones
+    study.MAX_MEMOIZED_IN_A_ROW = 5
+    with study.trial() as trial:
+        trial.loss = trial.x ** 2
+    assert study.n_memoized >= 5
+    losses = server.study(study.study_id).losses
+    assert len(losses) == 4 + study.n_memoized
+    assert all(loss == study.trials[trial_id].properties['x'] ** 2 for trial_id, loss in losses.items())
+
+
+def test_memoized_from_history(server, make_study, tmp_path):
+    from hopaas_client.HistoryCache import HistoryCache
+    first = make_study(history=HistoryCache(str(tmp_path / "history.sqlite")))
+    while len({trial.properties['x'] for trial in first.trials.values()}) < 3:
+        with first.trial() as trial:
+            trial.loss = trial.x ** 2
+
+    # Another run, with its own history cache fetching the trials from the server
+    second = make_study(history=HistoryCache(str(tmp_path / "other.sqlite")), memoize=True)
+    second.MAX_MEMOIZED_IN_A_ROW = 5
+    with second.trial() as trial:
+        trial.loss = -1.
+    assert second.n_memoized == 5
+
+
+def test_optimize_memoized(server, make_study):
+    study = make_study(memoize=True)
+    evaluated = []
+
+    def objective(trial):
+        evaluated.append(trial.x)
+        return trial.x ** 2
+
+    study.optimize(objective, n_trials=3, n_jobs=1)
+    assert sorted(evaluated) == [1, 2, 3]
+
+
+def test_no_define_by_run(server, make_study):
+    study = make_study(memoize=True)
+    with pytest.raises(ValueError):
+        with study.trial() as trial:
+            trial.suggest_float("lr", 1e-3, 1e-1, log=True)
+
+
+def test_resume_preempted(server, make_study):
+    study = make_study()
+    preempted = study.trial()
+    trial = preempted.__enter__()
+    with open(os.path.join(trial.checkpoint_dir, "model.ckpt"), 'w') as file:
+        file.write("epoch 7")
+    hopaas_trial = f"{study.study_id}:{trial.id}"
+
+    # The job restarts
+    study = make_study()
+    assert study.preempted_trials() == [hopaas_trial]
+    with study.trial(resume=hopaas_trial) as resumed:
+        assert resumed.id == trial.id and resumed.x == trial.x
+        with open(os.path.join(resumed.checkpoint_dir, "model.ckpt")) as file:
+            assert file.read() == "epoch 7"
+        resumed.loss = 1.
+
+    assert study.preempted_trials() == []
+    assert server.study(study.study_id).losses[trial.id] == 1.
+    with pytest.raises(Exception):
+        with make_study().trial(resume=hopaas_trial):
+            pass
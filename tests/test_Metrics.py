@@ -0,0 +1,101 @@
+import functools
+
+import pytest
+
+from hopaas_client.metrics import Metrics, Histogram, InMemoryExporter, PrometheusExporter, format_summary
+
+
+@pytest.fixture
+def make_study(make_study):
+    from hopaas_client.pruners import ThresholdPruner
+    return functools.partial(make_study, "TEST::Metrics", pruner=ThresholdPruner(upper=0.5))
+
+
+###############################################################################
+
+
+def test_histogram():
+    histogram = Histogram(buckets=(1., 2., 3.))
+    for value in [0.5, 1.5, 1.5, 2.5, 10.]:
+        histogram.observe(value)
+    assert histogram.counts == [1, 2, 1, 1]
+    assert histogram.count == 5 and histogram.sum == 16.
+    assert 1. < histogram.quantile(0.5) < 2.
+    assert histogram.quantile(1.) == 3.
+
+
+def test_client_metrics(server, make_client, make_study):
+    from hopaas_client.RetryPolicy import RetryPolicy
+    exporter = InMemoryExporter()
+    metrics = Metrics(exporters=[exporter])
+    client = make_client(metrics=metrics, retry_policy=RetryPolicy(initial_backoff=0.01))
+    study = make_study(client=client)
+    server.inject_errors('tell', [503])
+    for i in range(4):
+        with study.trial() as trial:
+            for step in range(3):
+                trial.loss = 1. if i == 0 else 0.
+                if trial.should_prune:
+                    break
+
+    assert metrics.counter('hopaas_requests_total', endpoint='ask', status='200') == 4
+    assert metrics.counter('hopaas_requests_total', endpoint='tell', status='200') == 4
+    assert metrics.counter('hopaas_requests_total', endpoint='should_prune', status='200') == 3
+    assert metrics.counter('hopaas_retries_total', endpoint='tell') == 1
+    assert metrics.histogram('hopaas_request_seconds', endpoint='tell').count == 4
+    assert metrics.counter('hopaas_trials_total', state='running') == 4
+    assert metrics.counter('hopaas_trials_total', state='complete') == 4
+    assert metrics.counter('hopaas_prune_queries_avoided_total') > 0
+    for phase in ['ask', 'objective', 'report']:
+        assert metrics.histogram('hopaas_trial_phase_seconds', phase=phase).count == 4
+
+    span_names = {name for name, _, _, _ in exporter.spans}
+    assert {'hopaas.ask', 'hopaas.tell', 'hopaas.trial.objective'} <= span_names
+
+    client.close()
+    assert exporter.last_summary['hopaas_trials_total']['state=running'] == 4
+    assert 'hopaas_request_seconds{endpoint=ask}' in format_summary(exporter.last_summary)
+
+
+def test_errors(server):
+    from hopaas_client import Client
+    from hopaas_client.Exceptions import HopaasServerError
+    from hopaas_client.RetryPolicy import RetryPolicy
+    metrics = Metrics()
+    client = Client(server=server.address, token="wrong", metrics=metrics, retry_policy=RetryPolicy(max_retries=0))
+    with pytest.raises(HopaasServerError):
+        client.ask(dict(x=1))
+    assert metrics.counter('hopaas_errors_total', endpoint='ask', kind='403') == 1
+
+
+def test_prometheus(tmp_path, make_study):
+    from hopaas_client import LocalClient
+    path = tmp_path / "hopaas.prom"
+    metrics = Metrics(exporters=[PrometheusExporter(str(path))])
+    with LocalClient(seed=42, metrics=metrics) as client:
+        study = make_study(client=client)
+        for i in range(4):
+            with study.trial() as trial:
+                trial.loss = 1. if i == 0 else 0.
+                trial.should_prune
+
+    text = path.read_text()
+    assert '# TYPE hopaas_trials_total counter' in text
+    assert 'hopaas_trials_total{state="complete"} 3' in text
+    assert 'hopaas_trials_total{state="pruned"} 1' in text
+    assert 'hopaas_trial_phase_seconds_bucket{phase="ask",le="+Inf"} 4' in text
+    assert 'hopaas_trial_phase_seconds_count{phase="objective"} 4' in text
+
+
+def test_disabled(make_study):
+    study = make_study()
+    assert study.metrics is None
+    with study.trial() as trial:
+        trial.loss = 0.
+
+
+def test_opentelemetry():
+    pytest.importorskip("opentelemetry")
+    from hopaas_client.metrics import OpenTelemetryExporter
+    metrics = Metrics(exporters=[OpenTelemetryExporter()])
+    metrics.span("hopaas.ask", 0., 1., endpoint="ask")
@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+from hopaas_client.FairScheduler import FairScheduler
+
+
+@pytest.fixture
+def mock_options():
+    return dict(latency=0.02)
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    from hopaas_client import Client
+    monkeypatch.setattr(Client, '_registry', dict())
+
+
+def make_shared_study(title):
+    """Study without a client of its own, sharing the one of the server in the environment"""
+    from hopaas_client import Study
+    from hopaas_client import suggestions as hs
+    return Study(title, properties=dict(x=hs.Float(-1, 1)))
+
+
+###############################################################################
+
+
+def test_round_robin():
+    scheduler = FairScheduler(max_in_flight=1)
+    scheduler.acquire()
+    served = []
+
+    def request(key):
+        with scheduler.slot(key):
+            served.append(key)
+
+    threads = []
+    for key in ['a', 'a', 'a', 'b', 'c']:
+        threads.append(threading.Thread(target=request, args=(key,)))
+        threads[-1].start()
+        while scheduler.n_waiting < len(threads):
+            time.sleep(0.001)
+
+    scheduler.release()
+    for thread in threads:
+        thread.join()
+    assert served == ['a', 'b', 'c', 'a', 'a']
+    assert scheduler.in_flight == 0
+
+
+def test_max_in_flight(server, make_client):
+    scheduler = FairScheduler(max_in_flight=2)
+    client = make_client(scheduler=scheduler)
+    properties = dict(x=1, hopaas_config=dict(title="TEST::Multiplexing"))
+    threads = [threading.Thread(target=client.ask, args=(properties,)) for _ in range(8)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.perf_counter() - start > 4 * 0.02
+    assert server.requests['ask'] == 8
+    assert scheduler.in_flight == 0
+
+
+def test_shared_client(server, registry, monkeypatch):
+    from hopaas_client import Client
+    monkeypatch.setenv("HOPAAS_SERVER", server.address)
+    monkeypatch.setenv("HOPAAS_TOKEN", server.token)
+    studies = [make_shared_study(f"TEST::Multiplexing::{i}") for i in range(4)]
+    client = studies[0]._client
+    assert all(study._client is client for study in studies)
+    assert client is Client.shared(server.address, server.token)
+    assert client is not Client.shared(server.address, "another-token")
+    assert set(client.studies) == set(studies)
+    assert client.scheduler.max_in_flight == client.pool_maxsize
+
+    def run(study):
+        for _ in range(3):
+            with study.trial() as trial:
+                trial.loss = trial.x ** 2
+
+    threads = [threading.Thread(target=run, args=(study,)) for study in studies]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(len(server.study(study.study_id).losses) == 3 for study in studies)
+
+
+def test_shared_client_resolution(server, registry, monkeypatch):
+    from hopaas_client import Client
+    monkeypatch.setenv("HOPAAS_SERVER", server.address)
+    monkeypatch.setenv("HOPAAS_TOKEN", server.token)
+    client = Client.shared()
+    init, constructed = Client.__init__, []
+
+    def counting_init(self, *args, **kwargs):
+        constructed.append(kwargs)
+        init(self, *args, **kwargs)
+
+    monkeypatch.setattr(Client, '__init__', counting_init)
+    assert Client.shared(server.address, server.token) is client
+    assert Client.shared(token=server.token) is client
+    assert constructed == []
+
+    monkeypatch.setenv("HOPAAS_TOKEN", "another-token")
+    assert Client.shared() is not client
+    assert Client.shared().token == "another-token"
+    assert len(constructed) == 1
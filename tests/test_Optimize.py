@@ -0,0 +1,98 @@
+import functools
+import os
+import time
+
+import pytest
+
+
+@pytest.fixture
+def make_study(make_study):
+    return functools.partial(make_study, "TEST::Optimize")
+
+
+def quadratic(trial):
+    time.sleep(0.01)
+    return trial.x ** 2
+
+
+def failing(trial):
+    if trial.id % 4 == 1:
+        raise ValueError("Failing objective")
+    return trial.x ** 2
+
+
+def crashing(trial):
+    if trial.id == 3:
+        os._exit(1)
+    time.sleep(0.1)
+    return trial.x ** 2
+
+
+def early_stopping(trial):
+    for epoch in range(10):
+        trial.loss = trial.x ** 2 + 1. / (1 + epoch)
+        if trial.should_prune:
+            return None
+    return None
+
+
+###############################################################################
+
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+def test_optimize(server, make_study, backend):
+    study = make_study()
+    study.optimize(quadratic, n_trials=40, n_jobs=4, backend=backend)
+
+    mock_study = server.study(study.study_id)
+    assert len(mock_study.losses) == 40
+    assert len(study.trials) == 40
+    assert all(t.loss == pytest.approx(t.properties['x'] ** 2) for t in study.trials.values())
+    assert mock_study.losses == {i: t.loss for i, t in study.trials.items()}
+
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+def test_optimize_catch(server, make_study, backend):
+    study = make_study()
+    study.optimize(failing, n_trials=20, n_jobs=2, backend=backend, catch=(ValueError,))
+    mock_study = server.study(study.study_id)
+    assert len(mock_study.failed) == 5
+    assert len(mock_study.losses) == 15
+
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+def test_optimize_raise(server, make_study, backend):
+    study = make_study()
+    with pytest.raises(ValueError):
+        study.optimize(failing, n_trials=20, n_jobs=2, backend=backend)
+    mock_study = server.study(study.study_id)
+    assert len(mock_study.failed) >= 1
+    assert len(mock_study.losses) + len(mock_study.failed) == mock_study.n_trials
+
+
+def test_worker_crash(server, make_study):
+    study = make_study()
+    study.optimize(crashing, n_trials=12, n_jobs=4, backend='process')
+    mock_study = server.study(study.study_id)
+    assert mock_study.failed == {3: "Worker process crashed"}
+    assert len(mock_study.losses) == 11
+
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+def test_optimize_intermediate(server, make_study, backend):
+    study = make_study(stream_intermediate=100)
+    study.optimize(early_stopping, n_trials=8, n_jobs=2, backend=backend)
+    mock_study = server.study(study.study_id)
+    assert len(mock_study.losses) == 8
+    assert all(len(mock_study.intermediate[t]) == 10 for t in range(8))
+    assert all(len(t.properties) == 1 for t in study.trials.values())
+
+
+def test_optimize_local_client(make_study):
+    from hopaas_client import LocalClient
+    study = make_study(client=LocalClient(seed=1))
+    study.optimize(quadratic, n_trials=20, n_jobs=4)
+    assert len(study.trials) == 20
+
+    with pytest.raises(ValueError):
+        study.optimize(quadratic, n_trials=1, backend='process')
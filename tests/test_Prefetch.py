@@ -0,0 +1,73 @@
+import functools
+
+import pytest
+
+
+@pytest.fixture(params=[[], ['ask_batch']], ids=['batch', 'fallback'])
+def mock_options(request):
+    return dict(disabled_endpoints=request.param)
+
+
+@pytest.fixture
+def make_study(make_study):
+    from hopaas_client.suggestions import Int
+    return functools.partial(make_study, 'TEST::Prefetch', dict(x=Int(0, 10)))
+
+
+###############################################################################
+
+
+def test_prefetch(server, make_study):
+    study = make_study()
+    study.prefetch(5)
+    for _ in range(5):
+        with study.trial() as trial:
+            trial.loss = trial.x
+    assert server.requests.get('ask', 0) == (5 if 'ask_batch' in server.disabled_endpoints else 0)
+    assert len(server.study(study.study_id).losses) == 5
+
+
+def test_prefetch_refill(server, make_study):
+    study = make_study(prefetch=4)
+    for _ in range(10):
+        with study.trial() as trial:
+            trial.loss = trial.x
+    study.discard_prefetched()
+    mock_study = server.study(study.study_id)
+    assert len(mock_study.losses) == 10
+    assert len(mock_study.losses) + len(mock_study.failed) == mock_study.n_trials
+
+
+def test_refill_error(server, make_study):
+    from hopaas_client.Exceptions import HopaasServerError
+    from hopaas_client.RetryPolicy import RetryPolicy
+    study = make_study(prefetch=4)
+    study._client.retry_policy = RetryPolicy(max_retries=0)
+    with study.trial() as trial:
+        trial.loss = trial.x
+    study._refill_thread.join()
+
+    # The queue drops to the low-water mark and its refill fails
+    server.inject_errors('ask_batch', [400])
+    server.inject_errors('ask', [400] * 2)
+    for _ in range(2):
+        with study.trial() as trial:
+            trial.loss = trial.x
+    study._refill_thread.join()
+    with pytest.raises(HopaasServerError):
+        with study.trial():
+            pass
+
+    # The error is raised once, then the trials run again
+    with study.trial() as trial:
+        trial.loss = trial.x
+
+
+def test_close(server, make_study):
+    study = make_study(prefetch=4)
+    with study.trial() as trial:
+        trial.loss = trial.x
+    study.close()
+    mock_study = server.study(study.study_id)
+    assert len(mock_study.failed) == mock_study.n_trials - 1
+    assert not study._prefetched
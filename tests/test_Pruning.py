@@ -0,0 +1,36 @@
+import pytest
+from hopaas_client import pruners
+
+
+@pytest.fixture
+def run_study(make_study):
+    """Runs a trial of `n_steps` steps, stopping when pruned, returns the study"""
+    def run_study(pruner, n_steps, **kwargs):
+        study = make_study('TEST::Pruning', dict(x=1), pruner=pruner, **kwargs)
+        with study.trial() as trial:
+            for step in range(n_steps):
+                trial.loss = 1.23
+                if trial.should_prune:
+                    break
+        return study
+    return run_study
+
+
+###############################################################################
+
+
+@pytest.mark.parametrize("pruner, n_queries, n_avoided", [
+    (pruners.MedianPruner(n_warmup_steps=5, interval_steps=10), 10, 91),
+    (pruners.NopPruner(), 0, 21),
+    (pruners.ThresholdPruner(upper=2.), 0, 20),
+], ids=['median', 'nop', 'threshold'])
+def test_queries_avoided(server, run_study, pruner, n_queries, n_avoided):
+    study = run_study(pruner, 100 if n_queries else 20)
+    assert server.requests.get('should_prune', 0) == n_queries
+    assert study.n_prune_queries_avoided == n_avoided
+    assert len(server.study(study.study_id).losses) == 1
+
+
+def test_prune_min_interval(server, run_study):
+    run_study(pruners.HyperbandPruner(), 50, prune_min_interval=60.)
+    assert server.requests['should_prune'] == 1
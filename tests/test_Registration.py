@@ -0,0 +1,77 @@
+import pytest
+
+
+@pytest.fixture
+def make_study(make_study):
+    def make_registered_study(client=None, lr_max=1., **kwargs):
+        from hopaas_client import suggestions as hs
+        return make_study("TEST::Registration", dict(lr=hs.Float(0, lr_max), n_layers=3), client,
+                          special_properties=dict(dataset="train.parquet"), **kwargs)
+    return make_registered_study
+
+
+def run_trials(study, n_trials):
+    for _ in range(n_trials):
+        with study.trial() as trial:
+            assert 0 <= trial.lr <= 1 and trial.n_layers == 3
+            trial.loss = trial.lr
+
+
+###############################################################################
+
+
+def test_definition_hash():
+    from hopaas_client.utils import definition_hash
+    assert definition_hash(dict(a=1, b=dict(c=2, d=3))) == definition_hash(dict(b=dict(d=3, c=2), a=1))
+    assert definition_hash(dict(a=1)) != definition_hash(dict(a=2))
+
+
+def test_registered_asks(server, make_study):
+    study = make_study()
+    run_trials(study, 3)
+
+    assert server.requests['register_study'] == 1
+    assert study.study_id == "mock-TEST__Registration"
+    assert set(study._ask_properties()) == {'hopaas_study', 'hopaas_definition'}
+    assert len(server.study(study.study_id).losses) == 3
+    with pytest.raises(TypeError):
+        study.definition['n_layers'] = 4
+
+
+def test_registered_once_per_definition(server, make_client, make_study):
+    client = make_client()
+    run_trials(make_study(client), 1)
+    run_trials(make_study(client), 1)
+    assert server.requests['register_study'] == 1
+
+    other = make_study(client, lr_max=0.5)
+    assert other.definition_hash != make_study(client).definition_hash
+    run_trials(other, 1)
+    assert server.requests['register_study'] == 2
+
+
+def test_register_again(server, make_study):
+    study = make_study()
+    run_trials(study, 1)
+    server.forget_definitions()
+    run_trials(study, 1)
+
+    assert server.requests['register_study'] == 2
+    assert len(server.study(study.study_id).losses) == 2
+
+
+def test_registered_lease(server, make_study):
+    study = make_study(lease=10.)
+    with study.trial() as trial:
+        assert server.study(study.study_id).workers[trial.id] == study._client.worker_id
+        trial.loss = 1.
+
+
+@pytest.mark.parametrize('mock_options', [dict(disabled_endpoints=['register_study'])], ids=['legacy'])
+def test_registration_unsupported(server, make_study):
+    study = make_study()
+    run_trials(study, 3)
+
+    assert server.requests['register_study'] == 1
+    assert study._ask_properties()['hopaas_config']['title'] == "TEST::Registration"
+    assert len(server.study(study.study_id).losses) == 3
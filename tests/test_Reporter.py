@@ -0,0 +1,69 @@
+import pytest
+
+
+def test_async_report(server, make_study):
+    study = make_study('TEST::Reporter', dict(x=1), async_report=True)
+    for i in range(10):
+        with study.trial() as trial:
+            if i % 2:
+                trial.loss = 1.23
+    assert study.flush(timeout=10)
+    mock_study = server.study(study.study_id)
+    assert len(mock_study.losses) == 5
+    assert len(mock_study.failed) == 5
+
+
+def test_retry_unreachable_server():
+    from hopaas_client import Client
+    from hopaas_client.utils.mock_server import MockHopaasServer
+
+    server = MockHopaasServer()
+    client = Client(server=server.address, token=server.token)
+    reporter = client.reporter
+    reporter.initial_backoff = 0.01
+    study_id = "mock-TEST_Reporter"
+    reporter.submit('tell', study_id=study_id, trial_id=0, loss=1.)
+    assert not reporter.flush(timeout=0.2)
+
+    server.api_ask(dict(hopaas_config=dict(title="TEST:Reporter")))
+    with server:
+        assert reporter.flush(timeout=10)
+        assert server.study(study_id).losses == {0: 1.}
+
+
+@pytest.mark.parametrize('mock_options', [dict(latency=dict(tell=0.05, report_batch=0.05))], ids=['slow'])
+def test_coalesced_reports(server, make_study):
+    study = make_study('TEST::Reporter', dict(x=1), async_report=True)
+    for i in range(20):
+        with study.trial() as trial:
+            trial.loss = float(i)
+    assert study.flush(timeout=10)
+    assert len(server.study(study.study_id).losses) == 20
+    assert server.requests['report_batch'] > 0
+    assert server.requests.get('tell', 0) + server.requests['report_batch'] < 20
+
+
+@pytest.mark.parametrize('mock_options', [dict(latency=dict(tell=0.05), disabled_endpoints=['report_batch'])],
+                         ids=['legacy'])
+def test_reports_unbatched(server, make_study):
+    study = make_study('TEST::Reporter', dict(x=1), async_report=True)
+    for i in range(10):
+        with study.trial() as trial:
+            trial.loss = float(i)
+    assert study.flush(timeout=10)
+    assert len(server.study(study.study_id).losses) == 10
+    assert server.requests.get('report_batch', 0) <= 1
+
+
+def test_lost_results(server, make_study):
+    from hopaas_client.Exceptions import HopaasError
+    study = make_study('TEST::Reporter', dict(x=1), async_report=True)
+    reporter = study._client.reporter
+    reporter.max_retries, reporter.initial_backoff = 1, 0.01
+    server.inject_errors('tell', [400, 400])
+    with study.trial() as trial:
+        trial.loss = 1.
+    with pytest.raises(HopaasError):
+        study.flush(timeout=10)
+    assert len(reporter.errors) == 1
+    assert study.flush(timeout=10)
@@ -0,0 +1,149 @@
+import functools
+import pickle
+import time
+
+import pytest
+
+
+@pytest.fixture
+def make_client(make_client):
+    from hopaas_client.RetryPolicy import RetryPolicy
+    return functools.partial(make_client, retry_policy=RetryPolicy(initial_backoff=0.01))
+
+
+@pytest.fixture
+def make_study(make_study):
+    return functools.partial(make_study, "TEST::Resilience", dict(x=1))
+
+
+###############################################################################
+
+
+def test_retry_transient_errors(server, make_study):
+    study = make_study()
+    server.inject_errors('tell', [502, 503])
+    with study.trial() as trial:
+        trial.loss = 1.
+
+    assert server.requests['tell'] == 3
+    assert server.study(study.study_id).losses == {trial.id: 1.}
+
+
+def test_idempotent_retry(server, make_study):
+    study = make_study()
+    server.inject_errors('ask', [504], after_processing=True)
+    with study.trial() as trial:
+        trial.loss = 1.
+
+    assert server.requests['ask'] == 2
+    assert server.study(study.study_id).n_trials == 1
+    assert trial.id == 0
+
+
+def test_error_attributes(server, make_client, make_study):
+    from hopaas_client.Exceptions import HopaasServerError
+    from hopaas_client.RetryPolicy import RetryPolicy
+    study = make_study(client=make_client(retry_policy=RetryPolicy(max_retries=1, initial_backoff=0.01)))
+    server.inject_errors('ask', [503, 503])
+    with pytest.raises(HopaasServerError) as excinfo:
+        with study.trial():
+            pass
+
+    error = excinfo.value
+    assert error.status_code == 503
+    assert error.endpoint == 'ask'
+    assert error.latency > 0
+    assert "/api/ask" in str(error) and server.token not in str(error)
+
+
+def test_unreachable_server(server, make_client):
+    from hopaas_client.Exceptions import HopaasServerError
+    client = make_client()
+    server.stop()
+    with pytest.raises(HopaasServerError) as excinfo:
+        client.backend_version
+
+    assert excinfo.value.status_code is None
+    assert excinfo.value.endpoint == 'version'
+
+
+def test_circuit_breaker(server, make_client, make_study):
+    from hopaas_client.CircuitBreaker import CircuitBreaker
+    from hopaas_client.Exceptions import HopaasCircuitOpenError
+    from hopaas_client.RetryPolicy import RetryPolicy
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+    study = make_study(client=make_client(retry_policy=RetryPolicy(max_retries=0), circuit_breaker=breaker))
+
+    server.inject_errors('ask', [503, 503, 503])
+    for _ in range(2):
+        with pytest.raises(Exception):
+            with study.trial():
+                pass
+    assert breaker.state == 'open'
+
+    with pytest.raises(HopaasCircuitOpenError):
+        with study.trial():
+            pass
+    assert server.requests['ask'] == 2
+
+    # The probe fails, the circuit opens again
+    time.sleep(0.25)
+    assert breaker.state == 'half-open'
+    with pytest.raises(Exception):
+        with study.trial():
+            pass
+    assert breaker.state == 'open'
+
+    time.sleep(0.25)
+    with study.trial() as trial:
+        trial.loss = 1.
+    assert breaker.state == 'closed'
+    assert server.study(study.study_id).losses == {trial.id: 1.}
+
+
+def test_probe_interrupted(server, make_client, monkeypatch):
+    import requests
+    from hopaas_client.CircuitBreaker import CircuitBreaker
+    from hopaas_client.Exceptions import HopaasServerError
+    from hopaas_client.RetryPolicy import RetryPolicy
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+    client = make_client(retry_policy=RetryPolicy(max_retries=0), circuit_breaker=breaker)
+    breaker.record_failure()
+    time.sleep(0.15)
+
+    def broken_stream(*args, **kwargs):
+        raise requests.exceptions.ChunkedEncodingError(f"Connection broken on {server.address}?token={server.token}")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(client._session, 'request', broken_stream)
+        with pytest.raises(HopaasServerError) as error:
+            client.backend_version
+    assert server.token not in str(error.value)
+    assert breaker.state == 'open'
+
+    # The next probe is allowed, rather than the circuit staying half-open forever
+    time.sleep(0.15)
+    assert client.backend_version is not None
+    assert breaker.state == 'closed'
+
+
+def test_pickle(make_client):
+    client = pickle.loads(pickle.dumps(make_client()))
+    assert client.retry_policy.initial_backoff == 0.01
+    assert client.circuit_breaker.state == 'closed'
+    assert client.backend_version is not None
+
+
+@pytest.mark.parametrize('mock_options', [dict(latency=dict(tell=0.05), error_rate=dict(ask=0.3, tell=0.3))],
+                         ids=['flaky'])
+def test_random_errors_and_latency(server, make_client, make_study):
+    from hopaas_client.RetryPolicy import RetryPolicy
+    study = make_study(client=make_client(retry_policy=RetryPolicy(max_retries=20, initial_backoff=0.001)))
+    start = time.perf_counter()
+    for _ in range(10):
+        with study.trial() as trial:
+            trial.loss = 1.
+
+    assert time.perf_counter() - start > 10 * 0.05
+    assert server.requests['ask'] > 10 and server.requests['tell'] > 10
+    assert len(server.study(study.study_id).losses) == 10
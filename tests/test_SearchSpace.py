@@ -0,0 +1,79 @@
+import pickle
+
+import pytest
+
+from hopaas_client import suggestions as hs
+from hopaas_client.Exceptions import HopaasConsistencyError
+from hopaas_client.SearchSpace import SearchSpace
+
+
+def make_space():
+    return SearchSpace(dict(n=hs.Int(1, 10), x=hs.Float(-1, 1), lr=hs.LogUniform(1e-4, 1e-1),
+                            act=hs.Categorical(['relu', 'tanh']), width=hs.Categorical([16, 32, 64]),
+                            fixed=3))
+
+
+###############################################################################
+
+
+def test_encoded():
+    space = make_space()
+    assert space.encoded['n'] == "optuna#int(1,10,1,false)"
+    assert space.encoded['width'] == "optuna#categorical(16,32,64)"
+    assert space.encoded['fixed'] == 3
+    assert space.names == ('n', 'x', 'lr', 'act', 'width', 'fixed')
+    assert set(space.parameters) == {'n', 'x', 'lr', 'act', 'width'}
+
+
+def test_decode():
+    response = dict(hopaas_trial="study:1", n=3., x="0.5", lr=0.01, act="tanh", width="32", fixed=3)
+    properties = make_space().decode(response)
+    assert properties == dict(n=3, x=0.5, lr=0.01, act="tanh", width=32, fixed=3)
+    assert type(properties['n']) is int and type(properties['width']) is int
+
+
+@pytest.mark.parametrize("name, value", [
+    ('n', 11), ('n', 2.5), ('n', "three"), ('x', 1.1), ('lr', 0.), ('act', 'sigmoid'), ('width', 48),
+])
+def test_invalid_values(name, value):
+    response = dict(n=3, x=0.5, lr=0.01, act="tanh", width=32, fixed=3)
+    response[name] = value
+    with pytest.raises(HopaasConsistencyError):
+        make_space().decode(response)
+
+
+def test_off_step():
+    space = SearchSpace(dict(even=hs.Int(0, 10, step=2)))
+    assert space.decode(dict(even=4.)) == dict(even=4)
+    with pytest.raises(HopaasConsistencyError):
+        space.decode(dict(even=3))
+
+
+def test_missing_value():
+    with pytest.raises(HopaasConsistencyError):
+        make_space().decode(dict(n=3))
+
+
+@pytest.mark.parametrize("suggestion", [
+    hs.Int(10, 1), hs.Int(1, 10, step=0), hs.Int(0, 10, log=True), hs.Float(1, -1),
+    hs.LogUniform(0, 1), hs.Categorical([]), hs.Categorical(['a,b', 'c']), hs.Categorical([1, '1']),
+])
+def test_invalid_suggestions(suggestion):
+    with pytest.raises(ValueError):
+        SearchSpace(dict(p=suggestion))
+
+
+def test_pickle():
+    space = make_space()
+    assert pickle.loads(pickle.dumps(space)).parameters == space.parameters
+
+
+def test_trial_attributes():
+    from hopaas_client import LocalClient, Study
+    study = Study("TEST::SearchSpace", client=LocalClient(seed=42),
+                  properties=dict(x=hs.Float(-1, 1), width=hs.Categorical([16, 32]), step="shadowed"))
+    with study.trial() as trial:
+        assert 'x' in vars(trial) and 'step' not in vars(trial)
+        assert trial.width in [16, 32]
+        assert trial.step == -1 and trial.properties['step'] == "shadowed"
+        trial.loss = trial.x ** 2
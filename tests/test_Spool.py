@@ -0,0 +1,130 @@
+import os
+import socket
+
+import pytest
+
+
+def dead_address():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return "http://127.0.0.1:%d" % s.getsockname()[1]
+
+
+###############################################################################
+
+
+def test_journal(tmp_path):
+    from hopaas_client.Spool import Spool
+    spool = Spool(str(tmp_path), fsync_interval=0, server="http://server")
+    for trial_id in range(3):
+        spool.append('tell', dict(hopaas_trial=f"study:{trial_id}", loss=1.))
+    spool.ack(1)
+    assert [seq for seq, _, _ in spool.pending] == [0, 2]
+    spool.close()
+
+    # A line truncated by a crash is ignored
+    path, = tmp_path.glob("*.jsonl")
+    with open(path, 'a') as file:
+        file.write('{"seq": 3, "endp')
+
+    assert Spool.read(str(path)) == [("http://server", 'tell', dict(hopaas_trial="study:0", loss=1.)),
+                                     ("http://server", 'tell', dict(hopaas_trial="study:2", loss=1.))]
+
+
+def test_adopt_orphans(tmp_path):
+    from hopaas_client.Spool import Spool
+    live = Spool(str(tmp_path), server="http://server")
+    live.append('tell', dict(hopaas_trial="study:0", loss=1.))
+    dead = Spool(str(tmp_path), server="http://server")
+    dead.append('mark_as_failed', dict(hopaas_trial="study:1", error="Crash"))
+    dead.close()
+    other = Spool(str(tmp_path), server="http://other")
+    other.append('tell', dict(hopaas_trial="study:2", loss=1.))
+    other.close()
+
+    # The journals are adopted only once the server is known
+    spool = Spool(str(tmp_path))
+    assert len(spool) == 0
+    spool.bind("http://server")
+    assert [endpoint for _, endpoint, _ in spool.pending] == ['mark_as_failed']
+    assert not os.path.exists(dead.path)
+    assert os.path.exists(live.path)
+    assert os.path.exists(other.path)
+    with pytest.raises(ValueError):
+        spool.bind("http://other")
+
+    live.close()
+    spool.ack(0)
+    spool.close()
+    assert os.path.exists(live.path)
+    assert not os.path.exists(spool.path)
+
+
+def test_offline_trial(server, make_client, make_study, tmp_path):
+    from hopaas_client.CircuitBreaker import CircuitBreaker
+    from hopaas_client.RetryPolicy import RetryPolicy
+    from hopaas_client.Spool import Spool
+    client = make_client(spool=Spool(str(tmp_path)), retry_policy=RetryPolicy(initial_backoff=0.01),
+                         circuit_breaker=CircuitBreaker(reset_timeout=0.05))
+    client.reporter.initial_backoff = 0.01
+    study = make_study("TEST::Spool", dict(x=1), client)
+
+    with study.trial() as trial:
+        client.server = dead_address()
+        trial.loss = 1.
+        assert not trial.should_prune
+    assert len(client.spool) == 1
+
+    client.server = server.address
+    assert study.flush(timeout=10)
+    assert len(client.spool) == 0
+    assert server.study(study.study_id).losses == {trial.id: 1.}
+
+
+def test_replay(server, tmp_path):
+    from hopaas_client.Spool import Spool
+    from hopaas_client.__main__ import main
+    for _ in range(2):
+        server.api_ask(dict(hopaas_config=dict(title="TEST:Spool")))
+
+    spool = Spool(str(tmp_path))
+    spool.append('tell', dict(hopaas_trial="mock-TEST_Spool:0", loss=1.))
+    spool.append('mark_as_failed', dict(hopaas_trial="mock-TEST_Spool:1", error="Crash"))
+    spool.close()
+
+    argv = ["--server", server.address, "--token", server.token, "replay", "--directory", str(tmp_path)]
+    assert main(argv + ["--timeout", "10"]) == 0
+    mock_study = server.study("mock-TEST_Spool")
+    assert mock_study.losses == {0: 1.}
+    assert mock_study.failed == {1: "Crash"}
+    assert list(tmp_path.glob("*.jsonl")) == []
+
+
+def test_other_server(server, make_client, tmp_path):
+    from hopaas_client.Spool import Spool
+    spool = Spool(str(tmp_path), server=dead_address())
+    spool.append('tell', dict(hopaas_trial="mock-TEST_Spool:0", loss=1.))
+    spool.close()
+
+    client = make_client(spool=Spool(str(tmp_path)))
+    assert len(client.spool) == 0
+    client.close()
+    assert os.path.exists(spool.path)
+    assert 'tell' not in server.requests
+
+
+def test_throttled(server, make_client, make_study, tmp_path):
+    from hopaas_client.RetryPolicy import RetryPolicy
+    from hopaas_client.Spool import Spool
+    client = make_client(spool=Spool(str(tmp_path)), retry_policy=RetryPolicy(max_retries=1, initial_backoff=0.01))
+    client.reporter.initial_backoff = 0.01
+    study = make_study("TEST::Spool", dict(x=1), client)
+    server.inject_errors('tell', [429] * 100)
+    with study.trial() as trial:
+        trial.loss = 1.
+    study.flush(timeout=10)
+
+    # Given up by the reporter, but still pending for the next client of the spool to replay
+    assert len(client.reporter.errors) == 1
+    assert len(client.spool) == 1
+    assert server.study(study.study_id).losses == {}
@@ -0,0 +1,75 @@
+import functools
+
+import pytest
+
+from hopaas_client import pruners
+from hopaas_client.SuccessiveHalving import SuccessiveHalving
+
+
+@pytest.fixture
+def make_study(make_study):
+    return functools.partial(make_study, "TEST::SuccessiveHalving")
+
+
+def training(trial):
+    while trial.step + 1 < trial.budget:
+        trial.loss = trial.x ** 2 + 1. / (trial.step + 2)
+
+
+###############################################################################
+
+
+def test_rungs():
+    assert SuccessiveHalving(1, 81, 3).rungs == (1, 3, 9, 27, 81)
+    assert SuccessiveHalving(2, 10, 2).rungs == (2, 4, 8, 10)
+    assert SuccessiveHalving.from_hyperband(pruners.HyperbandPruner(max_resources=27)).rungs == (1, 3, 9, 27)
+    with pytest.raises(ValueError):
+        SuccessiveHalving(reduction_factor=1)
+    with pytest.raises(ValueError):
+        SuccessiveHalving.from_hyperband(pruners.HyperbandPruner())
+
+
+@pytest.mark.parametrize("path", [None, "rungs.sqlite"])
+def test_promotions(path, tmp_path):
+    halving = SuccessiveHalving(path=None if path is None else str(tmp_path / path))
+    assert halving.promote("study", 0, 0, 5.)
+    assert not halving.promote("study", 1, 0, 6.)
+    assert halving.promote("study", 2, 0, 1.)
+    assert not halving.promote("study", 3, 0, 3.)
+    assert not halving.promote("study", 4, 0, 7.)
+    # Top third of (1, 2, 3, 5, 6, 7): 1 and 2
+    assert halving.promote("study", 5, 0, 2.)
+    assert halving.promote("other", 0, 0, 7.)
+    assert halving.promote("study", 0, 1, 6., direction='maximize')
+    assert not halving.promote("study", 2, 1, 5., direction='maximize')
+
+
+def test_budgets(server, make_study):
+    study = make_study(halving=SuccessiveHalving(1, 27, 3))
+    study.optimize(training, n_trials=30, n_jobs=4)
+
+    steps = (study.trials_array()['step'] + 1).tolist()
+    assert set(steps) <= {1, 3, 9, 27}
+    assert 27 in steps and steps.count(1) > steps.count(27)
+    assert server.requests.get('should_prune', 0) == 0
+
+    mock_study = server.study(study.study_id)
+    assert len(mock_study.losses) == steps.count(27)
+    assert len(mock_study.failed) == 30 - steps.count(27)
+    columns = study.trials_array()
+    assert columns['step'][abs(columns['x']).argmin()] + 1 > 1
+
+
+def test_process_backend(server, make_study, tmp_path):
+    with pytest.raises(ValueError):
+        make_study(halving=SuccessiveHalving(1, 9, 3)).optimize(training, n_trials=2, backend='process')
+
+    study = make_study(halving=SuccessiveHalving(1, 9, 3, path=str(tmp_path / "rungs.sqlite")))
+    study.optimize(training, n_trials=8, n_jobs=2, backend='process')
+    steps = (study.trials_array()['step'] + 1).tolist()
+    assert len(steps) == 8 and set(steps) <= {1, 3, 9}
+
+
+def test_exclusive_with_pruners(make_study):
+    with pytest.raises(ValueError):
+        make_study(halving=SuccessiveHalving(), pruner=pruners.MedianPruner())
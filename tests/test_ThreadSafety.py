@@ -0,0 +1,82 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+
+N_THREADS = 32
+N_TRIALS = 400
+
+
+###############################################################################
+
+
+@pytest.mark.parametrize("options", [dict(), dict(prefetch=16), dict(async_report=True)])
+def test_concurrent_trials(server, make_client, make_study, options):
+    study = make_study("TEST::ThreadSafety", client=make_client(pool_maxsize=N_THREADS), **options)
+
+    def run(i):
+        with study.trial() as trial:
+            if i % 10 == 9:
+                raise ValueError("Failing trial")
+            for step in range(3):
+                trial.loss = trial.x ** 2 + step
+                assert not trial.should_prune
+            return trial.id
+
+    with ThreadPoolExecutor(max_workers=N_THREADS) as pool:
+        futures = [pool.submit(run, i) for i in range(N_TRIALS)]
+        ids = [f.result() for f in futures if f.exception() is None]
+
+    if options.get('async_report'):
+        assert study.flush(timeout=30)
+    if options.get('prefetch'):
+        study.discard_prefetched()
+
+    mock_study = server.study(study.study_id)
+    assert len(ids) == len(set(ids)) == N_TRIALS * 9 // 10
+    assert len(study.trials) == N_TRIALS
+    assert set(mock_study.losses) == set(ids)
+    assert len(mock_study.failed) + len(mock_study.losses) == mock_study.n_trials
+    for trial_id in ids:
+        trial = study.trials[trial_id]
+        assert mock_study.losses[trial_id] == trial.loss == pytest.approx(trial.properties['x'] ** 2 + 2)
+
+
+def test_shared_trial():
+    from hopaas_client import Study, LocalClient
+    study = Study("TEST::ThreadSafety", properties=dict(x=1), client=LocalClient())
+    with study.trial() as trial:
+        barrier = threading.Barrier(8)
+
+        def update():
+            barrier.wait()
+            for _ in range(1000):
+                trial.loss = 1.
+
+        threads = [threading.Thread(target=update) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert trial.step == 7999
+    assert len(trial.history) == 8000
+    assert sorted(trial.history[:, 0]) == list(range(8000))
+    assert study.trials[trial.id].loss == 1.
+
+
+def test_concurrent_store():
+    from hopaas_client.TrialStore import TrialStore
+    store = TrialStore()
+
+    def append(start):
+        for i in range(start, start + 500):
+            row = store.append(i, dict(x=float(i)))
+            store.set_result(row, float(i), 0)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(append, range(0, 4000, 500)))
+
+    assert len(store) == 4000
+    assert all(store[i].loss == store[i].properties['x'] == float(i) for i in range(4000))
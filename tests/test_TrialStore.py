@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def study():
+    from hopaas_client import Study, LocalClient
+    from hopaas_client import suggestions as hs
+    return Study("TEST::TrialStore",
+                 properties=dict(x=hs.Float(-1, 1), n=hs.Int(1, 10), act=hs.Categorical(['relu', 'tanh']), c=3),
+                 client=LocalClient(seed=42))
+
+
+###############################################################################
+
+
+def test_store_columns():
+    from hopaas_client.TrialStore import TrialStore
+    store = TrialStore("study")
+    for i in range(200):
+        row = store.append(i, dict(x=i * 0.5, n=i, flag=bool(i % 2), name=f"t{i}", **({'extra': i} if i > 100 else {})))
+        store.set_result(row, float(i) if i % 3 else None, i)
+
+    assert len(store) == 200
+    assert store.capacity >= 200
+    t = store[151]
+    assert t.trial_id == 151 and t.loss == 151. and t.study_id == "study"
+    assert dict(t.properties) == dict(x=75.5, n=151, flag=True, name="t151", extra=151)
+    assert type(t.properties['n']) is int and type(t.properties['flag']) is bool
+    assert 'extra' not in store[3].properties
+    assert store[3].loss is None
+
+    columns = store.to_numpy()
+    assert columns['x'].dtype == np.float64 and columns['name'].dtype == object
+    assert np.isnan(columns['extra'][:101]).all()
+    assert np.shares_memory(columns['loss'], store._losses)
+
+
+def test_store_mixed_kinds():
+    from hopaas_client.TrialStore import TrialStore
+    store = TrialStore()
+    store.append(0, dict(v=1, b=1, c=True))
+    store.append(1, dict(v=2.5, b=1.5, c=2))
+    store.append(2, dict(v="auto"))
+    assert [store[i].properties['v'] for i in range(3)] == [1, 2.5, "auto"]
+    assert type(store[0].properties['v']) is int
+
+    # The values keep the type they were stored with, while the columns are generalized
+    assert type(store[0].properties['b']) is int and type(store[1].properties['b']) is float
+    assert store[0].properties['c'] is True and type(store[1].properties['c']) is int
+    assert store.to_numpy()['b'].dtype == np.float64
+
+    with pytest.raises(KeyError):
+        store.append(0, dict())
+
+
+def test_iterate_while_appending():
+    import threading
+    from hopaas_client.TrialStore import TrialStore
+    store = TrialStore()
+    done = threading.Event()
+
+    def append():
+        for i in range(20000):
+            store.append(i, dict(x=float(i)))
+        done.set()
+
+    thread = threading.Thread(target=append)
+    thread.start()
+    while not done.is_set():
+        assert all(store[trial_id].trial_id == trial_id for trial_id in store)
+    thread.join()
+    assert len(list(store)) == 20000
+
+
+def test_study_trials_are_views(study):
+    for i in range(100):
+        with study.trial() as trial:
+            trial.loss = trial.x ** 2
+            assert study.trials[trial.id].loss == trial.loss
+            with pytest.raises(TypeError):
+                trial.properties['x'] = 0.
+
+    trials = study.trials
+    assert trials is study.trials
+    assert len(trials) == 100
+    assert all(t.properties['act'] in ['relu', 'tanh'] and t.properties['c'] == 3 for t in trials.values())
+
+    columns = study.trials_array()
+    assert np.allclose(columns['loss'], columns['x'] ** 2)
+    assert (columns['step'] == 0).all()
+
+    top = study.top_trials(5)
+    assert [t.loss for t in top] == sorted(columns['loss'])[:5]
+    assert top[0].trial_id == study.best_trial_id
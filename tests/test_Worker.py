@@ -0,0 +1,100 @@
+import functools
+import multiprocessing
+import os
+import textwrap
+import time
+
+import pytest
+
+
+@pytest.fixture
+def make_study(make_study):
+    return functools.partial(make_study, "TEST::Worker", lease=0.3)
+
+
+def run_and_die(address, token):
+    from hopaas_client import Client, Study
+    study = Study("TEST::Worker", properties=dict(x=1), lease=0.3, client=Client(server=address, token=token))
+    with study.trial():
+        os._exit(1)
+
+
+###############################################################################
+
+
+def test_lease_renewed(server, make_study):
+    study = make_study()
+    with study.trial() as trial:
+        time.sleep(1.)
+        trial.loss = 1.
+    server.expire_leases()
+
+    mock_study = server.study(study.study_id)
+    assert mock_study.losses == {trial.id: 1.}
+    assert len(mock_study.failed) == 0
+    assert server.requests['heartbeat'] >= 3
+    assert len(study._client.leases.active) == 0
+
+
+def test_killed_worker(server):
+    process = multiprocessing.Process(target=run_and_die, args=(server.address, server.token))
+    process.start()
+    process.join()
+    time.sleep(0.5)
+    server.expire_leases()
+
+    mock_study = server.study("mock-TEST__Worker")
+    assert mock_study.failed == {0: "Lease expired"}
+
+
+def test_lost_lease(server, make_study):
+    study = make_study()
+    with study.trial() as trial:
+        trial.loss = 1.
+        server.study(study.study_id).workers[trial.id] = "another-worker"
+        study._client.leases.heartbeat()
+        assert trial.should_prune
+
+    assert len(server.study(study.study_id).losses) == 0
+
+
+@pytest.mark.parametrize('mock_options', [dict(disabled_endpoints=['heartbeat'])], ids=['legacy'])
+def test_leases_unsupported(server, make_study):
+    study = make_study(lease=0.1)
+    with study.trial() as trial:
+        time.sleep(0.2)
+        trial.loss = 1.
+    assert server.requests['heartbeat'] == 1
+    assert len(server.study(study.study_id).losses) == 1
+
+
+def test_cli(server, tmp_path, monkeypatch):
+    from hopaas_client.worker import main
+    (tmp_path / "sweep_module.py").write_text(textwrap.dedent(f"""
+        from hopaas_client import Client, Study
+        from hopaas_client import suggestions as hs
+
+        def make_study():
+            client = Client(server="{server.address}", token="{server.token}")
+            return Study("TEST::Worker", properties=dict(x=hs.Float(-1, 1)), client=client)
+
+        def objective(trial):
+            if trial.id == 2:
+                raise ValueError("Failing trial")
+            return trial.x ** 2
+    """))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    assert main(["sweep_module:make_study", "sweep_module:objective", "--n-trials", "10", "--n-jobs", "2"]) == 0
+    mock_study = server.study("mock-TEST__Worker")
+    assert len(mock_study.losses) == 9
+    assert list(mock_study.failed) == [2]
+    assert set(mock_study.leases) == set()
+
+    start = time.monotonic()
+    assert main(["sweep_module:make_study", "sweep_module:objective", "--timeout", "0.5"]) == 0
+    assert time.monotonic() - start < 5.
+    assert mock_study.n_trials > 10
+
+    assert main(["sweep_module:make_study", "sweep_module:objective"]) == 2